@@ -2,24 +2,301 @@
 MongoDB Configuration and Connection Management
 """
 
+import asyncio
 import os
-from typing import Optional
-from pymongo import MongoClient, database
-from pymongo.errors import ConnectionFailure, ConfigurationError
+import threading
+import time
+from typing import Optional, List, Dict, Any
+from pymongo import MongoClient, database, monitoring, ASCENDING
+from pymongo.errors import (
+    ConnectionFailure, ConfigurationError, OperationFailure, CollectionInvalid,
+    DuplicateKeyError
+)
 
+from src.core.system_config import CONFIG
 from src.utils.logger import setup_logger
 
 # Логгер
 logger = setup_logger(__name__)
 
+# Имена служебных индексов коллекций символов
+SYMBOL_TIMESTAMP_INDEX = "symbol_timestamp"
+SYMBOL_TIMESTAMP_UNIQUE_INDEX = "symbol_timestamp_unique"
+CREATED_AT_TTL_INDEX = "created_at_ttl"
+
+# Коды ошибок создания индекса с ключом, который уже покрыт другим индексом
+INDEX_CONFLICT_CODES = (85, 86)
+
+# Соединения сверх CONFIG.max_workers для фоновых потоков (буфер записи, журнал)
+BACKGROUND_CONNECTIONS = 2
+# Сколько секунд считать результат ping актуальным
+HEALTH_CHECK_TTL = 5.0
+
+# Режимы хранения коллекций символов
+STORAGE_MODES = ("documents", "timeseries")
+TIMESERIES_GRANULARITIES = ("seconds", "minutes", "hours")
+
+def default_pool_size() -> int:
+    """Размер пула соединений процесса (MONGODB_MAX_POOL_SIZE или по CONFIG.max_workers)"""
+    value = os.getenv("MONGODB_MAX_POOL_SIZE")
+    if value:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            logger.warning(f"Invalid MONGODB_MAX_POOL_SIZE value: {value}")
+    return CONFIG.max_workers + BACKGROUND_CONNECTIONS
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Счетчики пула соединений одного клиента
+
+    События выдачи соединения публикуются в потоке, который его ждет,
+    поэтому время ожидания меряется через thread-local.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.pool_clears = 0
+
+    def _wait_finished(self) -> float:
+        started = getattr(self._local, 'started', None)
+        self._local.started = None
+        return time.monotonic() - started if started is not None else 0.0
+
+    def connection_check_out_started(self, event) -> None:
+        self._local.started = time.monotonic()
+
+    def connection_checked_out(self, event) -> None:
+        wait = self._wait_finished()
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def connection_check_out_failed(self, event) -> None:
+        wait = self._wait_finished()
+        with self._lock:
+            self.checkout_failures += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def connection_checked_in(self, event) -> None:
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self.created += 1
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self.closed += 1
+
+    def pool_cleared(self, event) -> None:
+        with self._lock:
+            self.pool_clears += 1
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущие значения счетчиков"""
+        with self._lock:
+            attempts = self.checkouts + self.checkout_failures
+            return {
+                'open_connections': self.created - self.closed,
+                'checked_out': self.checked_out,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'avg_wait_ms': round(self.wait_total / attempts * 1000, 3) if attempts else 0.0,
+                'max_wait_ms': round(self.wait_max * 1000, 3),
+                'pool_clears': self.pool_clears
+            }
+
+class ConnectionManager:
+    """
+    MongoClient на процесс для одного URI
+
+    Клиент создается при первом обращении в каждом процессе: после fork
+    дочерний процесс получает новый клиент вместо унаследованного
+    (MongoClient не переживает fork). Результат ping кэшируется на
+    health_ttl секунд, чтобы подключения и проверки здоровья в скриптах
+    и воркерах не ходили в базу каждый раз.
+    """
+
+    def __init__(self, uri: str, max_pool_size: Optional[int] = None,
+                 health_ttl: float = HEALTH_CHECK_TTL):
+        """
+        Args:
+            uri: URI подключения
+            max_pool_size: Размер пула на процесс (default_pool_size() если None)
+            health_ttl: Время жизни результата ping в секундах
+        """
+        self.uri = uri
+        self.max_pool_size = max_pool_size or default_pool_size()
+        self.health_ttl = health_ttl
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        """Сброс состояния процесса (унаследованный клиент не закрывается)"""
+        self._pid = os.getpid()
+        self._users = 0
+        self._client: Optional[MongoClient] = None
+        self._listener: Optional[PoolStatsListener] = None
+        self._checked_at = 0.0
+        self._health_error: Optional[Exception] = None
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._reset()
+
+    @property
+    def client(self) -> MongoClient:
+        """Клиент текущего процесса"""
+        if self._pid != os.getpid():
+            # Fork без register_at_fork (или до его срабатывания)
+            self._after_fork()
+        client = self._client
+        if client is not None:
+            return client
+
+        with self._lock:
+            if self._client is None:
+                self._listener = PoolStatsListener()
+                self._client = MongoClient(
+                    self.uri,
+                    connectTimeoutMS=5000,
+                    socketTimeoutMS=30000,
+                    maxPoolSize=self.max_pool_size,
+                    minPoolSize=1,
+                    event_listeners=[self._listener]
+                )
+            return self._client
+
+    def ping(self) -> None:
+        """
+        Проверка доступности сервера с кэшированием на health_ttl
+
+        Raises:
+            ConnectionFailure: Сервер недоступен (ошибка тоже кэшируется)
+        """
+        if time.monotonic() - self._checked_at < self.health_ttl:
+            if self._health_error is not None:
+                raise self._health_error
+            return
+
+        try:
+            self.client.admin.command('ping')
+            self._health_error = None
+        except Exception as e:
+            self._health_error = e
+            raise
+        finally:
+            self._checked_at = time.monotonic()
+
+    def is_healthy(self) -> bool:
+        """Доступен ли сервер (по кэшированному ping)"""
+        try:
+            self.ping()
+            return True
+        except Exception:
+            return False
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        Статистика пула соединений текущего процесса
+
+        Returns:
+            pid, max_pool_size, open_connections, checked_out, checkouts,
+            checkout_failures, avg_wait_ms, max_wait_ms, pool_clears
+        """
+        stats = {'pid': os.getpid(), 'max_pool_size': self.max_pool_size}
+        listener = self._listener if self._pid == os.getpid() else None
+        if listener is not None:
+            stats.update(listener.snapshot())
+        return stats
+
+    def acquire(self) -> MongoClient:
+        """Клиент процесса для подключившейся конфигурации"""
+        client = self.client
+        with self._lock:
+            self._users += 1
+        return client
+
+    def release(self) -> None:
+        """Отключение конфигурации; клиент закрывается вместе с последней"""
+        with self._lock:
+            self._users -= 1
+            if self._users > 0:
+                return
+        self.close()
+
+    def close(self) -> None:
+        """Закрытие клиента текущего процесса"""
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._reset()
+
+# Менеджеры соединений по URI, общие для всех MongoDBConfig процесса
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+def get_connection_manager(uri: Optional[str] = None) -> ConnectionManager:
+    """Менеджер соединений URI (MONGODB_URI если None)"""
+    uri = uri or os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+    with _managers_lock:
+        if uri not in _managers:
+            _managers[uri] = ConnectionManager(uri)
+        return _managers[uri]
+
+def _reset_after_fork() -> None:
+    """Дочерний процесс не использует клиенты родителя"""
+    global _managers_lock
+    _managers_lock = threading.Lock()
+    for manager in _managers.values():
+        manager._after_fork()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
 class MongoDBConfig:
     """Конфигурация и управление MongoDB подключениями"""
     
     def __init__(self):
         self.uri = self._get_connection_uri()
         self.db_name = self._get_database_name()
+        self.ttl_days = self._get_ttl_days()
+        self.storage_mode = self._get_storage_mode()
+        self.timeseries_granularity = self._get_timeseries_granularity()
+        self.unique_bars = self._get_unique_bars()
         self.client: Optional[MongoClient] = None
         self.database: Optional[database.Database] = None
+        self._pid: Optional[int] = None
+        self._prepared_collections = set()
+        self._unique_collections = set()
+        # Коллекции с дубликатами баров: уникальный индекс не строится до dedupe_bars.py
+        self._duplicate_collections = set()
+        self._collection_types: Dict[str, str] = {}
     
     def _get_connection_uri(self) -> str:
         """Получение URI подключения из переменных окружения"""
@@ -29,19 +306,66 @@ class MongoDBConfig:
         """Получение имени базы данных"""
         return os.getenv("MONGODB_DB_NAME", "hydra_metrics")
     
+    def _get_ttl_days(self) -> Optional[int]:
+        """Срок хранения документов для TTL индекса (None - без TTL)"""
+        value = os.getenv("MONGODB_TTL_DAYS")
+        if not value:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            logger.warning(f"Invalid MONGODB_TTL_DAYS value: {value}")
+            return None
+    
+    def _get_storage_mode(self) -> str:
+        """Режим хранения новых коллекций символов"""
+        mode = os.getenv("MONGODB_STORAGE_MODE", "documents")
+        if mode not in STORAGE_MODES:
+            logger.warning(f"Unknown MONGODB_STORAGE_MODE '{mode}', using 'documents'")
+            return "documents"
+        return mode
+    
+    def _get_timeseries_granularity(self) -> str:
+        """Гранулярность time-series коллекций"""
+        granularity = os.getenv("MONGODB_TS_GRANULARITY", "minutes")
+        if granularity not in TIMESERIES_GRANULARITIES:
+            logger.warning(f"Unknown MONGODB_TS_GRANULARITY '{granularity}', using 'minutes'")
+            return "minutes"
+        return granularity
+    
+    def _get_unique_bars(self) -> bool:
+        """Уникальный индекс (symbol, timestamp) для идемпотентной записи баров"""
+        return os.getenv("MONGODB_UNIQUE_BARS", "").lower() in ("1", "true", "yes")
+    
+    @property
+    def timeseries_enabled(self) -> bool:
+        """Создаются ли новые коллекции символов как time-series"""
+        return self.storage_mode == "timeseries"
+    
+    @property
+    def ttl_enabled(self) -> bool:
+        """Удаляет ли старые документы TTL индекс"""
+        return bool(self.ttl_days)
+    
+    @property
+    def manager(self) -> ConnectionManager:
+        """Менеджер соединений URI (клиент общий для конфигураций процесса)"""
+        return get_connection_manager(self.uri)
+    
+    @property
+    def is_stale(self) -> bool:
+        """Подключение унаследовано от родительского процесса"""
+        return self._pid is not None and self._pid != os.getpid()
+    
     def connect(self) -> bool:
-        """Установка подключения к MongoDB"""
+        """Установка подключения к MongoDB (клиент процесса, ping кэшируется)"""
         try:
-            self.client = MongoClient(
-                self.uri,
-                connectTimeoutMS=5000,
-                socketTimeoutMS=30000,
-                maxPoolSize=10,
-                minPoolSize=1
-            )
-            
+            manager = self.manager
             # Проверяем подключение
-            self.client.admin.command('ping')
+            manager.ping()
+            if self._pid != os.getpid():
+                self.client = manager.acquire()
+                self._pid = os.getpid()
             self.database = self.client[self.db_name]
             
             logger.info(f"✅ Successfully connected to MongoDB: {self.db_name}")
@@ -57,19 +381,213 @@ class MongoDBConfig:
             logger.error(f"❌ Unexpected MongoDB error: {e}")
             return False
     
-    def get_collection(self, collection_name: str):
-        """Получение коллекции из базы данных"""
-        if not self.database:
+    def get_collection(self, collection_name: str, ensure_indexes: bool = True):
+        """
+        Получение коллекции из базы данных
+        
+        При первом обращении к коллекции идемпотентно создаются индексы
+        (symbol, timestamp) и, если задан MONGODB_TTL_DAYS, TTL по created_at.
+        В режиме timeseries отсутствующая коллекция создается как time-series;
+        уже существующие коллекции используются в своем формате. Служебные
+        коллекции (с префиксом _) не подготавливаются.
+        """
+        if self.database is None or self.is_stale:
             if not self.connect():
                 raise ConnectionError("MongoDB connection not established")
         
-        return self.database[collection_name]
+        collection = self.database[collection_name]
+        if collection_name.startswith('_'):
+            return collection
+        if ensure_indexes and collection_name not in self._prepared_collections:
+            if self.timeseries_enabled and self.get_collection_type(collection_name) is None:
+                self.create_timeseries_collection(collection_name)
+            self.ensure_indexes(collection)
+        return collection
+    
+    def get_collection_type(self, collection_name: str) -> Optional[str]:
+        """
+        Тип коллекции: 'collection', 'timeseries' или None если ее нет
+        """
+        if collection_name in self._collection_types:
+            return self._collection_types[collection_name]
+        
+        info = next(iter(self.database.list_collections(filter={'name': collection_name})), None)
+        if info is None:
+            return None
+        
+        self._collection_types[collection_name] = info.get('type', 'collection')
+        return self._collection_types[collection_name]
+    
+    def is_timeseries(self, collection_name: str) -> bool:
+        """Является ли коллекция time-series коллекцией"""
+        return self.get_collection_type(collection_name) == 'timeseries'
+    
+    def create_timeseries_collection(self, collection_name: str,
+                                     granularity: Optional[str] = None):
+        """
+        Создание time-series коллекции символа
+        
+        Args:
+            collection_name: Имя коллекции
+            granularity: seconds/minutes/hours (MONGODB_TS_GRANULARITY если None)
+        
+        Returns:
+            Коллекция (существующая, если уже создана)
+        """
+        options = {
+            'timeseries': {
+                'timeField': 'timestamp',
+                'metaField': 'symbol',
+                'granularity': granularity or self.timeseries_granularity
+            }
+        }
+        if self.ttl_enabled:
+            options['expireAfterSeconds'] = self.ttl_days * 24 * 3600
+        
+        try:
+            collection = self.database.create_collection(collection_name, **options)
+            logger.info(f"Created time-series collection {collection_name}")
+        except CollectionInvalid:
+            collection = self.database[collection_name]
+        
+        self._collection_types.pop(collection_name, None)
+        return collection
+    
+    def ensure_indexes(self, collection) -> None:
+        """Создание индексов коллекции символа (безопасно вызывать повторно)"""
+        try:
+            if not (self.unique_bars and self.ensure_unique_index(collection)):
+                self._ensure_key_index(collection)
+            if self.ttl_enabled:
+                if self.is_timeseries(collection.name):
+                    # У time-series срок хранения задается на уровне коллекции
+                    self.database.command(
+                        'collMod', collection.name,
+                        expireAfterSeconds=self.ttl_days * 24 * 3600
+                    )
+                else:
+                    self._ensure_ttl_index(collection)
+            self._prepared_collections.add(collection.name)
+        except Exception as e:
+            logger.warning(f"Failed to ensure indexes for {collection.name}: {e}")
+    
+    def _ensure_key_index(self, collection) -> None:
+        """Неуникальный индекс (symbol, timestamp), если ключ еще не проиндексирован"""
+        try:
+            collection.create_index(
+                [('symbol', ASCENDING), ('timestamp', ASCENDING)],
+                name=SYMBOL_TIMESTAMP_INDEX
+            )
+        except OperationFailure as e:
+            # Ключ уже покрыт уникальным индексом
+            if e.code not in INDEX_CONFLICT_CODES:
+                raise
+    
+    def ensure_unique_index(self, collection) -> bool:
+        """
+        Уникальный индекс (symbol, timestamp) вместо обычного
+        
+        Нужен для апсертов по бару; time-series коллекции уникальные
+        индексы не поддерживают. Если в коллекции уже есть дубликаты,
+        обычный индекс остается на месте, и результат запоминается до
+        перезапуска, чтобы не перестраивать индексы при каждой записи.
+        
+        Returns:
+            True если уникальный индекс есть
+        """
+        if collection.name in self._unique_collections:
+            return True
+        if collection.name in self._duplicate_collections:
+            return False
+        if self.is_timeseries(collection.name):
+            logger.warning(f"{collection.name} is a time-series collection, unique bars are not supported")
+            return False
+        
+        indexes = collection.index_information()
+        if indexes.get(SYMBOL_TIMESTAMP_UNIQUE_INDEX, {}).get('unique'):
+            self._unique_collections.add(collection.name)
+            return True
+        if SYMBOL_TIMESTAMP_INDEX in indexes:
+            collection.drop_index(SYMBOL_TIMESTAMP_INDEX)
+        
+        try:
+            collection.create_index(
+                [('symbol', ASCENDING), ('timestamp', ASCENDING)],
+                name=SYMBOL_TIMESTAMP_UNIQUE_INDEX, unique=True
+            )
+        except DuplicateKeyError:
+            logger.error(f"{collection.name} has duplicate bars, run scripts/dedupe_bars.py before enabling unique bars")
+            self._ensure_key_index(collection)
+            self._duplicate_collections.add(collection.name)
+            return False
+        
+        self._unique_collections.add(collection.name)
+        logger.info(f"Unique (symbol, timestamp) index ensured for {collection.name}")
+        return True
+    
+    def _ensure_ttl_index(self, collection) -> None:
+        """TTL индекс по created_at с обновлением срока через collMod"""
+        expire_seconds = self.ttl_days * 24 * 3600
+        try:
+            collection.create_index(
+                'created_at',
+                name=CREATED_AT_TTL_INDEX,
+                expireAfterSeconds=expire_seconds
+            )
+        except OperationFailure:
+            # Индекс уже есть с другим сроком хранения
+            self.database.command(
+                'collMod', collection.name,
+                index={'name': CREATED_AT_TTL_INDEX, 'expireAfterSeconds': expire_seconds}
+            )
+            logger.info(f"TTL for {collection.name} updated to {self.ttl_days} days")
+    
+    def index_stats(self, collection_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Статистика использования индексов ($indexStats)
+        
+        Args:
+            collection_name: Коллекция (все коллекции если None)
+        
+        Returns:
+            Список записей: коллекция, индекс, число обращений, с какого момента
+        """
+        if self.database is None or self.is_stale:
+            if not self.connect():
+                raise ConnectionError("MongoDB connection not established")
+        
+        if collection_name is None:
+            names = sorted(
+                name for name in self.database.list_collection_names()
+                if not name.startswith('system.')
+            )
+        else:
+            names = [collection_name]
+        
+        stats = []
+        for name in names:
+            for entry in self.database[name].aggregate([{'$indexStats': {}}]):
+                stats.append({
+                    'collection': name,
+                    'index': entry['name'],
+                    'key': dict(entry['key']),
+                    'ops': entry['accesses']['ops'],
+                    'since': entry['accesses']['since']
+                })
+        return stats
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Статистика пула соединений процесса"""
+        return self.manager.pool_stats()
     
     def close(self) -> None:
-        """Закрытие подключения"""
-        if self.client:
-            self.client.close()
+        """Закрытие подключения (общий клиент закрывается последней конфигурацией)"""
+        if self._pid == os.getpid():
+            self.manager.release()
             logger.info("MongoDB connection closed")
+        self.client = None
+        self.database = None
+        self._pid = None
     
     def __enter__(self):
         """Контекстный менеджер"""
@@ -80,21 +598,142 @@ class MongoDBConfig:
         """Контекстный менеджер - выход"""
         self.close()
 
+class AsyncMongoDBConfig:
+    """
+    Асинхронное подключение к MongoDB через motor
+    
+    Использует те же переменные окружения, что и MongoDBConfig.
+    """
+    
+    def __init__(self, max_pool_size: Optional[int] = None):
+        settings = MongoDBConfig()
+        self.uri = settings.uri
+        self.db_name = settings.db_name
+        self.storage_mode = settings.storage_mode
+        self.timeseries_granularity = settings.timeseries_granularity
+        self.max_pool_size = max_pool_size or default_pool_size()
+        self.client = None
+        self.database = None
+        self._prepared_collections = set()
+        # Блокировка создается в работающем цикле: в Python 3.9 примитивы
+        # asyncio привязываются к циклу, текущему при создании
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._connect_lock_loop = None
+    
+    async def connect(self) -> bool:
+        """
+        Установка подключения к MongoDB
+
+        Одновременные вызовы ждут одно подключение под asyncio.Lock,
+        поэтому клиент и его пул создаются один раз.
+        """
+        loop = asyncio.get_running_loop()
+        if self._connect_lock_loop is not loop:
+            self._connect_lock = asyncio.Lock()
+            self._connect_lock_loop = loop
+        
+        async with self._connect_lock:
+            if self.database is not None:
+                return True
+            return await self._connect()
+    
+    async def _connect(self) -> bool:
+        try:
+            from motor.motor_asyncio import AsyncIOMotorClient
+        except ImportError:
+            logger.error("❌ motor is not installed, install hydra[async]")
+            return False
+        
+        client = None
+        try:
+            client = AsyncIOMotorClient(
+                self.uri,
+                connectTimeoutMS=5000,
+                socketTimeoutMS=30000,
+                maxPoolSize=self.max_pool_size,
+                minPoolSize=1
+            )
+            
+            # Проверяем подключение
+            await client.admin.command('ping')
+            self.client = client
+            self.database = client[self.db_name]
+            
+            logger.info(f"✅ Successfully connected to MongoDB (async): {self.db_name}")
+            return True
+            
+        except ConnectionFailure as e:
+            logger.error(f"❌ MongoDB connection failed: {e}")
+        except Exception as e:
+            logger.error(f"❌ Unexpected MongoDB error: {e}")
+        
+        # Клиент без рабочего подключения не оставляем открытым
+        if client is not None:
+            client.close()
+        return False
+    
+    async def get_collection(self, collection_name: str, ensure_indexes: bool = True):
+        """Получение коллекции с подготовкой при первом обращении"""
+        if self.database is None:
+            if not await self.connect():
+                raise ConnectionError("MongoDB connection not established")
+        
+        collection = self.database[collection_name]
+        if ensure_indexes and collection_name not in self._prepared_collections:
+            await self._prepare_collection(collection_name)
+        return collection
+    
+    async def _prepare_collection(self, collection_name: str) -> None:
+        """Создание time-series коллекции и индекса (symbol, timestamp)"""
+        try:
+            if self.storage_mode == "timeseries":
+                existing = await self.database.list_collection_names(filter={'name': collection_name})
+                if not existing:
+                    try:
+                        await self.database.create_collection(
+                            collection_name,
+                            timeseries={
+                                'timeField': 'timestamp',
+                                'metaField': 'symbol',
+                                'granularity': self.timeseries_granularity
+                            }
+                        )
+                    except CollectionInvalid:
+                        pass
+            
+            await self.database[collection_name].create_index(
+                [('symbol', ASCENDING), ('timestamp', ASCENDING)],
+                name=SYMBOL_TIMESTAMP_INDEX
+            )
+            self._prepared_collections.add(collection_name)
+        except Exception as e:
+            logger.warning(f"Failed to ensure indexes for {collection_name}: {e}")
+    
+    def close(self) -> None:
+        """Закрытие подключения"""
+        if self.client:
+            self.client.close()
+            logger.info("MongoDB async connection closed")
+
 # Глобальный экземпляр конфигурации
 mongodb_config = MongoDBConfig()
 
 def get_mongo_client() -> MongoClient:
     """Получение MongoDB клиента"""
-    if not mongodb_config.client:
+    if not mongodb_config.client or mongodb_config.is_stale:
         mongodb_config.connect()
     return mongodb_config.client
 
 def get_database() -> database.Database:
     """Получение базы данных"""
-    if not mongodb_config.database:
+    if mongodb_config.database is None or mongodb_config.is_stale:
         mongodb_config.connect()
     return mongodb_config.database
 
+def get_pool_stats() -> Dict[str, Any]:
+    """Статистика пула соединений текущего процесса"""
+    return mongodb_config.pool_stats()
+
 def get_collection(collection_name: str):
     """Получение коллекции"""
     return mongodb_config.get_collection(collection_name)
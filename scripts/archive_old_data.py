@@ -1,55 +1,217 @@
 # scripts/archive_old_data.py
 import sys
+import time
+import argparse
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from config.database import MongoDBConfig
-from datetime import datetime
+from datetime import datetime, timedelta
+from pymongo.errors import BulkWriteError
+from src.core.cold_storage import ColdStorageArchive
+from src.core.coverage import CoverageIndex, COVERAGE_COLLECTION
+from src.core.data_manager import documents_to_frame
+
+CHECKPOINT_COLLECTION = "_archive_checkpoints"
+DUPLICATE_KEY_ERROR = 11000
+
+def _copy_batch(source, target, base_query, last_id, batch_size, server_side):
+    """Copy the next _id-ordered batch; returns (ids, upper _id, matched count)"""
+    query = dict(base_query)
+    if last_id is not None:
+        query['_id'] = {'$gt': last_id}
+
+    if server_side:
+        # На клиент идут только _id пачки, сами документы остаются на сервере.
+        # Удаляется потом ровно этот список: документы, попавшие в диапазон
+        # _id после $merge (воспроизведение журнала, сброс буфера), не теряются
+        ids = [doc['_id'] for doc in source.find(query, {'_id': 1}).sort('_id', 1).limit(batch_size)]
+        if not ids:
+            return [], None, 0
+
+        source.aggregate([
+            {'$match': {'_id': {'$in': ids}}},
+            {'$merge': {
+                'into': target.name,
+                'on': '_id',
+                'whenMatched': 'keepExisting',
+                'whenNotMatched': 'insert'
+            }}
+        ])
+        return ids, ids[-1], len(ids)
+
+    batch = list(source.find(query).sort('_id', 1).limit(batch_size))
+    if not batch:
+        return [], None, 0
+
+    try:
+        target.insert_many(batch, ordered=False)
+    except BulkWriteError as e:
+        # Дубликаты - документы уже архивированы прошлым (прерванным) запуском
+        errors = [err for err in e.details.get('writeErrors', []) if err['code'] != DUPLICATE_KEY_ERROR]
+        if errors:
+            raise
+
+    ids = [doc['_id'] for doc in batch]
+    return ids, ids[-1], len(ids)
+
+def _archive_batch_cold(source, cold_store, source_name, base_query, last_id, batch_size):
+    """Write the next _id-ordered batch to cold storage; returns (ids, upper _id, matched, verified)"""
+    query = dict(base_query)
+    if last_id is not None:
+        query['_id'] = {'$gt': last_id}
+
+    batch = list(source.find(query).sort('_id', 1).limit(batch_size))
+    if not batch:
+        return [], None, 0, 0
+
+    # Документы без timestamp нельзя разложить по времени - оставляем в коллекции
+    documents = [doc for doc in batch if isinstance(doc.get('timestamp'), datetime)]
+    for doc in documents:
+        doc.setdefault('symbol', source_name)
+
+    ids = [doc['_id'] for doc in documents]
+    verified = 0
+    if documents:
+        # Имя файла по границам пачки - повторный запуск не создаст дубликат
+        name = f"{batch[0]['_id']}_{batch[-1]['_id']}"
+        df = documents_to_frame(documents)
+        for symbol, part in df.groupby('symbol', sort=False):
+            if not cold_store.has_file(symbol, f"{name}.parquet"):
+                cold_store.write_range(symbol, part, name)
+            verified += cold_store.file_rows(symbol, f"{name}.parquet")
+
+    return ids, batch[-1]['_id'], len(ids), verified
+
+def _batch_spans(source, ids):
+    """Time span of the batch per symbol: [(symbol, first timestamp, last timestamp)]"""
+    return [(span['_id'], span['start'], span['end']) for span in source.aggregate([
+        {'$match': {'_id': {'$in': ids}, 'symbol': {'$ne': None}, 'timestamp': {'$type': 'date'}}},
+        {'$group': {'_id': '$symbol', 'start': {'$min': '$timestamp'}, 'end': {'$max': '$timestamp'}}}
+    ])]
+
+def archive_old_data(source_name="BTCUSDT", target_name=None, batch_size=10000,
+                     older_than_days=None, server_side=False, cold_storage_dir=None):
+    """Archive data to a separate collection or cold storage in verified, resumable batches"""
+    cold_store = ColdStorageArchive(cold_storage_dir) if cold_storage_dir else None
+    target_name = target_name or (cold_storage_dir if cold_store else f"{source_name}_archive")
+    print(f"📦 Archiving {source_name} -> {target_name}...")
 
-def archive_old_data():
-    """Archive old data to separate collection"""
-    print("📦 Archiving old data...")
-    
     db = MongoDBConfig()
     if not db.connect():
         print("❌ Cannot connect to MongoDB")
         return
-    
+
+    coverage = None
     try:
-        source_collection = db.database["BTCUSDT"]
-        target_collection = db.database["BTCUSDT_archive"]
-        
-        # Check if source collection exists and has data
-        count = source_collection.count_documents({})
+        source_collection = db.database[source_name]
+        target_collection = db.database[target_name] if cold_store is None else None
+        checkpoints = db.database[CHECKPOINT_COLLECTION]
+        # Архив в коллекцию не читается DataManager - его бары снимаются с покрытия;
+        # холодное хранилище get_historical_data дочитывает, покрытие остается
+        coverage = CoverageIndex(lambda: db.database[COVERAGE_COLLECTION]) if cold_store is None else None
+        checkpoint_id = f"{source_name}->{target_name}"
+
+        base_query = {}
+        if older_than_days is not None:
+            cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+            base_query['timestamp'] = {'$lt': cutoff}
+
+        # Check if source collection has data to archive
+        count = source_collection.count_documents(base_query)
         if count == 0:
             print("ℹ️ No data to archive")
             return
-        
-        print(f"📊 Archiving {count} documents...")
-        
-        # Copy all documents to archive
-        documents = list(source_collection.find({}))
-        if documents:
-            target_collection.insert_many(documents)
-            print(f"✅ Archived {len(documents)} documents to BTCUSDT_archive")
-        
-        # Clear the original collection
-        result = source_collection.delete_many({})
-        print(f"🗑️ Cleared {result.deleted_count} documents from BTCUSDT")
-        
-        # Add archive metadata
-        target_collection.insert_one({
-            "archived_at": datetime.utcnow(),
-            "original_count": count,
-            "archive_note": "Old test data from previous version"
-        })
-        
-        print("🎉 Archive completed successfully!")
-        
+
+        state = checkpoints.find_one({'_id': checkpoint_id}) or {}
+        last_id = state.get('last_id') if state.get('status') == 'running' else None
+        if last_id is not None:
+            print(f"🔁 Resuming after _id {last_id} ({state.get('archived', 0):,} archived so far)")
+
+        checkpoints.update_one(
+            {'_id': checkpoint_id},
+            {'$set': {'status': 'running', 'started_at': datetime.utcnow()},
+             '$setOnInsert': {'archived': 0}},
+            upsert=True
+        )
+
+        print(f"📊 Archiving {count:,} documents in batches of {batch_size:,}...")
+        started = time.time()
+        archived = 0
+
+        while True:
+            if cold_store is not None:
+                ids, upper_id, matched, verified = _archive_batch_cold(
+                    source_collection, cold_store, source_name, base_query, last_id, batch_size
+                )
+            else:
+                ids, upper_id, matched = _copy_batch(
+                    source_collection, target_collection, base_query, last_id, batch_size, server_side
+                )
+            if upper_id is None:
+                break
+
+            # Проверяем пачку в архиве и удаляем только подтвержденные _id
+            if cold_store is None:
+                verified = target_collection.count_documents({'_id': {'$in': ids}})
+            delete_query = {'_id': {'$in': ids}}
+
+            if verified < matched:
+                print(f"❌ Verification failed: {verified}/{matched} documents in archive, stopping")
+                return
+
+            # Пролет пачки может захватить еще не архивированные бары:
+            # лишний пропуск в покрытии безопаснее удаленной истории, отмеченной как сохраненная
+            spans = _batch_spans(source_collection, ids) if coverage is not None else []
+            deleted = source_collection.delete_many(delete_query).deleted_count
+            for symbol, first, last in spans:
+                coverage.remove_range(symbol, first, last + timedelta(microseconds=1))
+            archived += deleted
+            last_id = upper_id
+            checkpoints.update_one(
+                {'_id': checkpoint_id},
+                {'$set': {'last_id': last_id, 'updated_at': datetime.utcnow()},
+                 '$inc': {'archived': deleted}}
+            )
+
+            elapsed = time.time() - started
+            rate = archived / elapsed if elapsed > 0 else 0
+            print(f"   ✅ {archived:,}/{count:,} archived ({rate:,.0f} docs/s)")
+
+        # Archive metadata
+        checkpoints.update_one(
+            {'_id': checkpoint_id},
+            {'$set': {
+                'status': 'done',
+                'last_id': None,
+                'finished_at': datetime.utcnow(),
+                'original_count': count
+            }}
+        )
+
+        elapsed = time.time() - started
+        print(f"🎉 Archived {archived:,} documents to {target_name} in {elapsed:.1f}s")
+
     except Exception as e:
         print(f"❌ Error during archiving: {e}")
+        print("ℹ️ Progress is checkpointed, rerun to resume")
     finally:
+        if coverage is not None:
+            coverage.flush()
         db.close()
 
 if __name__ == "__main__":
-    archive_old_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Archive old data to a separate collection")
+    parser.add_argument("--source", default="BTCUSDT")
+    parser.add_argument("--target", default=None, help="Defaults to <source>_archive")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--older-than-days", type=int, default=None,
+                        help="Archive only documents older than N days (all if omitted)")
+    parser.add_argument("--server-side", action="store_true",
+                        help="Copy batches on the server with $merge instead of through the client")
+    parser.add_argument("--cold-storage", default=None, metavar="DIR",
+                        help="Write compressed Parquet files to DIR instead of an archive collection")
+    args = parser.parse_args()
+
+    archive_old_data(args.source, args.target, args.batch_size,
+                     args.older_than_days, args.server_side, args.cold_storage)
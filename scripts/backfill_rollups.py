@@ -0,0 +1,47 @@
+# scripts/backfill_rollups.py
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from datetime import datetime, timedelta
+from config.database import MongoDBConfig
+from src.core.rollups import RollupEngine, ROLLUP_INTERVALS
+
+def backfill_rollups(symbols, intervals=ROLLUP_INTERVALS, days=None):
+    """Rebuild OHLCV rollup collections from existing raw history"""
+    print(f"🧮 Backfilling {', '.join(intervals)} rollups for {', '.join(symbols)}...")
+
+    db = MongoDBConfig()
+    if not db.connect():
+        print("❌ Cannot connect to MongoDB")
+        return
+
+    try:
+        engine = RollupEngine(lambda name: db.database[name], intervals)
+        start_time = datetime.utcnow() - timedelta(days=days) if days is not None else None
+
+        for symbol in symbols:
+            started = time.time()
+            report = engine.backfill(db.database[symbol.lower()], symbol, start_time)
+            summary = ", ".join(f"{interval}: {count:,}" for interval, count in report.items())
+            print(f"   ✅ {symbol}: {summary} buckets in {time.time() - started:.1f}s")
+
+        print("🎉 Rollups are up to date")
+
+    except Exception as e:
+        print(f"❌ Error during backfill: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill OHLCV rollup collections")
+    parser.add_argument("symbols", nargs="*", default=["BTCUSDT"])
+    parser.add_argument("--intervals", default=",".join(ROLLUP_INTERVALS),
+                        help="Comma separated rollup intervals")
+    parser.add_argument("--days", type=int, default=None,
+                        help="Rebuild only the last N days (all history if omitted)")
+    args = parser.parse_args()
+
+    backfill_rollups(args.symbols, [i.strip() for i in args.intervals.split(",") if i.strip()], args.days)
@@ -0,0 +1,85 @@
+# scripts/benchmark_indicators.py
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+
+from src.ml import indicators
+
+def make_ohlcv(rows, seed=42):
+    """Random-walk OHLCV as contiguous float64 arrays"""
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 25, rows))
+    spread = rng.uniform(1, 50, rows)
+    return {
+        'high': close + spread,
+        'low': close - spread,
+        'close': close,
+        'volume': rng.uniform(1, 100, rows)
+    }
+
+def timed(func, repeat):
+    """Best wall time of several runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def benchmark(rows=10_000_000, windows=(10, 20, 50, 100, 200), repeat=3, compare_pandas=True):
+    """Time every indicator kernel over all windows at once, optionally against pandas"""
+    print(f"📐 Generating {rows:,} rows...")
+    data = make_ohlcv(rows)
+    close, high, low, volume = data['close'], data['high'], data['low'], data['volume']
+    windows = list(windows)
+
+    kernels = {
+        'returns': lambda: indicators.returns(close),
+        'sma': lambda: indicators.sma(close, windows),
+        'rolling_std': lambda: indicators.rolling_std(close, windows),
+        'ema': lambda: indicators.ema(close, windows),
+        'rsi (sma)': lambda: indicators.rsi(close, windows),
+        'rsi (wilder)': lambda: indicators.rsi(close, windows, method='wilder'),
+        'atr': lambda: indicators.atr(high, low, close, windows),
+        'bollinger': lambda: indicators.bollinger(close, windows),
+        'vwap': lambda: indicators.vwap(close, volume, windows, high, low),
+    }
+
+    series = pd.Series(close)
+    baselines = {
+        'sma': lambda: [series.rolling(w).mean() for w in windows],
+        'rolling_std': lambda: [series.rolling(w).std() for w in windows],
+        'ema': lambda: [series.ewm(span=w, adjust=False).mean() for w in windows],
+    }
+
+    rows_out = []
+    for name, kernel in kernels.items():
+        seconds = timed(kernel, repeat)
+        row = [name, len(windows), f"{seconds * 1000:.0f}", f"{rows * len(windows) / seconds / 1e6:.1f}"]
+        if compare_pandas and name in baselines:
+            baseline = timed(baselines[name], 1)
+            row.append(f"{baseline / seconds:.1f}x")
+        else:
+            row.append("-")
+        rows_out.append(row)
+        print(f"   ✅ {name}: {seconds * 1000:.0f} ms")
+
+    print(tabulate(rows_out, headers=["Indicator", "Windows", "ms", "M values/s", "vs pandas"]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark vectorized indicator kernels")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--windows", default="10,20,50,100,200",
+                        help="Comma separated window lengths")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-pandas", action="store_true", help="Skip pandas baselines")
+    args = parser.parse_args()
+
+    windows = [int(w) for w in args.windows.split(",") if w.strip()]
+    benchmark(args.rows, windows, args.repeat, compare_pandas=not args.no_pandas)
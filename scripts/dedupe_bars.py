@@ -0,0 +1,72 @@
+# scripts/dedupe_bars.py
+import sys
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.database import MongoDBConfig
+
+def duplicate_groups(collection):
+    """(symbol, timestamp) keys stored more than once, with their _ids oldest first"""
+    return collection.aggregate([
+        {'$sort': {'_id': 1}},
+        {'$group': {
+            '_id': {'symbol': '$symbol', 'timestamp': '$timestamp'},
+            'ids': {'$push': '$_id'},
+            'count': {'$sum': 1}
+        }},
+        {'$match': {'count': {'$gt': 1}}}
+    ], allowDiskUse=True)
+
+def dedupe_bars(collection_name, dry_run=False, keep="last", batch_size=1000):
+    """Remove duplicate bars and switch the collection to the unique (symbol, timestamp) index"""
+    print(f"🧹 Deduplicating bars in {collection_name}...")
+
+    db = MongoDBConfig()
+    if not db.connect():
+        print("❌ Cannot connect to MongoDB")
+        return
+
+    try:
+        collection = db.database[collection_name]
+        if db.is_timeseries(collection_name):
+            print("❌ Time-series collections do not support unique indexes")
+            return
+
+        groups = 0
+        extra_ids = []
+        removed = 0
+        for group in duplicate_groups(collection):
+            groups += 1
+            ids = group['ids']
+            extra_ids.extend(ids[:-1] if keep == "last" else ids[1:])
+            if len(extra_ids) >= batch_size and not dry_run:
+                removed += collection.delete_many({'_id': {'$in': extra_ids}}).deleted_count
+                extra_ids = []
+
+        if dry_run:
+            print(f"🔍 {groups} duplicated bars, {len(extra_ids)} extra documents (dry run)")
+            return
+        if extra_ids:
+            removed += collection.delete_many({'_id': {'$in': extra_ids}}).deleted_count
+        print(f"🗑️ Removed {removed} extra documents from {groups} duplicated bars")
+
+        if db.ensure_unique_index(collection):
+            print("✅ Unique (symbol, timestamp) index is in place")
+        else:
+            print("⚠️ Unique index was not created, new duplicates appeared - run again")
+
+    except Exception as e:
+        print(f"❌ Error deduplicating bars: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove duplicate (symbol, timestamp) bars")
+    parser.add_argument("collection", help="Symbol collection, e.g. btcusdt")
+    parser.add_argument("--keep", choices=["first", "last"], default="last",
+                        help="Which copy of a duplicated bar to keep (by insertion order)")
+    parser.add_argument("--dry-run", action="store_true", help="Only count duplicates")
+    args = parser.parse_args()
+
+    dedupe_bars(args.collection, args.dry_run, args.keep)
@@ -1,6 +1,7 @@
 # scripts/fresh_data_start.py
 import sys
 import asyncio
+import argparse
 from pathlib import Path
 from datetime import datetime, timedelta
 
@@ -9,91 +10,132 @@ root_dir = Path(__file__).parent.parent
 sys.path.append(str(root_dir))
 
 from src.data.data_manager import DataManager
+from src.core.coverage import CoverageIndex, COVERAGE_COLLECTION
 from config.database import MongoDBConfig
 
-async def main():
+def _bar_times(records):
+    """Bar timestamps of collected records (datetime or epoch milliseconds)"""
+    times = []
+    for record in records:
+        timestamp = record.get('timestamp')
+        if isinstance(timestamp, (int, float)):
+            timestamp = datetime.utcfromtimestamp(timestamp / 1000)
+        if isinstance(timestamp, datetime):
+            times.append(timestamp)
+    return times
+
+def collect(dm, coverage, symbol, interval, start_date, end_date, limit=1000, missing_only=True):
+    """Collect bars for the range, or only for the ranges missing from coverage"""
+    ranges = coverage.gaps(symbol, interval, start_date, end_date) if missing_only else [(start_date, end_date)]
+    if missing_only:
+        print(f"🕳️ {len(ranges)} missing ranges for {symbol} {interval}")
+
+    collected = []
+    for gap_start, gap_end in ranges:
+        print(f"   ⬇️ {gap_start} -> {gap_end}")
+        records = dm.collect_data(
+            "binance",
+            symbol=symbol,
+            interval=interval,
+            limit=limit,
+            start_time=gap_start,
+            end_time=gap_end
+        )
+        collected.extend(records or [])
+    return collected
+
+async def main(symbol="BTCUSDT", interval="1h", days=365, missing_only=True):
     print("🔄 Starting fresh data collection...")
-    
-    # 1. First, ensure collection is empty
+
     db = MongoDBConfig()
     if not db.connect():
         print("❌ Cannot connect to MongoDB")
         return
-    
+
     try:
-        collection = db.database["BTCUSDT"]
+        collection = db.database[symbol]
+        coverage = CoverageIndex(lambda: db.database[COVERAGE_COLLECTION])
         count = collection.count_documents({})
-        
-        if count > 0:
-            print(f"⚠️ Collection BTCUSDT still has {count} documents")
+
+        if missing_only:
+            # 1. Coverage of what is already stored
+            if count > 0 and not coverage.ranges(symbol, interval):
+                print(f"🗺️ Building coverage from {count} stored documents...")
+                coverage.rebuild(collection, symbol, interval)
+        elif count > 0:
+            # 1. Full re-pull needs an empty collection
+            print(f"⚠️ Collection {symbol} still has {count} documents")
             choice = input("Clear collection? (y/n): ")
             if choice.lower() == 'y':
                 result = collection.delete_many({})
                 print(f"🗑️ Cleared {result.deleted_count} documents")
+                coverage.rebuild(collection, symbol, interval)
             else:
                 print("❌ Aborting - collection not empty")
                 return
+
+        # 2. Start data collection
+        dm = DataManager()
+
+        print("📊 Collecting historical data...")
+
+        # Get realistic date range (last 1-2 years)
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days)
+
+        fresh_data = collect(dm, coverage, symbol, interval, start_date, end_date,
+                             limit=1000, missing_only=missing_only)
+
+        if not fresh_data:
+            print("✅ Nothing to collect, data is up to date" if missing_only else "❌ No data collected from Binance")
+            return
+
+        print(f"✅ Collected {len(fresh_data)} fresh records")
+
+        # Check timestamps
+        if fresh_data and 'timestamp' in fresh_data[0]:
+            print(f"📅 Time range: {fresh_data[0]['timestamp']} to {fresh_data[-1]['timestamp']}")
+
+        # 3. Process and store
+        print("⚙️ Processing data...")
+        try:
+            processed_data = dm.process_data(
+                fresh_data,
+                ["cleaning", "feature_engineering"]
+            )
+
+            print("💾 Saving to database...")
+            success = dm.store_data(
+                processed_data,
+                "mongo",
+                collection_name=symbol
+            )
+
+            if success:
+                coverage.add_points(symbol, interval, _bar_times(fresh_data))
+                coverage.flush()
+                print("🎉 Fresh data collection completed!")
+
+                # Verify storage
+                new_count = collection.count_documents({})
+                print(f"📊 New document count: {new_count}")
+            else:
+                print("❌ Failed to save data")
+
+        except Exception as e:
+            print(f"❌ Error during processing: {e}")
+            import traceback
+            traceback.print_exc()
     finally:
         db.close()
-    
-    # 2. Start fresh data collection
-    dm = DataManager()
-    
-    print("📊 Collecting fresh historical data...")
-    
-    # Get realistic date range (last 1-2 years)
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=365)  # 1 year history
-    
-    fresh_data = dm.collect_data(
-        "binance",
-        symbol="BTCUSDT",
-        interval="1h",
-        limit=1000,  # Start with smaller amount
-        start_time=start_date,
-        end_time=end_date
-    )
-    
-    if not fresh_data:
-        print("❌ No data collected from Binance")
-        return
-    
-    print(f"✅ Collected {len(fresh_data)} fresh records")
-    
-    # Check timestamps
-    if fresh_data and 'timestamp' in fresh_data[0]:
-        print(f"📅 Time range: {fresh_data[0]['timestamp']} to {fresh_data[-1]['timestamp']}")
-    
-    # 3. Process and store
-    print("⚙️ Processing data...")
-    try:
-        processed_data = dm.process_data(
-            fresh_data,
-            ["cleaning", "feature_engineering"]
-        )
-        
-        print("💾 Saving to database...")
-        success = dm.store_data(
-            processed_data,
-            "mongo",
-            collection_name="BTCUSDT"
-        )
-        
-        if success:
-            print("🎉 Fresh data collection completed!")
-            
-            # Verify storage
-            db.connect()
-            new_count = db.database["BTCUSDT"].count_documents({})
-            print(f"📊 New document count: {new_count}")
-            db.close()
-        else:
-            print("❌ Failed to save data")
-            
-    except Exception as e:
-        print(f"❌ Error during processing: {e}")
-        import traceback
-        traceback.print_exc()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Collect historical data into MongoDB")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--interval", default="1h")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--full", action="store_true",
+                        help="Re-pull the whole window instead of only the missing ranges")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.symbol, args.interval, args.days, missing_only=not args.full))
@@ -0,0 +1,54 @@
+# scripts/index_stats.py
+import sys
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from tabulate import tabulate
+from config.database import MongoDBConfig
+
+def index_stats(collection_name=None, ensure=False):
+    """Show index usage statistics for symbol collections"""
+    print("📇 Collecting index usage statistics...")
+
+    db = MongoDBConfig()
+    if not db.connect():
+        print("❌ Cannot connect to MongoDB")
+        return
+
+    try:
+        if ensure:
+            names = [collection_name] if collection_name else db.database.list_collection_names()
+            for name in names:
+                if not name.startswith('system.'):
+                    db.get_collection(name)
+            print(f"✅ Indexes ensured for {len(names)} collections")
+
+        stats = db.index_stats(collection_name)
+        if not stats:
+            print("ℹ️ No indexes found")
+            return
+
+        rows = [
+            [s['collection'], s['index'], s['key'], s['ops'], s['since']]
+            for s in stats
+        ]
+        print(tabulate(rows, headers=["Collection", "Index", "Key", "Ops", "Since"]))
+
+        unused = [s for s in stats if s['ops'] == 0 and s['index'] != '_id_']
+        if unused:
+            print(f"⚠️ {len(unused)} indexes have not been used since last restart")
+
+    except Exception as e:
+        print(f"❌ Error collecting index stats: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MongoDB index usage statistics")
+    parser.add_argument("--collection", help="Single collection to inspect")
+    parser.add_argument("--ensure", action="store_true",
+                        help="Create missing indexes before reporting")
+    args = parser.parse_args()
+
+    index_stats(args.collection, args.ensure)
@@ -0,0 +1,166 @@
+# scripts/migrate_to_timeseries.py
+import sys
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.database import MongoDBConfig
+
+STATE_COLLECTION = "_migrations"
+LEGACY_SUFFIX = "_legacy"
+
+def _to_timeseries_document(doc, collection_name):
+    """Convert a legacy document for time-series storage (timestamp is required)"""
+    timestamp = doc.get('timestamp') or doc.get('time')
+    if not isinstance(timestamp, datetime):
+        return None
+
+    doc['timestamp'] = timestamp
+    doc.setdefault('symbol', collection_name.upper())
+    return doc
+
+def migrate_collection(db, collection_name, batch_size, granularity, drop_legacy):
+    """Resumable copy of one collection into a time-series collection"""
+    state_collection = db.database[STATE_COLLECTION]
+    state_id = f"timeseries:{collection_name}"
+    legacy_name = f"{collection_name}{LEGACY_SUFFIX}"
+
+    state = state_collection.find_one({'_id': state_id})
+    if state and state['status'] == 'done':
+        print(f"ℹ️ {collection_name} already migrated")
+        return
+
+    if state is None:
+        if db.is_timeseries(collection_name):
+            print(f"ℹ️ {collection_name} is already a time-series collection")
+            return
+
+        state = {
+            '_id': state_id,
+            'legacy': legacy_name,
+            'last_id': None,
+            'copied': 0,
+            'skipped': 0,
+            'status': 'copying',
+            'started_at': datetime.utcnow()
+        }
+        state_collection.insert_one(state)
+    else:
+        print(f"🔁 Resuming {collection_name} after {state['copied']:,} documents")
+
+    # Time-series коллекции нельзя переименовать, поэтому
+    # переименовываем исходную и создаем новую под старым именем
+    if db.get_collection_type(legacy_name) is None:
+        if db.get_collection_type(collection_name) != 'collection':
+            print(f"❌ {collection_name} not found")
+            return
+        db.database[collection_name].rename(legacy_name)
+        print(f"📦 {collection_name} renamed to {legacy_name}")
+    if not db.is_timeseries(collection_name):
+        db.create_timeseries_collection(collection_name, granularity)
+
+    legacy = db.database[state['legacy']]
+    target = db.database[collection_name]
+    resumed = state['last_id'] is not None
+    started = time.time()
+    copied_now = 0
+
+    while True:
+        query = {'_id': {'$gt': state['last_id']}} if state['last_id'] is not None else {}
+        batch = list(legacy.find(query).sort('_id', 1).limit(batch_size))
+        if not batch:
+            break
+
+        documents = []
+        for doc in batch:
+            converted = _to_timeseries_document(doc, collection_name)
+            if converted is None:
+                state['skipped'] += 1
+            else:
+                documents.append(converted)
+
+        if resumed and documents:
+            # Первая пачка после сбоя могла быть частично записана
+            ids = [doc['_id'] for doc in documents]
+            existing = {doc['_id'] for doc in target.find({'_id': {'$in': ids}}, {'_id': 1})}
+            documents = [doc for doc in documents if doc['_id'] not in existing]
+            resumed = False
+
+        if documents:
+            target.insert_many(documents, ordered=False)
+
+        state['last_id'] = batch[-1]['_id']
+        state['copied'] += len(documents)
+        copied_now += len(documents)
+        state_collection.update_one(
+            {'_id': state_id},
+            {'$set': {
+                'last_id': state['last_id'],
+                'copied': state['copied'],
+                'skipped': state['skipped'],
+                'updated_at': datetime.utcnow()
+            }}
+        )
+
+        elapsed = time.time() - started
+        rate = copied_now / elapsed if elapsed > 0 else 0
+        print(f"   {collection_name}: {state['copied']:,} copied ({rate:,.0f} docs/s)")
+
+    legacy_count = legacy.count_documents({})
+    if state['copied'] + state['skipped'] < legacy_count:
+        print(f"❌ {collection_name}: copied {state['copied']} + skipped {state['skipped']} "
+              f"< {legacy_count} legacy documents, keeping migration open")
+        return
+
+    state_collection.update_one(
+        {'_id': state_id},
+        {'$set': {'status': 'done', 'finished_at': datetime.utcnow()}}
+    )
+    print(f"✅ {collection_name}: {state['copied']:,} documents migrated, {state['skipped']} skipped")
+
+    if drop_legacy:
+        legacy.drop()
+        print(f"🗑️ Dropped {state['legacy']}")
+
+def migrate_to_timeseries(collections, batch_size, granularity, drop_legacy):
+    """Migrate symbol collections to native time-series storage"""
+    print("🔄 Migrating collections to time-series storage...")
+
+    db = MongoDBConfig()
+    if not db.connect():
+        print("❌ Cannot connect to MongoDB")
+        return
+
+    try:
+        if not collections:
+            collections = [
+                name for name in db.database.list_collection_names()
+                if not name.startswith(('system.', '_'))
+                and not name.endswith(LEGACY_SUFFIX)
+                and not db.is_timeseries(name)
+            ]
+
+        for collection_name in collections:
+            migrate_collection(db, collection_name, batch_size, granularity, drop_legacy)
+
+        print("🎉 Migration finished")
+
+    except Exception as e:
+        print(f"❌ Error during migration: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate symbol collections to time-series")
+    parser.add_argument("collections", nargs="*", help="Collections to migrate (all if empty)")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--granularity", choices=["seconds", "minutes", "hours"], default=None)
+    parser.add_argument("--drop-legacy", action="store_true",
+                        help="Drop the renamed source collection after a verified copy")
+    args = parser.parse_args()
+
+    migrate_to_timeseries(args.collections, args.batch_size, args.granularity, args.drop_legacy)
@@ -1,37 +1,46 @@
 # scripts/prepare_ml_data.py
 import sys
+import time
+import argparse
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
-import pandas as pd
+from datetime import datetime, timedelta
 from config.database import MongoDBConfig
-from src.data.processors.feature_engineer import FeatureEngineer
+from src.ml.dataset import export_dataset, iter_collection_frames
 
-def prepare_ml_data():
-    """Prepare data for machine learning"""
+def prepare_ml_data(symbol="BTCUSDT", output="data/ml_dataset", chunk_rows=10000, days=None):
+    """Stream data from MongoDB through feature engineering into a memory-mapped dataset"""
     print("📊 Preparing data for ML...")
     
-    # Load data from MongoDB
     db = MongoDBConfig()
-    db.connect()
+    if not db.connect():
+        print("❌ Cannot connect to MongoDB")
+        return
     
-    data = list(db.database["BTCUSDT"].find().sort("timestamp", 1))
-    df = pd.DataFrame(data)
-    
-    print(f"📈 Loaded {len(df)} records for ML preparation")
-    
-    # Feature engineering
-    engineer = FeatureEngineer()
-    ml_data = engineer.process(df)
-    
-    print(f"🎯 ML features shape: {ml_data.shape}")
-    print(f"📋 Features: {list(ml_data.columns)}")
-    
-    # Save prepared data
-    ml_data.to_csv("data/ml_ready_data.csv", index=False)
-    print("💾 ML data saved to data/ml_ready_data.csv")
-    
-    db.close()
+    try:
+        query = {}
+        if days is not None:
+            query['timestamp'] = {'$gte': datetime.utcnow() - timedelta(days=days)}
+        
+        started = time.time()
+        chunks = iter_collection_frames(db.database[symbol], query, chunk_rows)
+        meta = export_dataset(chunks, output)
+        
+        print(f"🎯 ML dataset: {meta['rows']:,} rows x {len(meta['feature_columns'])} features "
+              f"in {time.time() - started:.1f}s")
+        print(f"📋 Features: {meta['feature_columns']}")
+        print(f"💾 ML data saved to {output}")
+    finally:
+        db.close()
 
 if __name__ == "__main__":
-    prepare_ml_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Export ML-ready dataset from MongoDB")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--output", default="data/ml_dataset")
+    parser.add_argument("--chunk-rows", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=None,
+                        help="Export only the last N days (all if omitted)")
+    args = parser.parse_args()
+    
+    prepare_ml_data(args.symbol, args.output, args.chunk_rows, args.days)
@@ -3,31 +3,20 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
-import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
 import joblib
+from src.ml.dataset import load_dataset
 
-def train_model():
+def train_model(dataset_path="data/ml_dataset"):
     """Train first ML model"""
     print("🤖 Training first ML model...")
     
-    # Load prepared data
-    df = pd.read_csv("data/ml_ready_data.csv")
+    # Memory-mapped features and target (predict if price will go up next period)
+    dataset = load_dataset(dataset_path)
+    print(f"📈 Loaded {len(dataset):,} rows, features: {dataset.feature_columns}")
     
-    # Prepare features and target
-    # Example: predict if price will go up (1) or down (0) next period
-    df['target'] = (df['close'].shift(-1) > df['close']).astype(int)
-    df = df.dropna()
-    
-    features = ['open', 'high', 'low', 'close', 'volume', 'returns', 'volatility']
-    features = [f for f in features if f in df.columns]
-    
-    X = df[features]
-    y = df['target']
-    
-    # Train/test split
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Chronological train/test split, slices of the memmap
+    X_train, X_test, y_train, y_test = dataset.split(test_size=0.2)
     
     # Train model
     model = RandomForestClassifier(n_estimators=100, random_state=42)
@@ -0,0 +1,248 @@
+"""
+Async Data Manager - асинхронное управление данными Hydra для asyncio
+"""
+
+import asyncio
+import pandas as pd
+from typing import Dict, Any, List, Optional, Iterable
+from datetime import datetime
+from collections import deque
+
+from src.core.system_config import CONFIG
+from src.core.data_manager import DataManager, _FrameBuilder
+from src.core.schema import SchemaRegistry, SCHEMA_COLLECTION, metrics_from_document
+from src.utils.logger import setup_logger
+from config.database import AsyncMongoDBConfig, get_collection
+
+# Логгер
+logger = setup_logger(__name__)
+
+class AsyncDataManager:
+    """
+    Асинхронный аналог DataManager на motor
+
+    Запросы не блокируют event loop, а число одновременных операций
+    ограничено семафором, так что можно параллельно писать и читать
+    десятки символов в одном процессе.
+
+    В отличие от DataManager, запись только вставляет документ: OHLCV
+    агрегаты, индекс покрытия, кэш запросов и Parquet кэш не обновляются,
+    а режим upsert (MONGODB_UNIQUE_BARS) не применяется. Бары, которые
+    должны попасть в агрегаты и покрытие, пишутся через DataManager.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None,
+                 schemas: Optional[SchemaRegistry] = None):
+        """
+        Args:
+            max_concurrency: Максимум одновременных операций с MongoDB
+                             (CONFIG.max_workers * 4 если None)
+            schemas: Реестр схем метрик (общий с DataManager, свой если None)
+        """
+        self.config = CONFIG
+        self.max_concurrency = max_concurrency or self.config.max_workers * 4
+        self.db = AsyncMongoDBConfig(max_pool_size=self.max_concurrency)
+        # Семафор создается в работающем цикле (см. _semaphore)
+        self._semaphore_obj: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+        self.schemas = schemas or SchemaRegistry(lambda: get_collection(SCHEMA_COLLECTION))
+
+        # Очереди для реального времени
+        self.realtime_queues = {
+            'metrics': deque(maxlen=1000),
+            'signals': deque(maxlen=500),
+            'errors': deque(maxlen=100)
+        }
+
+        logger.info(f"AsyncDataManager initialized with concurrency limit: {self.max_concurrency}")
+
+    @property
+    def _semaphore(self) -> asyncio.Semaphore:
+        """Семафор текущего цикла: в Python 3.9 он привязан к циклу создания"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore_obj = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore_obj
+
+    async def _get_collection(self, collection_name: str):
+        """Получение коллекции с обработкой ошибок"""
+        try:
+            return await self.db.get_collection(collection_name)
+        except Exception as e:
+            logger.error(f"Failed to get collection {collection_name}: {e}")
+            return None
+
+    async def _get_schema(self, symbol: str, required: bool = False):
+        """Схема символа; первое обращение к реестру идет вне event loop"""
+        return await asyncio.to_thread(self.schemas.get, symbol, required)
+    
+    def _record_error(self, error: Exception, operation: str) -> None:
+        """Запись ошибки в очередь ошибок"""
+        self.realtime_queues['errors'].append({
+            'timestamp': datetime.utcnow(),
+            'error': str(error),
+            'operation': operation
+        })
+
+    async def save_metrics(self, metrics_data: Dict[str, Any], symbol: str = "BTCUSDT") -> bool:
+        """
+        Сохранение метрик в MongoDB
+
+        Args:
+            metrics_data: Данные метрик
+            symbol: Торговый символ
+
+        Returns:
+            True если успешно, False если ошибка
+        """
+        try:
+            schema = await self._get_schema(symbol, required=True)
+            document = DataManager._build_metrics_document(metrics_data, symbol, schema)
+
+            async with self._semaphore:
+                collection = await self._get_collection(symbol.lower())
+                if collection is None:
+                    return False
+
+                await collection.insert_one(document)
+
+            self.realtime_queues['metrics'].append({
+                'id': str(document['_id']),
+                'timestamp': document['timestamp'],
+                'symbol': symbol,
+                **metrics_from_document(document)
+            })
+
+            logger.debug(f"Metrics saved for {symbol}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error saving metrics: {e}")
+            self._record_error(e, 'save_metrics')
+            return False
+
+    async def get_latest_metrics(self, symbol: str = "BTCUSDT", limit: int = 10) -> List[Dict]:
+        """
+        Получение последних метрик
+
+        Args:
+            symbol: Торговый символ
+            limit: Количество записей
+
+        Returns:
+            Список последних метрик
+        """
+        try:
+            async with self._semaphore:
+                collection = await self._get_collection(symbol.lower())
+                if collection is None:
+                    return []
+
+                cursor = collection.find(
+                    {'symbol': symbol},
+                    sort=[('timestamp', -1)],
+                    limit=limit
+                )
+
+                return [{
+                    'timestamp': doc['timestamp'],
+                    'metrics': metrics_from_document(doc),
+                    'id': str(doc['_id'])
+                } async for doc in cursor]
+
+        except Exception as e:
+            logger.error(f"Error getting metrics: {e}")
+            return []
+
+    async def get_historical_data(self, symbol: str,
+                                  start_time: datetime,
+                                  end_time: datetime,
+                                  batch_size: Optional[int] = None) -> pd.DataFrame:
+        """
+        Получение исторических данных одним потоковым запросом
+
+        Args:
+            symbol: Торговый символ
+            start_time: Начальное время
+            end_time: Конечное время
+            batch_size: Размер батча курсора (авто если None)
+
+        Returns:
+            DataFrame с историческими данными
+        """
+        if batch_size is None:
+            batch_size = self.config.batch_sizes['historical']
+
+        try:
+            schema = await self._get_schema(symbol)
+
+            async with self._semaphore:
+                collection = await self._get_collection(symbol.lower())
+                if collection is None:
+                    return pd.DataFrame()
+
+                cursor = collection.find(
+                    DataManager._range_query(symbol, start_time, end_time),
+                    projection=DataManager._projection(schema=schema),
+                    sort=[('timestamp', 1)],
+                    batch_size=batch_size
+                )
+
+                builder = _FrameBuilder(schema)
+                async for doc in cursor:
+                    builder.add(doc)
+
+            # Сборку DataFrame выносим из event loop
+            df = await asyncio.to_thread(builder.to_frame)
+            if not df.empty:
+                logger.info(f"Loaded {len(df)} historical records for {symbol}")
+            return df
+
+        except Exception as e:
+            logger.error(f"Error loading historical data: {e}")
+            return pd.DataFrame()
+
+    async def get_historical_many(self, symbols: Iterable[str],
+                                  start_time: datetime,
+                                  end_time: datetime) -> Dict[str, pd.DataFrame]:
+        """
+        Параллельная загрузка истории по нескольким символам
+
+        Args:
+            symbols: Торговые символы
+            start_time: Начальное время
+            end_time: Конечное время
+
+        Returns:
+            Словарь символ -> DataFrame
+        """
+        symbols = list(symbols)
+        frames = await asyncio.gather(*(
+            self.get_historical_data(symbol, start_time, end_time) for symbol in symbols
+        ))
+        return dict(zip(symbols, frames))
+
+    def get_realtime_queue(self, queue_name: str) -> deque:
+        """
+        Получение очереди реального времени
+
+        Args:
+            queue_name: Имя очереди (metrics, signals, errors)
+
+        Returns:
+            Очередь данных
+        """
+        return self.realtime_queues.get(queue_name, deque())
+
+    def close(self) -> None:
+        """Закрытие подключения"""
+        self.db.close()
+
+    async def __aenter__(self):
+        """Асинхронный контекстный менеджер"""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Асинхронный контекстный менеджер - выход"""
+        self.close()
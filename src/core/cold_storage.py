@@ -0,0 +1,195 @@
+"""
+Cold Storage - сжатый колоночный архив старых данных с манифестом диапазонов
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import pandas as pd
+
+from src.core.parquet_store import PYARROW_AVAILABLE, concat_tables
+from src.utils.logger import setup_logger
+
+# Логгер
+logger = setup_logger(__name__)
+
+if PYARROW_AVAILABLE:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+MANIFEST_FILE = "manifest.json"
+
+class ColdStorageArchive:
+    """
+    Архив в zstd Parquet файлах: <root>/<symbol>/<file>.parquet + manifest.json
+
+    Манифест хранит для каждого файла диапазон timestamp и число строк,
+    поэтому чтение диапазона открывает только пересекающиеся файлы.
+    """
+
+    def __init__(self, root: str, compression: str = "zstd",
+                 compression_level: Optional[int] = None):
+        """
+        Args:
+            root: Корневая директория архива
+            compression: Кодек Parquet
+            compression_level: Уровень сжатия (по умолчанию кодека если None)
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow is required for ColdStorageArchive, install hydra[full]")
+
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        self._manifests: Dict[str, List[Dict[str, Any]]] = {}
+
+    def _symbol_dir(self, symbol: str) -> Path:
+        return self.root / symbol
+
+    def load_manifest(self, symbol: str) -> List[Dict[str, Any]]:
+        """Записи манифеста символа (кэшируются в памяти)"""
+        if symbol not in self._manifests:
+            path = self._symbol_dir(symbol) / MANIFEST_FILE
+            entries = []
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)['files']
+                for entry in entries:
+                    entry['start'] = datetime.fromisoformat(entry['start'])
+                    entry['end'] = datetime.fromisoformat(entry['end'])
+            self._manifests[symbol] = entries
+        return self._manifests[symbol]
+
+    def _save_manifest(self, symbol: str) -> None:
+        """Атомарная запись манифеста"""
+        path = self._symbol_dir(symbol) / MANIFEST_FILE
+        tmp_path = path.with_suffix(".json.tmp")
+        entries = [
+            {**entry, 'start': entry['start'].isoformat(), 'end': entry['end'].isoformat()}
+            for entry in self._manifests[symbol]
+        ]
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'symbol': symbol, 'files': entries}, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def has_file(self, symbol: str, name: str) -> bool:
+        """Записан ли файл с таким именем"""
+        return any(entry['file'] == name for entry in self.load_manifest(symbol))
+
+    def write_range(self, symbol: str, df: pd.DataFrame,
+                    name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Запись диапазона в новый сжатый файл
+
+        Args:
+            symbol: Торговый символ
+            df: Данные в формате get_historical_data
+            name: Имя файла (по диапазону времени если None)
+
+        Returns:
+            Запись манифеста или None для пустого DataFrame
+        """
+        if df.empty:
+            return None
+
+        df = df.sort_values('timestamp', kind='stable')
+        start = pd.Timestamp(df['timestamp'].iloc[0]).to_pydatetime()
+        end = pd.Timestamp(df['timestamp'].iloc[-1]).to_pydatetime()
+        name = name or f"{start:%Y%m%dT%H%M%S}_{end:%Y%m%dT%H%M%S}"
+        file_name = f"{name}.parquet"
+
+        symbol_dir = self._symbol_dir(symbol)
+        symbol_dir.mkdir(parents=True, exist_ok=True)
+        path = symbol_dir / file_name
+        tmp_path = symbol_dir / f"{file_name}.tmp"
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(
+            table, tmp_path,
+            compression=self.compression,
+            compression_level=self.compression_level
+        )
+        os.replace(tmp_path, path)
+
+        entry = {
+            'file': file_name,
+            'start': start,
+            'end': end,
+            'rows': table.num_rows,
+            'bytes': path.stat().st_size
+        }
+        with self._lock:
+            entries = [e for e in self.load_manifest(symbol) if e['file'] != file_name]
+            entries.append(entry)
+            entries.sort(key=lambda e: e['start'])
+            self._manifests[symbol] = entries
+            self._save_manifest(symbol)
+
+        logger.debug(f"Archived {entry['rows']} rows of {symbol} to {file_name} ({entry['bytes']} bytes)")
+        return entry
+
+    def file_rows(self, symbol: str, name: str) -> int:
+        """Число строк в файле по метаданным Parquet (для проверки записи)"""
+        path = self._symbol_dir(symbol) / name
+        if not path.exists():
+            return 0
+        return pq.read_metadata(path).num_rows
+
+    def files_for_range(self, symbol: str, start_time: datetime,
+                        end_time: datetime) -> List[Dict[str, Any]]:
+        """Файлы, пересекающиеся с полуоткрытым диапазоном [start, end)"""
+        return [
+            entry for entry in self.load_manifest(symbol)
+            if entry['start'] < end_time and entry['end'] >= start_time
+        ]
+
+    def coverage(self, symbol: str) -> Optional[Tuple[datetime, datetime]]:
+        """Общий диапазон архива символа"""
+        entries = self.load_manifest(symbol)
+        if not entries:
+            return None
+        return min(e['start'] for e in entries), max(e['end'] for e in entries)
+
+    def read_range(self, symbol: str, start_time: datetime, end_time: datetime,
+                   columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Чтение архивного диапазона только из пересекающихся файлов
+
+        Args:
+            symbol: Торговый символ
+            start_time: Начальное время
+            end_time: Конечное время
+            columns: Поля метрик (все если None)
+
+        Returns:
+            DataFrame в формате get_historical_data
+        """
+        filters = [('timestamp', '>=', start_time), ('timestamp', '<', end_time)]
+        tables = []
+
+        for entry in self.files_for_range(symbol, start_time, end_time):
+            path = self._symbol_dir(symbol) / entry['file']
+            read_columns = None
+            if columns is not None:
+                available = pq.read_schema(path, memory_map=True).names
+                read_columns = [c for c in ['timestamp', 'symbol', *columns] if c in available]
+
+            table = pq.read_table(path, columns=read_columns, filters=filters, memory_map=True)
+            if table.num_rows:
+                tables.append(table)
+
+        if not tables:
+            return pd.DataFrame()
+
+        df = concat_tables(tables).to_pandas()
+        if len(tables) > 1:
+            df = df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+        if columns is not None:
+            df = df.reindex(columns=['timestamp', 'symbol', *columns])
+        return df
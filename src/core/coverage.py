@@ -0,0 +1,357 @@
+"""
+Coverage Index - карта сохраненных диапазонов времени по символам и интервалам
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from src.core.rollups import parse_interval
+from src.utils.logger import setup_logger
+
+# Логгер
+logger = setup_logger(__name__)
+
+COVERAGE_COLLECTION = "_coverage"
+
+# Попыток записи ключа, если его параллельно изменил другой процесс
+FLUSH_RETRIES = 5
+
+Range = Tuple[datetime, datetime]
+
+# Изменение покрытия: ('add' | 'remove' | 'set', интервал или None - все интервалы, диапазоны)
+Change = Tuple[str, Optional[str], List[Tuple[Optional[datetime], datetime]]]
+
+def merge_ranges(ranges: Iterable[Range]) -> List[Range]:
+    """Объединение пересекающихся и смежных полуоткрытых диапазонов"""
+    merged: List[Range] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def subtract_ranges(ranges: Iterable[Range],
+                    removed: Iterable[Tuple[Optional[datetime], datetime]]) -> List[Range]:
+    """Вычитание диапазонов [start, end) (start None - с начала ряда)"""
+    result = list(ranges)
+    for cut_start, cut_end in removed:
+        kept: List[Range] = []
+        for start, end in result:
+            if start >= cut_end or (cut_start is not None and end <= cut_start):
+                kept.append((start, end))
+                continue
+            if cut_start is not None and start < cut_start:
+                kept.append((start, cut_start))
+            if end > cut_end:
+                kept.append((cut_end, end))
+        result = kept
+    return result
+
+def apply_changes(ranges: List[Range], changes: Iterable[Change], interval: str) -> List[Range]:
+    """Применение изменений по порядку к диапазонам ключа интервала"""
+    for kind, change_interval, change_ranges in changes:
+        if change_interval is not None and change_interval != interval:
+            continue
+        if kind == 'set':
+            ranges = merge_ranges(change_ranges)
+        elif kind == 'add':
+            ranges = merge_ranges([*ranges, *change_ranges])
+        else:
+            ranges = subtract_ranges(ranges, change_ranges)
+    return ranges
+
+class CoverageIndex:
+    """
+    Покрытие данных по (символ, интервал) в виде объединенных диапазонов
+
+    Бар с временем t интервала d покрывает [t, t + d). Изменения копятся
+    в памяти и сохраняются в COVERAGE_COLLECTION не чаще persist_interval
+    секунд (и при flush), чтобы запись метрик не превращалась в две
+    записи. Отметка баров не читает коллекцию. При сохранении изменения
+    накладываются на текущий документ ключа под проверкой версии, поэтому
+    несколько процессов (DataManager, fresh_data_start) не затирают
+    покрытие друг друга, а удаленные очисткой диапазоны снимаются.
+    """
+
+    def __init__(self, collection_getter: Optional[Callable[[], Any]] = None,
+                 persist_interval: float = 30.0,
+                 persist_on_write: bool = True):
+        """
+        Args:
+            collection_getter: Функция получения коллекции покрытия (только память если None)
+            persist_interval: Минимальный интервал сохранения в секундах
+            persist_on_write: Сохранять из add_range/add_points по истечении
+                              persist_interval (иначе владелец вызывает maybe_flush)
+        """
+        self.collection_getter = collection_getter
+        self.persist_interval = persist_interval
+        self.persist_on_write = persist_on_write
+        self._ranges: Dict[Tuple[str, str], List[Range]] = {}
+        # Несохраненные изменения по символам, в порядке применения
+        self._pending: Dict[str, List[Change]] = {}
+        # Ключи, чье сохраненное покрытие еще не прочитано
+        self._unloaded: set = set()
+        self._last_persist = time.monotonic()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key_id(symbol: str, interval: str) -> str:
+        return f"{symbol}:{interval}"
+
+    @staticmethod
+    def _stored_ranges(doc: Optional[Dict[str, Any]]) -> List[Range]:
+        return [(r['start'], r['end']) for r in doc['ranges']] if doc else []
+
+    def _collection(self):
+        if self.collection_getter is None:
+            return None
+        return self.collection_getter()
+
+    def _read(self, symbol: str, interval: str) -> List[Range]:
+        """Сохраненные диапазоны ключа (исключение, если коллекция недоступна)"""
+        collection = self._collection()
+        if collection is None:
+            if self.collection_getter is not None:
+                raise ConnectionError("coverage collection is unavailable")
+            return []
+        return self._stored_ranges(collection.find_one({'_id': self._key_id(symbol, interval)}))
+
+    def _record(self, symbol: str, change: Change) -> None:
+        """Изменение в памяти без обращения к коллекции"""
+        kind, interval, change_ranges = change
+        with self._lock:
+            changes = self._pending.setdefault(symbol, [])
+            if kind == 'add' and changes and changes[-1][0] == 'add' and changes[-1][1] == interval:
+                # Подряд идущие отметки сворачиваются - очередь не растет при недоступной базе
+                changes[-1] = ('add', interval, merge_ranges([*changes[-1][2], *change_ranges]))
+            else:
+                changes.append(change)
+
+            if interval is not None and (symbol, interval) not in self._ranges:
+                self._ranges[(symbol, interval)] = []
+                self._unloaded.add((symbol, interval))
+            for key in [key for key in self._ranges if key[0] == symbol]:
+                if interval is None or key[1] == interval:
+                    self._ranges[key] = apply_changes(self._ranges[key], [change], key[1])
+        if self.persist_on_write:
+            self.maybe_flush()
+
+    def ranges(self, symbol: str, interval: str) -> List[Range]:
+        """Покрытые диапазоны по возрастанию, сохраненные читаются до первого успеха"""
+        key = (symbol, interval)
+        with self._lock:
+            if key in self._ranges and key not in self._unloaded:
+                return list(self._ranges[key])
+
+        # Чтение вне блокировки, чтобы не задерживать отметку баров
+        try:
+            stored = self._read(symbol, interval)
+        except Exception as e:
+            # Сохраненное покрытие будет учтено при flush
+            logger.warning(f"Failed to load coverage for {symbol} {interval}: {e}")
+            with self._lock:
+                return list(self._ranges.get(key, []))
+
+        with self._lock:
+            self._ranges[key] = apply_changes(stored, self._pending.get(symbol, []), interval)
+            self._unloaded.discard(key)
+            return list(self._ranges[key])
+
+    def add_range(self, symbol: str, interval: str,
+                  start_time: datetime, end_time: datetime) -> None:
+        """Отметка диапазона [start, end) как сохраненного"""
+        if end_time <= start_time:
+            return
+        self._record(symbol, ('add', interval, [(start_time, end_time)]))
+
+    def add_points(self, symbol: str, interval: str, timestamps: Iterable[datetime]) -> None:
+        """
+        Отметка сохраненных баров
+
+        Подряд идущие бары сворачиваются в один диапазон до слияния.
+        """
+        step = parse_interval(interval)
+        runs: List[Range] = []
+        for timestamp in sorted(timestamps):
+            if runs and timestamp <= runs[-1][1]:
+                runs[-1] = (runs[-1][0], max(runs[-1][1], timestamp + step))
+            else:
+                runs.append((timestamp, timestamp + step))
+        if not runs:
+            return
+        self._record(symbol, ('add', interval, runs))
+
+    def remove_range(self, symbol: str, start_time: Optional[datetime], end_time: datetime,
+                     interval: Optional[str] = None) -> None:
+        """
+        Снятие покрытия [start, end) после удаления данных
+
+        Args:
+            symbol: Торговый символ
+            start_time: Начало (с начала ряда если None)
+            end_time: Конец
+            interval: Интервал (все интервалы символа если None)
+        """
+        if start_time is not None and end_time <= start_time:
+            return
+        self._record(symbol, ('remove', interval, [(start_time, end_time)]))
+
+    def gaps(self, symbol: str, interval: str,
+             start_time: datetime, end_time: datetime) -> List[Range]:
+        """
+        Непокрытые части диапазона [start, end)
+
+        Returns:
+            Список (start, end) по возрастанию
+        """
+        gaps: List[Range] = []
+        cursor = start_time
+        for start, end in self.ranges(symbol, interval):
+            if end <= cursor:
+                continue
+            if start >= end_time:
+                break
+            if start > cursor:
+                gaps.append((cursor, start))
+            cursor = max(cursor, end)
+        if cursor < end_time:
+            gaps.append((cursor, end_time))
+        return gaps
+
+    def is_covered(self, symbol: str, interval: str,
+                   start_time: datetime, end_time: datetime) -> bool:
+        """Покрыт ли диапазон целиком"""
+        return not self.gaps(symbol, interval, start_time, end_time)
+
+    def rebuild(self, source, symbol: str, interval: str,
+                timestamp_field: str = 'timestamp') -> List[Range]:
+        """
+        Построение покрытия по уже сохраненным данным
+
+        Args:
+            source: Коллекция с барами символа
+            symbol: Торговый символ
+            interval: Интервал баров
+            timestamp_field: Поле времени бара
+
+        Returns:
+            Покрытые диапазоны
+        """
+        step = parse_interval(interval)
+        runs: List[Range] = []
+        cursor = source.find({}, {'_id': 0, timestamp_field: 1}, sort=[(timestamp_field, 1)])
+        for doc in cursor:
+            timestamp = doc.get(timestamp_field)
+            if not isinstance(timestamp, datetime):
+                continue
+            if runs and timestamp <= runs[-1][1]:
+                runs[-1] = (runs[-1][0], max(runs[-1][1], timestamp + step))
+            else:
+                runs.append((timestamp, timestamp + step))
+
+        with self._lock:
+            self._pending.setdefault(symbol, []).append(('set', interval, list(runs)))
+            self._ranges[(symbol, interval)] = list(runs)
+            self._unloaded.discard((symbol, interval))
+        self.flush()
+        return list(runs)
+
+    def maybe_flush(self) -> None:
+        """Сохранение изменений, если с прошлого прошло persist_interval"""
+        if time.monotonic() - self._last_persist >= self.persist_interval:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Сохранение накопленных изменений в коллекцию
+
+        Returns:
+            Количество сохраненных ключей
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._last_persist = time.monotonic()
+
+        try:
+            collection = self._collection() if pending else None
+        except Exception as e:
+            logger.warning(f"Coverage collection is unavailable: {e}")
+            collection = None
+        if collection is None:
+            self._restore(pending)
+            return 0
+
+        saved = 0
+        for symbol, changes in pending.items():
+            try:
+                saved += self._flush_symbol(collection, symbol, changes)
+            except Exception as e:
+                # Изменения идемпотентны - повтор после частичной записи безопасен
+                logger.warning(f"Failed to persist coverage for {symbol}: {e}")
+                self._restore({symbol: changes})
+        return saved
+
+    def _restore(self, pending: Dict[str, List[Change]]) -> None:
+        """Возврат несохраненных изменений перед появившимися за время flush"""
+        with self._lock:
+            for symbol, changes in pending.items():
+                self._pending[symbol] = [*changes, *self._pending.get(symbol, [])]
+
+    def _flush_symbol(self, collection, symbol: str, changes: List[Change]) -> int:
+        """Запись изменений символа по всем затронутым интервалам"""
+        intervals = {interval for _, interval, _ in changes if interval is not None}
+        if any(interval is None for _, interval, _ in changes):
+            intervals.update(doc['interval'] for doc in collection.find({'symbol': symbol}, {'interval': 1}))
+
+        for interval in sorted(intervals):
+            ranges = self._write_key(collection, symbol, interval, changes)
+            with self._lock:
+                key = (symbol, interval)
+                if key in self._ranges:
+                    # Покрытие других процессов плюс изменения, пришедшие во время flush
+                    self._ranges[key] = apply_changes(ranges, self._pending.get(symbol, []), interval)
+                    self._unloaded.discard(key)
+        return len(intervals)
+
+    def _write_key(self, collection, symbol: str, interval: str, changes: List[Change]) -> List[Range]:
+        """
+        Наложение изменений на сохраненный документ ключа под проверкой версии
+
+        Raises:
+            RuntimeError: Документ менялся другими процессами все FLUSH_RETRIES попыток
+        """
+        key_id = self._key_id(symbol, interval)
+        for _ in range(FLUSH_RETRIES):
+            doc = collection.find_one({'_id': key_id})
+            stored = self._stored_ranges(doc)
+            ranges = apply_changes(stored, changes, interval)
+            if doc is not None and ranges == stored:
+                return ranges
+
+            version = doc.get('version', 0) if doc is not None else 0
+            try:
+                result = collection.replace_one(
+                    # Документы без версии (старый формат) совпадают с version None
+                    {'_id': key_id, 'version': version or None},
+                    {
+                        'symbol': symbol,
+                        'interval': interval,
+                        'ranges': [{'start': start, 'end': end} for start, end in ranges],
+                        'version': version + 1,
+                        'updated_at': datetime.utcnow()
+                    },
+                    upsert=doc is None
+                )
+            except DuplicateKeyError:
+                # Документ ключа параллельно создал другой процесс
+                continue
+            if result.matched_count or result.upserted_id is not None:
+                return ranges
+        raise RuntimeError(f"coverage for {symbol} {interval} kept changing during flush")
@@ -2,27 +2,205 @@
 Data Manager - Централизованное управление данными Hydra
 """
 
+import os
+import threading
 import time
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterator, Iterable, Sequence, Tuple, Union
+from datetime import date, datetime, timedelta
 from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from bson import ObjectId
 
 from src.core.system_config import CONFIG
+from src.core.cold_storage import ColdStorageArchive
+from src.core.coverage import CoverageIndex, COVERAGE_COLLECTION
+from src.core.journal import WriteAheadJournal
+from src.core.parquet_store import ParquetStore, PYARROW_AVAILABLE, day_start
+from src.core.query_cache import QueryCache
+from src.core.retention import RetentionJob
+from src.core.rollups import (
+    RollupEngine, date_trunc, metric_field, parse_interval, resample_ohlcv
+)
+from src.core.schema import (
+    MetricsSchema, SchemaRegistry, SCHEMA_COLLECTION, metrics_from_document
+)
+from src.core.write_buffer import BufferedWriter, bulk_upsert
 from src.utils.logger import setup_logger
-from config.database import get_collection
+from config.database import get_collection, get_database, mongodb_config
 
 # Логгер
 logger = setup_logger(__name__)
 
+# Снимок схем в директории журнала
+SCHEMA_SNAPSHOT_FILE = "schemas.json"
+
+# Поля, нужные для построения исторического DataFrame
+HISTORICAL_PROJECTION = {'_id': 0, 'timestamp': 1, 'symbol': 1, 'metrics': 1}
+
+# Операции DataManager.aggregate -> аккумуляторы $group
+AGGREGATE_OPS = {
+    'sum': '$sum',
+    'mean': '$avg',
+    'min': '$min',
+    'max': '$max',
+    'first': '$first',
+    'last': '$last',
+    'std': '$stdDevSamp'
+}
+AGGREGATE_SPECIAL_OPS = ('count', 'vwap')
+
+def _downcast_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Понижение float64 колонок до float32 (одинаково для всех чанков)"""
+    float_columns = df.select_dtypes(include='float64').columns
+    if len(float_columns):
+        df[float_columns] = df[float_columns].astype('float32')
+    return df
+
+class _FrameBuilder:
+    """
+    Построение DataFrame из потока документов
+    
+    Базовые поля копятся поколоночно, словари метрик - ссылками без
+    промежуточных плоских копий; раскладку метрик по колонкам делает
+    pandas за один проход. Со схемой поля раскладываются сразу в
+    типизированные колонки, а legacy документы с вложенным metrics
+    дают в них свои значения и, при необходимости, лишние колонки.
+    """
+    
+    def __init__(self, schema: Optional[MetricsSchema] = None):
+        self.schema = schema
+        self.timestamps: list = []
+        self.symbols: list = []
+        self.metrics: list = []
+        self.columns: Dict[str, list] = {name: [] for name in schema.fields} if schema else {}
+        self.extras: list = []
+        self.has_extras = False
+    
+    def add(self, doc: Dict[str, Any]) -> None:
+        """Добавление документа как строки"""
+        self.timestamps.append(doc['timestamp'])
+        self.symbols.append(doc['symbol'])
+        if self.schema is None:
+            self.metrics.append(metrics_from_document(doc))
+            return
+        
+        source = doc.get('metrics')
+        if source is None:
+            source = doc
+            self.extras.append(None)
+        else:
+            # Legacy документ: поля вне схемы уходят в отдельные колонки
+            extra = {k: v for k, v in source.items() if k not in self.columns}
+            self.extras.append(extra or None)
+            self.has_extras = self.has_extras or bool(extra)
+        
+        for name, values in self.columns.items():
+            values.append(source.get(name))
+    
+    def __len__(self) -> int:
+        return len(self.timestamps)
+    
+    def to_frame(self) -> pd.DataFrame:
+        """Сборка DataFrame из накопленных колонок"""
+        if not self.timestamps:
+            return pd.DataFrame()
+        
+        if self.schema is not None:
+            return self._typed_frame()
+        
+        df = pd.DataFrame(self.metrics)
+        # Как и раньше, одноименное поле метрик перекрывает базовое
+        if 'symbol' not in df.columns:
+            df.insert(0, 'symbol', self.symbols)
+        if 'timestamp' not in df.columns:
+            df.insert(0, 'timestamp', self.timestamps)
+        return df
+    
+    def _typed_frame(self) -> pd.DataFrame:
+        """DataFrame из типизированных колонок схемы"""
+        data = {'timestamp': self.timestamps, 'symbol': self.symbols}
+        for name, values in self.columns.items():
+            data[name] = self.schema.column(name, values)
+        df = pd.DataFrame(data)
+        
+        if self.has_extras:
+            extras = pd.DataFrame([extra or {} for extra in self.extras])
+            extras = extras.drop(columns=[c for c in extras.columns if c in df.columns])
+            df = pd.concat([df, extras], axis=1)
+        return df
+
+def documents_to_frame(docs: Iterable[Dict[str, Any]],
+                       schema: Optional[MetricsSchema] = None) -> pd.DataFrame:
+    """
+    Построение DataFrame в формате get_historical_data из документов метрик
+    
+    Args:
+        docs: Документы с полями timestamp, symbol и метриками
+        schema: Схема для типизированных колонок (типы pandas если None)
+    
+    Returns:
+        DataFrame с колонками timestamp, symbol и полями метрик
+    """
+    builder = _FrameBuilder(schema)
+    for doc in docs:
+        builder.add(doc)
+    return builder.to_frame()
+
 class DataManager:
     """Менеджер данных с оптимизацией под железо"""
     
-    def __init__(self):
+    def __init__(self, buffered_writes: bool = False, flush_interval: float = 1.0,
+                 parquet_dir: Optional[str] = None,
+                 cold_storage_dir: Optional[str] = None,
+                 rollup_intervals: Optional[Sequence[str]] = None,
+                 journal_dir: Optional[str] = None,
+                 upsert_writes: Optional[bool] = None):
+        """
+        Args:
+            buffered_writes: Копить метрики и писать пачками через BufferedWriter
+            flush_interval: Максимальная задержка сброса буфера в секундах
+            parquet_dir: Директория локального Parquet кэша истории
+                         (HYDRA_PARQUET_DIR если None, без кэша если не задана)
+            cold_storage_dir: Директория сжатого архива старых данных
+                              (HYDRA_COLD_STORAGE_DIR если None)
+            rollup_intervals: Интервалы OHLCV агрегатов, поддерживаемых при записи
+                              (HYDRA_ROLLUP_INTERVALS через запятую если None)
+            journal_dir: Директория локального журнала записи, через который
+                         save_metrics пишет без ожидания MongoDB
+                         (HYDRA_JOURNAL_DIR если None, без журнала если не задана)
+            upsert_writes: Писать бары апсертом по уникальному (symbol, timestamp),
+                           чтобы повторы и перекрывающиеся загрузки не давали
+                           дубликатов (MONGODB_UNIQUE_BARS если None)
+        """
         self.config = CONFIG
-        self.cache = {}
         self.cache_size_limit = self.config.memory_limits['data_cache']
-        self.current_cache_size = 0
+        self.cache = QueryCache(self.cache_size_limit)
+        self.last_cleanup_report: Dict[str, Dict[str, Any]] = {}
+        
+        # Идемпотентная запись баров (time-series коллекции не поддерживают
+        # уникальные индексы)
+        self.upsert_writes = mongodb_config.unique_bars if upsert_writes is None else upsert_writes
+        if self.upsert_writes and mongodb_config.timeseries_enabled:
+            logger.warning("Upsert writes are not supported for time-series storage, using inserts")
+            self.upsert_writes = False
+        
+        # Схемы метрик по символам (символы без схемы пишутся вложенным metrics);
+        # с журналом - и в локальный снимок для записи без MongoDB
+        journal_dir = journal_dir or os.getenv("HYDRA_JOURNAL_DIR")
+        self.schemas = SchemaRegistry(
+            lambda: get_collection(SCHEMA_COLLECTION),
+            snapshot_path=os.path.join(journal_dir, SCHEMA_SNAPSHOT_FILE) if journal_dir else None
+        )
+        
+        # Покрытие сохраненных баров по (символ, интервал); с журналом
+        # отметки только в памяти, сохранение - из фонового воспроизведения
+        self.coverage = CoverageIndex(
+            lambda: get_collection(COVERAGE_COLLECTION),
+            persist_on_write=not journal_dir
+        )
         
         # Очереди для реального времени
         self.realtime_queues = {
@@ -31,8 +209,63 @@ class DataManager:
             'errors': deque(maxlen=100)
         }
         
+        # Буфер пакетной записи (опционально)
+        self.write_buffer: Optional[BufferedWriter] = None
+        if buffered_writes:
+            self.write_buffer = BufferedWriter(
+                self._get_write_collection,
+                batch_size=self.config.batch_sizes['realtime'],
+                flush_interval=flush_interval,
+                upsert=self.upsert_writes,
+                on_written=self._on_written
+            )
+        
+        # Локальный Parquet уровень истории (опционально)
+        self.parquet_store: Optional[ParquetStore] = None
+        parquet_dir = parquet_dir or os.getenv("HYDRA_PARQUET_DIR")
+        if parquet_dir:
+            if PYARROW_AVAILABLE:
+                self.parquet_store = ParquetStore(parquet_dir)
+            else:
+                logger.warning("pyarrow is not installed, Parquet history cache disabled")
+        
+        # Холодный архив, из которого дочитываются архивированные диапазоны
+        self.cold_storage: Optional[ColdStorageArchive] = None
+        cold_storage_dir = cold_storage_dir or os.getenv("HYDRA_COLD_STORAGE_DIR")
+        if cold_storage_dir:
+            if PYARROW_AVAILABLE:
+                self.cold_storage = ColdStorageArchive(cold_storage_dir)
+            else:
+                logger.warning("pyarrow is not installed, cold storage archive disabled")
+        
+        # Материализованные OHLCV агрегаты (опционально)
+        self.rollups: Optional[RollupEngine] = None
+        if rollup_intervals is None:
+            env_intervals = os.getenv("HYDRA_ROLLUP_INTERVALS", "")
+            rollup_intervals = [i.strip() for i in env_intervals.split(",") if i.strip()]
+        if rollup_intervals:
+            self.rollups = RollupEngine(lambda name: get_database()[name], rollup_intervals)
+        
+        # Локальный журнал записи, воспроизводимый в MongoDB в фоне (опционально)
+        self.journal: Optional[WriteAheadJournal] = None
+        if journal_dir:
+            self.journal = WriteAheadJournal(
+                journal_dir,
+                self._get_write_collection,
+                batch_size=self.config.batch_sizes['realtime'],
+                on_replayed=self._on_replayed,
+                upsert=self.upsert_writes
+            )
+            # Снимок схем обновляется в фоне, запись из него не ждет MongoDB
+            threading.Thread(target=self.schemas.refresh, name="hydra-schema-refresh", daemon=True).start()
+        
         logger.info(f"DataManager initialized with cache limit: {self.cache_size_limit}MB")
     
+    @property
+    def current_cache_size(self) -> float:
+        """Текущий объем кэша запросов в MB"""
+        return self.cache.current_size / (1024 * 1024)
+    
     def _get_collection(self, collection_name: str):
         """Получение коллекции с обработкой ошибок"""
         try:
@@ -41,40 +274,164 @@ class DataManager:
             logger.error(f"Failed to get collection {collection_name}: {e}")
             return None
     
-    def save_metrics(self, metrics_data: Dict[str, Any], symbol: str = "BTCUSDT") -> bool:
+    def _get_write_collection(self, collection_name: str):
+        """Коллекция для записи; в режиме upsert - с уникальным индексом бара"""
+        collection = self._get_collection(collection_name)
+        if collection is not None and self.upsert_writes:
+            if not mongodb_config.ensure_unique_index(collection):
+                self._disable_upserts(collection_name)
+        return collection
+    
+    def _disable_upserts(self, collection_name: str) -> None:
+        """Переход на вставки, если уникальный индекс бара построить нельзя"""
+        logger.error(f"Unique bars are unavailable for {collection_name}, "
+                     f"falling back to inserts until duplicates are removed")
+        self.upsert_writes = False
+        if self.write_buffer is not None:
+            self.write_buffer.upsert = False
+        if self.journal is not None:
+            self.journal.upsert = False
+    
+    @staticmethod
+    def _build_metrics_document(metrics_data: Dict[str, Any], symbol: str,
+                                schema: Optional[MetricsSchema] = None,
+                                timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Формирование документа метрик с заранее назначенным _id
+        
+        Со схемой метрики проверяются, приводятся к типам и пишутся
+        плоскими полями, без схемы - вложенным metrics как раньше.
+        
+        Raises:
+            SchemaError: Метрики не соответствуют схеме
+        """
+        now = datetime.utcnow()
+        document = {
+            '_id': ObjectId(),
+            'timestamp': timestamp or now,
+            'symbol': symbol
+        }
+        if schema is None:
+            document['metrics'] = metrics_data
+        else:
+            document.update(schema.coerce(metrics_data))
+            document['schema_version'] = schema.version
+        document['processed'] = False
+        document['created_at'] = now
+        return document
+    
+    def _push_realtime_metrics(self, document: Dict[str, Any]) -> None:
+        """Добавление сохраняемого документа в очередь реального времени"""
+        self.realtime_queues['metrics'].append({
+            'id': str(document['_id']),
+            'timestamp': document['timestamp'],
+            'symbol': document['symbol'],
+            **metrics_from_document(document)
+        })
+    
+    def register_schema(self, symbol: str, fields: Dict[str, str],
+                        strict: bool = True) -> MetricsSchema:
+        """
+        Регистрация схемы метрик символа (например, OHLCV_FIELDS)
+        
+        Args:
+            symbol: Торговый символ
+            fields: Поля метрик и их типы
+            strict: Отклонять метрики с полями вне схемы
+        
+        Returns:
+            Актуальная схема
+        """
+        schema = self.schemas.register(symbol, fields, strict)
+        # Закэшированные кадры построены со старыми типами
+        self.cache.invalidate(symbol)
+        return schema
+    
+    def _update_rollups(self, documents: List[Dict[str, Any]]) -> None:
+        """Слияние записанных баров в OHLCV агрегаты, bulk_write на интервал (ошибка не отменяет запись)"""
+        if self.rollups is None or not documents:
+            return
+        try:
+            self.rollups.update_many(
+                (doc['symbol'], doc['timestamp'], metrics_from_document(doc)) for doc in documents
+            )
+        except Exception as e:
+            logger.warning(f"Failed to update rollups for {documents[0]['symbol']}: {e}")
+    
+    def _on_written(self, collection_name: str, documents: List[Dict[str, Any]]) -> None:
+        """Агрегаты для новых документов после успешного сброса буфера"""
+        self._update_rollups(documents)
+    
+    def _on_replayed(self, collection_name: str, documents: List[Dict[str, Any]]) -> None:
+        """Агрегаты, кэш и сохранение покрытия для документов, вставленных из журнала"""
+        self._update_rollups(documents)
+        for document in documents:
+            self._invalidate_history(document['symbol'], document['timestamp'])
+        self.coverage.maybe_flush()
+    
+    def _invalidate_history(self, symbol: str, timestamp: datetime) -> None:
+        """Сброс закэшированной истории, затронутой новой записью"""
+        self.cache.invalidate(symbol, timestamp)
+        if self.parquet_store is not None:
+            self.parquet_store.invalidate(symbol, timestamp)
+    
+    def save_metrics(self, metrics_data: Dict[str, Any], symbol: str = "BTCUSDT",
+                     interval: Optional[str] = None,
+                     timestamp: Optional[datetime] = None) -> bool:
         """
         Сохранение метрик в MongoDB
         
+        С журналом документ только дописывается в локальный журнал и
+        вставляется в MongoDB фоновым воспроизведением (агрегаты - после
+        вставки), а схема и покрытие берутся и отмечаются локально без
+        обращения к MongoDB. В буферизованном режиме документ только ставится в
+        очередь записи, а id можно дождаться через submit_metrics.
+        
         Args:
             metrics_data: Данные метрик
             symbol: Торговый символ
+            interval: Интервал бара для индекса покрытия (не учитывается если None)
+            timestamp: Время бара (текущее если None)
         
         Returns:
             True если успешно, False если ошибка
         """
         try:
-            collection = self._get_collection(symbol.lower())
-            if not collection:
-                return False
+            if self.journal is not None:
+                document = self._build_metrics_document(
+                    metrics_data, symbol, self.schemas.get_local(symbol), timestamp
+                )
+                self.journal.append(symbol.lower(), document)
+                self._invalidate_history(symbol, document['timestamp'])
+                if interval is not None:
+                    self.coverage.add_points(symbol, interval, [document['timestamp']])
+                self._push_realtime_metrics(document)
+                return True
             
-            document = {
-                'timestamp': datetime.utcnow(),
-                'symbol': symbol,
-                'metrics': metrics_data,
-                'processed': False,
-                'created_at': datetime.utcnow()
-            }
+            if self.write_buffer is not None:
+                self.submit_metrics(metrics_data, symbol, interval, timestamp)
+                return True
             
-            # Вставка с оптимизацией батча
-            result = collection.insert_one(document)
+            collection = self._get_write_collection(symbol.lower())
+            if collection is None:
+                return False
+            
+            document = self._build_metrics_document(
+                metrics_data, symbol, self.schemas.get(symbol, required=True), timestamp
+            )
+            if self.upsert_writes:
+                is_new = bool(bulk_upsert(collection, [document]).upserted_ids)
+            else:
+                collection.insert_one(document)
+                is_new = True
+            self._invalidate_history(symbol, document['timestamp'])
+            if is_new:
+                self._update_rollups([document])
+            if interval is not None:
+                self.coverage.add_points(symbol, interval, [document['timestamp']])
             
             # Добавляем в реальное время очередь
-            self.realtime_queues['metrics'].append({
-                'id': str(result.inserted_id),
-                'timestamp': document['timestamp'],
-                'symbol': symbol,
-                **metrics_data
-            })
+            self._push_realtime_metrics(document)
             
             logger.debug(f"Metrics saved for {symbol}")
             return True
@@ -88,6 +445,154 @@ class DataManager:
             })
             return False
     
+    def submit_metrics(self, metrics_data: Dict[str, Any], symbol: str = "BTCUSDT",
+                       interval: Optional[str] = None,
+                       timestamp: Optional[datetime] = None) -> Future:
+        """
+        Постановка метрик в буфер пакетной записи
+        
+        Очередь реального времени получает документ сразу, не дожидаясь сброса,
+        а покрытие и агрегаты обновляются после успешной записи.
+        
+        Args:
+            metrics_data: Данные метрик
+            symbol: Торговый символ
+            interval: Интервал бара для индекса покрытия (не учитывается если None)
+            timestamp: Время бара (текущее если None)
+        
+        Returns:
+            Future со строковым id документа после сброса буфера
+        
+        Raises:
+            RuntimeError: DataManager создан без buffered_writes
+        """
+        if self.write_buffer is None:
+            raise RuntimeError("Buffered writes are disabled for this DataManager")
+        
+        document = self._build_metrics_document(
+            metrics_data, symbol, self.schemas.get(symbol, required=True), timestamp
+        )
+        future = self.write_buffer.add(symbol.lower(), document)
+        self._invalidate_history(symbol, document['timestamp'])
+        self._push_realtime_metrics(document)
+        if interval is not None:
+            def _record_coverage(done: Future) -> None:
+                if done.exception() is None:
+                    self.coverage.add_points(symbol, interval, [document['timestamp']])
+            future.add_done_callback(_record_coverage)
+        return future
+    
+    def upsert_metrics(self, records: Iterable[Dict[str, Any]], symbol: str = "BTCUSDT",
+                       interval: Optional[str] = None) -> Dict[str, int]:
+        """
+        Идемпотентная пакетная запись баров с их собственным временем
+        
+        Бары пишутся неупорядоченными bulk апсертами по уникальному
+        (symbol, timestamp): повтор или перекрывающаяся загрузка не
+        создают дубликатов, а агрегаты обновляются только новыми барами.
+        
+        Args:
+            records: Метрики баров, у каждого поле timestamp (datetime)
+            symbol: Торговый символ
+            interval: Интервал баров для индекса покрытия (не учитывается если None)
+        
+        Returns:
+            Количество новых (upserted), найденных (matched) и измененных (modified) баров
+        
+        Raises:
+            ValueError: Запись без timestamp или time-series хранилище
+            ConnectionError: Коллекция недоступна
+        """
+        if mongodb_config.timeseries_enabled:
+            raise ValueError("Upsert writes are not supported for time-series storage")
+        
+        collection = self._get_collection(symbol.lower())
+        if collection is None:
+            raise ConnectionError(f"Collection {symbol.lower()} is unavailable")
+        mongodb_config.ensure_unique_index(collection)
+        
+        schema = self.schemas.get(symbol, required=True)
+        report = {'upserted': 0, 'matched': 0, 'modified': 0}
+        timestamps: List[datetime] = []
+        batch: List[Dict[str, Any]] = []
+        
+        def _write(documents: List[Dict[str, Any]]) -> None:
+            result = bulk_upsert(collection, documents)
+            report['upserted'] += result.upserted_count
+            report['matched'] += result.matched_count
+            report['modified'] += result.modified_count
+            self._update_rollups([documents[index] for index in sorted(result.upserted_ids)])
+        
+        for record in records:
+            metrics_data = dict(record)
+            timestamp = metrics_data.pop('timestamp', None)
+            if not isinstance(timestamp, datetime):
+                raise ValueError(f"Record without datetime timestamp: {record!r}")
+            batch.append(self._build_metrics_document(metrics_data, symbol, schema, timestamp))
+            timestamps.append(timestamp)
+            if len(batch) >= self.config.batch_sizes['realtime']:
+                _write(batch)
+                batch = []
+        if batch:
+            _write(batch)
+        
+        if timestamps:
+            self.cache.invalidate(symbol)
+            if self.parquet_store is not None:
+                for day in {day_start(timestamp.date()) for timestamp in timestamps}:
+                    self.parquet_store.invalidate(symbol, day)
+            if interval is not None:
+                self.coverage.add_points(symbol, interval, timestamps)
+        logger.info(f"Upserted {symbol} bars: {report}")
+        return report
+    
+    def flush(self) -> int:
+        """
+        Принудительный сброс буфера записи
+        
+        Returns:
+            Количество записанных документов
+        """
+        if self.write_buffer is None:
+            return 0
+        return self.write_buffer.flush()
+    
+    def close(self) -> None:
+        """Сброс и остановка буфера записи и журнала, сохранение индекса покрытия"""
+        if self.write_buffer is not None:
+            self.write_buffer.close()
+        if self.journal is not None:
+            self.journal.close()
+        self.coverage.flush()
+    
+    def get_journal_stats(self) -> Dict[str, Any]:
+        """
+        Метрики отставания локального журнала записи
+        
+        Returns:
+            pending_records, pending_bytes, oldest_pending_seconds и др.
+            (пустой словарь без журнала)
+        """
+        if self.journal is None:
+            return {}
+        return self.journal.stats()
+    
+    def missing_ranges(self, symbol: str, start_time: datetime,
+                       end_time: datetime, interval: str) -> List[Tuple[datetime, datetime]]:
+        """
+        Диапазоны без сохраненных баров интервала
+        
+        Args:
+            symbol: Торговый символ
+            start_time: Начальное время
+            end_time: Конечное время
+            interval: Интервал баров
+        
+        Returns:
+            Список (start, end), которые нужно догрузить
+        """
+        return self.coverage.gaps(symbol, interval, start_time, end_time)
+    
     def get_latest_metrics(self, symbol: str = "BTCUSDT", limit: int = 10) -> List[Dict]:
         """
         Получение последних метрик
@@ -101,7 +606,7 @@ class DataManager:
         """
         try:
             collection = self._get_collection(symbol.lower())
-            if not collection:
+            if collection is None:
                 return []
             
             cursor = collection.find(
@@ -114,7 +619,7 @@ class DataManager:
             for doc in cursor:
                 metrics.append({
                     'timestamp': doc['timestamp'],
-                    'metrics': doc['metrics'],
+                    'metrics': metrics_from_document(doc),
                     'id': str(doc['_id'])
                 })
             
@@ -127,15 +632,32 @@ class DataManager:
     def get_historical_data(self, symbol: str, 
                           start_time: datetime, 
                           end_time: datetime,
-                          batch_size: Optional[int] = None) -> pd.DataFrame:
+                          batch_size: Optional[int] = None,
+                          streaming: bool = True,
+                          use_cache: bool = True,
+                          columns: Optional[List[str]] = None,
+                          interval: Optional[str] = None) -> pd.DataFrame:
         """
-        Получение исторических данных батчами
+        Получение исторических данных
+        
+        По умолчанию выполняется один отсортированный запрос по диапазону,
+        курсор читается потоком и сразу раскладывается по колонкам.
+        Результаты кэшируются, диапазон внутри закэшированного
+        отдается срезом. Если настроен Parquet кэш, завершенные сутки
+        читаются с диска, а из MongoDB догружаются только недостающие.
+        Диапазоны, перенесенные в холодный архив, дочитываются из файлов,
+        пересекающихся с запросом. С interval возвращаются OHLCV бары,
+        собранные из самого крупного подходящего агрегата.
         
         Args:
             symbol: Торговый символ
             start_time: Начальное время
             end_time: Конечное время
-            batch_size: Размер батча (авто если None)
+            batch_size: Размер батча курсора (авто если None)
+            streaming: False - старый режим суточных окон с паузами
+            use_cache: Использовать кэш запросов
+            columns: Загружаемые поля метрик (все если None)
+            interval: Интервал OHLCV баров, например '5m' или '1d' (сырые данные если None)
         
         Returns:
             DataFrame с историческими данными
@@ -143,77 +665,499 @@ class DataManager:
         if batch_size is None:
             batch_size = self.config.batch_sizes['historical']
         
+        if interval is not None:
+            df = self._load_interval(symbol, start_time, end_time, interval, batch_size)
+            if columns is not None and not df.empty:
+                df = df.reindex(columns=['timestamp', 'symbol', *columns])
+            return df
+        
+        if use_cache:
+            cached = self.cache.get(symbol, start_time, end_time)
+            if cached is not None:
+                logger.debug(f"Cache hit for {symbol} [{start_time} - {end_time})")
+                if columns is not None:
+                    cached = cached.reindex(columns=['timestamp', 'symbol', *columns])
+                return cached
+        
         try:
             collection = self._get_collection(symbol.lower())
-            if not collection:
+            if collection is None:
                 return pd.DataFrame()
             
-            all_data = []
+            if self.parquet_store is not None and streaming:
+                df = self._load_with_parquet(
+                    collection, symbol, start_time, end_time, batch_size, columns
+                )
+            else:
+                df = self._query_collection(
+                    collection, symbol, start_time, end_time, batch_size, streaming, columns
+                )
+            
+            if self.cold_storage is not None:
+                cold_df = self.cold_storage.read_range(symbol, start_time, end_time, columns)
+                if not cold_df.empty and not df.empty:
+                    # Сутки из Parquet кэша могли быть позже архивированы - берем горячую копию
+                    cold_df = cold_df[~cold_df['timestamp'].isin(df['timestamp'])]
+                if not cold_df.empty:
+                    df = pd.concat([cold_df, df], ignore_index=True) if not df.empty else cold_df
+                    if not df['timestamp'].is_monotonic_increasing:
+                        df = df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+            
+            if df.empty:
+                return df
+            
+            if use_cache and columns is None:
+                self.cache.put(symbol, start_time, end_time, df)
+            
+            logger.info(f"Loaded {len(df)} historical records for {symbol}")
+            return df
+            
+        except Exception as e:
+            logger.error(f"Error loading historical data: {e}")
+            return pd.DataFrame()
+    
+    def _load_interval(self, symbol: str,
+                       start_time: datetime,
+                       end_time: datetime,
+                       interval: str,
+                       batch_size: int) -> pd.DataFrame:
+        """OHLCV бары интервала из агрегатов или, если их нет, из сырых данных"""
+        parse_interval(interval)
+        
+        rollup = self.rollups.select_interval(interval) if self.rollups is not None else None
+        if rollup is not None:
+            try:
+                df = self.rollups.read(symbol, rollup, start_time, end_time)
+                if rollup != interval:
+                    df = resample_ohlcv(df, interval)
+                logger.info(f"Loaded {len(df)} {interval} bars for {symbol} from {rollup} rollups")
+                return df
+            except Exception as e:
+                logger.warning(f"Rollup read failed for {symbol} {interval}, resampling raw data: {e}")
+        
+        raw = self.get_historical_data(symbol, start_time, end_time, batch_size)
+        if raw.empty or 'close' not in raw.columns:
+            return pd.DataFrame()
+        return resample_ohlcv(raw, interval)
+    
+    def _query_collection(self, collection, symbol: str,
+                          start_time: datetime,
+                          end_time: datetime,
+                          batch_size: int,
+                          streaming: bool = True,
+                          columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Чтение диапазона из коллекции MongoDB"""
+        schema = self.schemas.get(symbol)
+        projection = self._projection(columns, schema)
+        builder = _FrameBuilder(schema)
+        
+        if streaming:
+            cursor = collection.find(
+                self._range_query(symbol, start_time, end_time),
+                projection=projection,
+                sort=[('timestamp', 1)],
+                batch_size=batch_size
+            )
+            for doc in cursor:
+                builder.add(doc)
+        else:
             current_start = start_time
             
             while current_start < end_time:
                 current_end = min(current_start + timedelta(hours=24), end_time)
                 
-                cursor = collection.find({
-                    'symbol': symbol,
-                    'timestamp': {
-                        '$gte': current_start,
-                        '$lt': current_end
-                    }
-                }, batch_size=batch_size)
-                
-                batch_data = list(cursor)
-                if batch_data:
-                    all_data.extend(batch_data)
+                cursor = collection.find(
+                    self._range_query(symbol, current_start, current_end),
+                    projection=projection,
+                    batch_size=batch_size
+                )
+                for doc in cursor:
+                    builder.add(doc)
                 
                 current_start = current_end
                 
                 # Пауза для избежания перегрузки
                 time.sleep(0.1)
-            
-            if not all_data:
+        
+        df = builder.to_frame()
+        if columns is not None and not df.empty:
+            df = df.reindex(columns=['timestamp', 'symbol', *columns])
+        return df
+    
+    def _day_stats(self, collection, symbol: str,
+                   start_time: datetime, end_time: datetime) -> Dict[date, Dict[str, Any]]:
+        """
+        Число баров и максимальный _id по суткам - сверка партиций Parquet
+        
+        Одна агрегация по индексу (symbol, timestamp) возвращает строку на
+        сутки, поэтому догрузки, апсерты новых баров и удаления других
+        процессов видны без чтения самих баров.
+        """
+        pipeline = [
+            {'$match': self._range_query(symbol, start_time, end_time)},
+            {'$group': {
+                '_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$timestamp'}},
+                'rows': {'$sum': 1},
+                'watermark': {'$max': '$_id'}
+            }}
+        ]
+        return {
+            date.fromisoformat(doc['_id']): {'rows': doc['rows'], 'watermark': str(doc['watermark'])}
+            for doc in collection.aggregate(pipeline)
+        }
+    
+    def _load_with_parquet(self, collection, symbol: str,
+                           start_time: datetime,
+                           end_time: datetime,
+                           batch_size: int,
+                           columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Чтение через Parquet кэш: завершенные сутки сверяются со статистикой
+        MongoDB, недостающие или устаревшие догружаются и записываются
+        партициями, текущие сутки читаются из MongoDB
+        """
+        store = self.parquet_store
+        hot_start = day_start(datetime.utcnow().date())
+        
+        stats = None
+        if start_time < hot_start:
+            stats = self._day_stats(collection, symbol, day_start(start_time.date()), min(end_time, hot_start))
+        
+        for first_day, last_day in store.missing_ranges(symbol, start_time, end_time, stats):
+            range_end = day_start(last_day + timedelta(days=1))
+            day_df = self._query_collection(
+                collection, symbol, day_start(first_day), range_end, batch_size
+            )
+            written = store.write_days(symbol, day_df, first_day, last_day, stats)
+            if written < (last_day - first_day).days + 1:
+                logger.warning(f"Parquet cache incomplete for {symbol}, reading from MongoDB")
+                return self._query_collection(
+                    collection, symbol, start_time, end_time, batch_size, columns=columns
+                )
+            logger.info(f"Cached {written} daily partitions for {symbol} ({first_day} - {last_day})")
+        
+        frames = []
+        if start_time < hot_start:
+            frames.append(store.read(symbol, start_time, min(end_time, hot_start), columns))
+        if end_time > hot_start:
+            frames.append(self._query_collection(
+                collection, symbol, max(start_time, hot_start), end_time, batch_size, columns=columns
+            ))
+        
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame()
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True)
+    
+    def aggregate(self, symbol: str,
+                  start_time: datetime,
+                  end_time: datetime,
+                  bucket: Optional[str],
+                  fields: Dict[str, Union[str, Sequence[str]]]) -> pd.DataFrame:
+        """
+        Агрегация на стороне MongoDB по временным бакетам
+        
+        Запрос компилируется в $match по индексированному диапазону,
+        $group по $dateTrunc и $project, так что по сети передается
+        по одной строке на бакет.
+        
+        Args:
+            symbol: Торговый символ
+            start_time: Начальное время
+            end_time: Конечное время
+            bucket: Интервал бакета, например '1h' (весь диапазон одной строкой если None)
+            fields: Поле -> операция или список операций: sum, mean, min, max,
+                    first, last, std, count, vwap (цена поля, взвешенная по volume)
+        
+        Returns:
+            DataFrame timestamp + колонка на поле (field_op для списка операций)
+        
+        Raises:
+            ValueError: Неизвестная операция или интервал
+        """
+        pipeline = self._aggregation_pipeline(symbol, start_time, end_time, bucket, fields)
+        
+        try:
+            collection = self._get_collection(symbol.lower())
+            if collection is None:
                 return pd.DataFrame()
             
-            # Конвертируем в DataFrame
-            df = pd.DataFrame([{
-                'timestamp': doc['timestamp'],
-                'symbol': doc['symbol'],
-                **doc['metrics']
-            } for doc in all_data])
+            df = pd.DataFrame(list(collection.aggregate(pipeline, allowDiskUse=True)))
+            if df.empty:
+                return df
             
-            logger.info(f"Loaded {len(df)} historical records for {symbol}")
+            columns = [c for c in pipeline[-1]['$project'] if c != '_id']
+            df = df.reindex(columns=columns)
+            logger.info(f"Aggregated {symbol} into {len(df)} buckets")
             return df
             
         except Exception as e:
-            logger.error(f"Error loading historical data: {e}")
+            logger.error(f"Error aggregating data: {e}")
             return pd.DataFrame()
     
-    def cleanup_old_data(self, older_than_days: int = 30) -> int:
+    @staticmethod
+    def _aggregation_pipeline(symbol: str,
+                              start_time: datetime,
+                              end_time: datetime,
+                              bucket: Optional[str],
+                              fields: Dict[str, Union[str, Sequence[str]]]) -> List[Dict[str, Any]]:
+        """Компиляция запроса aggregate в pipeline MongoDB"""
+        group: Dict[str, Any] = {
+            '_id': date_trunc('$timestamp', bucket) if bucket is not None else None
+        }
+        project: Dict[str, Any] = {'_id': 0, 'timestamp': '$_id' if bucket is not None else {'$literal': start_time}}
+        
+        for field_name, ops in fields.items():
+            single = isinstance(ops, str)
+            for op in ([ops] if single else ops):
+                column = field_name if single else f"{field_name}_{op}"
+                value = metric_field(field_name)
+                
+                if op in AGGREGATE_OPS:
+                    group[column] = {AGGREGATE_OPS[op]: value}
+                    project[column] = 1
+                elif op == 'count':
+                    group[column] = {'$sum': {'$cond': [{'$ne': [value, None]}, 1, 0]}}
+                    project[column] = 1
+                elif op == 'vwap':
+                    volume = metric_field('volume')
+                    group[f'__{column}_pv'] = {'$sum': {'$multiply': [value, volume]}}
+                    group[f'__{column}_v'] = {'$sum': volume}
+                    project[column] = {'$cond': [
+                        {'$eq': [f'$__{column}_v', 0]},
+                        None,
+                        {'$divide': [f'$__{column}_pv', f'$__{column}_v']}
+                    ]}
+                else:
+                    raise ValueError(
+                        f"Unknown aggregate op {op!r}, expected one of "
+                        f"{sorted([*AGGREGATE_OPS, *AGGREGATE_SPECIAL_OPS])}"
+                    )
+        
+        return [
+            {'$match': DataManager._range_query(symbol, start_time, end_time)},
+            {'$sort': {'timestamp': 1}},
+            {'$group': group},
+            {'$sort': {'_id': 1}},
+            {'$project': project}
+        ]
+    
+    def get_historical_panel(self, symbols: Sequence[str],
+                             start_time: datetime,
+                             end_time: datetime,
+                             fields: Optional[List[str]] = None,
+                             fill: Union[str, float, None] = 'ffill',
+                             as_array: bool = False,
+                             max_workers: Optional[int] = None) -> Union[pd.DataFrame, np.ndarray]:
+        """
+        Параллельная загрузка истории нескольких символов с выравниванием по времени
+        
+        Args:
+            symbols: Торговые символы
+            start_time: Начальное время
+            end_time: Конечное время
+            fields: Поля метрик (объединение полей всех символов если None)
+            fill: Заполнение пропущенных баров: 'ffill', 'bfill', число или None
+            as_array: Вернуть плотный массив (time, symbol, field) вместо DataFrame
+            max_workers: Размер пула потоков (CONFIG.max_workers если None)
+        
+        Returns:
+            DataFrame с индексом timestamp и колонками MultiIndex (symbol, field)
+            или numpy массив формы (time, symbol, field) при as_array=True
+        """
+        symbols = list(symbols)
+        workers = max(1, min(max_workers or self.config.max_workers, len(symbols)))
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hydra-panel") as executor:
+            frames = list(executor.map(
+                lambda symbol: self.get_historical_data(symbol, start_time, end_time),
+                symbols
+            ))
+        
+        pieces = {}
+        panel_fields = list(fields) if fields is not None else []
+        for symbol, df in zip(symbols, frames):
+            if df.empty:
+                continue
+            df = (df.drop(columns='symbol')
+                    .drop_duplicates('timestamp', keep='last')
+                    .set_index('timestamp')
+                    .sort_index())
+            if fields is None:
+                panel_fields.extend(c for c in df.columns if c not in panel_fields)
+            pieces[symbol] = df
+        
+        columns = pd.MultiIndex.from_product([symbols, panel_fields], names=['symbol', 'field'])
+        if not pieces:
+            panel = pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name='timestamp'))
+        else:
+            # Внешнее объединение по timestamp дает общую ось времени
+            panel = pd.concat(pieces, axis=1, names=['symbol', 'field']).reindex(columns=columns)
+            panel.index.name = 'timestamp'
+        
+        if fill == 'ffill':
+            panel = panel.ffill()
+        elif fill == 'bfill':
+            panel = panel.bfill()
+        elif fill is not None:
+            panel = panel.fillna(fill)
+        
+        logger.info(f"Built panel {panel.shape[0]} x {len(symbols)} symbols x {len(panel_fields)} fields")
+        
+        if as_array:
+            return panel.to_numpy(dtype=np.float64).reshape(
+                len(panel.index), len(symbols), len(panel_fields)
+            )
+        return panel
+    
+    def iter_historical(self, symbol: str,
+                        start_time: datetime,
+                        end_time: datetime,
+                        chunk_rows: Optional[int] = None,
+                        columns: Optional[List[str]] = None,
+                        downcast: bool = False) -> Iterator[pd.DataFrame]:
+        """
+        Потоковое чтение исторических данных чанками ограниченного размера
+        
+        Чанки строятся прямо из курсора, так что в памяти одновременно
+        находится не больше chunk_rows строк.
+        
+        Args:
+            symbol: Торговый символ
+            start_time: Начальное время
+            end_time: Конечное время
+            chunk_rows: Максимум строк в чанке (batch_sizes['historical'] если None)
+            columns: Загружаемые поля метрик (все если None)
+            downcast: Приводить float64 к float32
+        
+        Yields:
+            DataFrame чанки в порядке возрастания timestamp
+        """
+        if chunk_rows is None:
+            chunk_rows = self.config.batch_sizes['historical']
+        
+        collection = self._get_collection(symbol.lower())
+        if collection is None:
+            return
+        
+        schema = self.schemas.get(symbol)
+        cursor = collection.find(
+            self._range_query(symbol, start_time, end_time),
+            projection=self._projection(columns, schema),
+            sort=[('timestamp', 1)],
+            batch_size=chunk_rows
+        )
+        
+        total = 0
+        try:
+            builder = _FrameBuilder(schema)
+            for doc in cursor:
+                builder.add(doc)
+                if len(builder) >= chunk_rows:
+                    total += len(builder)
+                    yield self._finalize_chunk(builder.to_frame(), columns, downcast)
+                    builder = _FrameBuilder(schema)
+            
+            if len(builder):
+                total += len(builder)
+                yield self._finalize_chunk(builder.to_frame(), columns, downcast)
+        finally:
+            cursor.close()
+        
+        logger.info(f"Streamed {total} historical records for {symbol}")
+    
+    @staticmethod
+    def _finalize_chunk(df: pd.DataFrame, columns: Optional[List[str]],
+                        downcast: bool) -> pd.DataFrame:
+        """Выравнивание колонок чанка и понижение типов"""
+        if columns is not None:
+            # Одинаковый набор колонок во всех чанках
+            df = df.reindex(columns=['timestamp', 'symbol', *columns])
+        if downcast:
+            df = _downcast_frame(df)
+        return df
+    
+    @staticmethod
+    def _projection(columns: Optional[List[str]] = None,
+                    schema: Optional[MetricsSchema] = None) -> Dict[str, int]:
+        """
+        Проекция документа с опциональным отбором полей метрик
+        
+        Со схемой добавляются плоские поля; вложенный metrics остается
+        в проекции для legacy документов.
+        """
+        if columns is None:
+            projection = dict(HISTORICAL_PROJECTION)
+        else:
+            projection = {'_id': 0, 'timestamp': 1, 'symbol': 1}
+            projection.update({f'metrics.{column}': 1 for column in columns})
+        if schema is not None:
+            projection.update(schema.projection(columns))
+        return projection
+    
+    @staticmethod
+    def _range_query(symbol: str, start_time: datetime, end_time: datetime) -> Dict[str, Any]:
+        """Фильтр по символу и полуоткрытому диапазону времени"""
+        return {
+            'symbol': symbol,
+            'timestamp': {
+                '$gte': start_time,
+                '$lt': end_time
+            }
+        }
+    
+    def cleanup_old_data(self, older_than_days: int = 30,
+                         chunk_size: Optional[int] = None,
+                         pause: float = 0.0,
+                         dry_run: bool = False,
+                         max_workers: Optional[int] = None) -> int:
         """
         Очистка старых данных
         
+        Коллекции обрабатываются параллельно (RetentionJob), удаление идет
+        ограниченными чанками. Отчет по коллекциям сохраняется в
+        last_cleanup_report. Если включен TTL индекс (MONGODB_TTL_DAYS),
+        удалением занимается MongoDB и ручной проход не выполняется.
+        
         Args:
             older_than_days: Удалять данные старше X дней
+            chunk_size: Документов в одном удалении (авто если None)
+            pause: Пауза между чанками в секундах
+            dry_run: Только посчитать документы без удаления
+            max_workers: Параллельных коллекций (CONFIG.max_workers если None)
         
         Returns:
-            Количество удаленных документов
+            Количество удаленных (для dry_run - найденных) документов
         """
+        if mongodb_config.ttl_enabled and not dry_run:
+            logger.info(f"Retention is handled by TTL index ({mongodb_config.ttl_days} days)")
+            return 0
+        
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=older_than_days)
             
-            # Получаем все коллекции
-            client = get_mongo_client()
-            db = client[os.getenv("MONGODB_DB_NAME", "hydra_metrics")]
+            job = RetentionJob(
+                get_database(),
+                cutoff_date,
+                chunk_size=chunk_size,
+                pause=pause,
+                max_workers=max_workers,
+                dry_run=dry_run,
+                coverage=self.coverage
+            )
+            self.last_cleanup_report = job.run()
             
-            deleted_count = 0
-            for collection_name in db.list_collection_names():
-                collection = db[collection_name]
-                result = collection.delete_many({
-                    'timestamp': {'$lt': cutoff_date}
-                })
-                deleted_count += result.deleted_count
+            key = 'matched' if dry_run else 'deleted'
+            deleted_count = sum(stats.get(key, 0) for stats in self.last_cleanup_report.values())
             
-            logger.info(f"Cleaned up {deleted_count} old documents")
+            if dry_run:
+                logger.info(f"[dry-run] {deleted_count} documents older than {older_than_days} days")
+            else:
+                if deleted_count:
+                    self.cache.clear()
+                logger.info(f"Cleaned up {deleted_count} old documents")
             return deleted_count
             
         except Exception as e:
@@ -235,8 +1179,16 @@ class DataManager:
     def clear_cache(self) -> None:
         """Очистка кэша"""
         self.cache.clear()
-        self.current_cache_size = 0
         logger.info("Data cache cleared")
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Статистика кэша запросов
+        
+        Returns:
+            Словарь с hits, misses, hit_rate, заполнением и вытеснениями
+        """
+        return self.cache.get_stats()
 
 # Глобальный экземпляр менеджера данных
 data_manager = DataManager()
@@ -0,0 +1,465 @@
+"""
+Write-Ahead Journal - локальный журнал записи с фоновым воспроизведением в MongoDB
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import bson
+from pymongo.errors import BulkWriteError
+
+from src.core.system_config import CONFIG
+from src.core.write_buffer import bulk_upsert
+from src.utils.logger import setup_logger
+
+# Логгер
+logger = setup_logger(__name__)
+
+# Заголовок записи: длина BSON и его CRC32
+RECORD_HEADER = struct.Struct('<II')
+SEGMENT_PREFIX = "journal-"
+SEGMENT_SUFFIX = ".wal"
+CHECKPOINT_FILE = "checkpoint.json"
+DUPLICATE_KEY_ERROR = 11000
+
+Position = Tuple[int, int]
+
+class WriteAheadJournal:
+    """
+    Append-only журнал документов в сегментах journal-<N>.wal
+
+    append пишет запись в буфер файла и сразу возвращается; фоновый поток
+    раз в fsync_interval делает один fsync на все накопленные записи.
+    Поток воспроизведения читает только синхронизированные записи, по
+    порядку вставляет их в MongoDB пачками и продвигает checkpoint.
+    Документы несут заранее назначенный _id, поэтому повтор пачки после
+    сбоя отбрасывает дубликаты по ошибке duplicate key; в режиме upsert
+    повтором считается уже существующий бар (symbol, timestamp).
+    """
+
+    def __init__(self, directory: str,
+                 collection_getter: Callable[[str], Any],
+                 segment_bytes: int = 64 * 1024 * 1024,
+                 fsync_interval: float = 0.05,
+                 batch_size: Optional[int] = None,
+                 retry_interval: float = 1.0,
+                 max_retry_interval: float = 30.0,
+                 on_replayed: Optional[Callable[[str, List[Dict[str, Any]]], None]] = None,
+                 upsert: bool = False):
+        """
+        Args:
+            directory: Директория журнала
+            collection_getter: Функция получения коллекции по имени
+            segment_bytes: Размер сегмента, после которого открывается новый
+            fsync_interval: Период группового fsync в секундах
+            batch_size: Записей в одной вставке (CONFIG.batch_sizes['realtime'] если None)
+            retry_interval: Начальная пауза после ошибки MongoDB
+            max_retry_interval: Максимальная пауза (экспоненциальный рост)
+            on_replayed: Вызывается с (коллекция, документы) после успешной вставки
+            upsert: Воспроизводить апсертом по (symbol, timestamp) вместо insert_many
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._get_collection = collection_getter
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size or CONFIG.batch_sizes['realtime']
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.on_replayed = on_replayed
+        self.upsert = upsert
+
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_event = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+
+        self.stats_counters = {
+            'appended': 0,
+            'replayed': 0,
+            'duplicates': 0,
+            'failed': 0,
+            'corrupted': 0,
+            'retries': 0
+        }
+        self.available = True
+        self.last_error: Optional[str] = None
+        self._head_time: Optional[float] = None
+        self._last_latency = 0.0
+
+        self._checkpoint = self._load_checkpoint()
+        self._recover()
+
+        # Фоновые потоки группового fsync и воспроизведения
+        self._sync_thread = threading.Thread(target=self._sync_loop, name="hydra-journal-sync", daemon=True)
+        self._replay_thread = threading.Thread(target=self._replay_loop, name="hydra-journal-replay", daemon=True)
+        self._sync_thread.start()
+        self._replay_thread.start()
+
+    # --- сегменты и восстановление ---
+
+    def _segment_path(self, seq: int) -> Path:
+        return self.directory / f"{SEGMENT_PREFIX}{seq:012d}{SEGMENT_SUFFIX}"
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            for path in self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")
+        )
+
+    def _load_checkpoint(self) -> Position:
+        path = self.directory / CHECKPOINT_FILE
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data['segment'], data['offset']
+        segments = self._segments()
+        return (segments[0] if segments else 0), 0
+
+    def _save_checkpoint(self, position: Position) -> None:
+        path = self.directory / CHECKPOINT_FILE
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'segment': position[0], 'offset': position[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_records(path: Path, offset: int, limit: Optional[int] = None,
+                      end_offset: Optional[int] = None):
+        """
+        Чтение записей сегмента с offset
+
+        Returns:
+            (записи [(offset после записи, payload)], признак поврежденной записи)
+        """
+        records = []
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            while limit is None or len(records) < limit:
+                if end_offset is not None and offset >= end_offset:
+                    break
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return records, bool(header)
+                length, crc = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    return records, True
+                offset += RECORD_HEADER.size + length
+                records.append((offset, payload))
+        return records, False
+
+    def _recover(self) -> None:
+        """Обрезка недописанного хвоста, подсчет отставания и открытие сегмента"""
+        segments = self._segments()
+        if segments:
+            last = segments[-1]
+            path = self._segment_path(last)
+            records, torn = self._read_records(path, 0)
+            valid_size = records[-1][0] if records else 0
+            if torn or path.stat().st_size != valid_size:
+                logger.warning(f"Truncating torn journal tail in {path.name} at {valid_size} bytes")
+                with open(path, 'r+b') as f:
+                    f.truncate(valid_size)
+            active = last
+        else:
+            active = self._checkpoint[0]
+
+        pending = 0
+        for seq in segments:
+            if seq < self._checkpoint[0]:
+                continue
+            offset = self._checkpoint[1] if seq == self._checkpoint[0] else 0
+            records, _ = self._read_records(self._segment_path(seq), offset)
+            pending += len(records)
+        self._pending = pending
+
+        self._active_seq = active
+        self._file = open(self._segment_path(active), 'ab')
+        self._offset = self._file.tell()
+        self._retired: List[Any] = []
+        self._synced: Position = (active, self._offset)
+        if pending:
+            logger.info(f"Journal has {pending} records to replay")
+
+    # --- запись ---
+
+    def append(self, collection_name: str, document: Dict[str, Any]) -> None:
+        """
+        Добавление документа в журнал (без ожидания fsync и MongoDB)
+
+        Raises:
+            RuntimeError: Журнал закрыт
+        """
+        payload = bson.encode({'c': collection_name, 't': time.time(), 'd': document})
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("WriteAheadJournal is closed")
+            self._file.write(record)
+            self._offset += len(record)
+            self._pending += 1
+            self.stats_counters['appended'] += 1
+
+            if self._offset >= self.segment_bytes:
+                # Старый файл синхронизирует и закрывает поток fsync
+                self._retired.append(self._file)
+                self._active_seq += 1
+                self._file = open(self._segment_path(self._active_seq), 'ab')
+                self._offset = 0
+
+    def sync(self) -> Position:
+        """
+        Групповой fsync всех добавленных записей
+
+        Returns:
+            Синхронизированная позиция (сегмент, offset)
+        """
+        with self._sync_lock:
+            with self._lock:
+                self._file.flush()
+                retired, self._retired = self._retired, []
+                for f in retired:
+                    f.flush()
+                fd = self._file.fileno()
+                position = (self._active_seq, self._offset)
+
+            for f in retired:
+                os.fsync(f.fileno())
+                f.close()
+            if position != self._synced:
+                os.fsync(fd)
+
+            self._synced = position
+        self._synced_event.set()
+        return position
+
+    def _sync_loop(self) -> None:
+        """Цикл группового fsync"""
+        while not self._stop.wait(self.fsync_interval):
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Journal fsync failed: {e}")
+
+    # --- воспроизведение ---
+
+    def _read_batch(self) -> List[Tuple[str, float, Dict[str, Any], Position]]:
+        """
+        Следующая пачка синхронизированных записей после checkpoint
+
+        Returns:
+            Список (коллекция, время записи, документ, позиция после записи)
+        """
+        seq, offset = self._checkpoint
+        synced_seq, synced_offset = self._synced
+
+        batch: List[Tuple[str, float, Dict[str, Any], Position]] = []
+        while len(batch) < self.batch_size and (seq, offset) < (synced_seq, synced_offset):
+            path = self._segment_path(seq)
+            limit = self.batch_size - len(batch)
+            end_offset = synced_offset if seq == synced_seq else None
+            records, corrupted = [], False
+            if path.exists():
+                records, corrupted = self._read_records(path, offset, limit, end_offset)
+
+            for next_offset, payload in records:
+                entry = bson.decode(payload)
+                batch.append((entry['c'], entry['t'], entry['d'], (seq, next_offset)))
+                offset = next_offset
+
+            if seq == synced_seq or (len(records) == limit and not corrupted):
+                break
+            if corrupted:
+                self.stats_counters['corrupted'] += 1
+                logger.error(f"Corrupted record in {path.name} at offset {offset}, skipping rest of segment")
+            # Сегмент прочитан до конца - переходим к следующему
+            seq, offset = seq + 1, 0
+
+        if batch:
+            self._head_time = batch[0][1]
+        return batch
+
+    def _apply(self, batch: List[Tuple[str, float, Dict[str, Any], Position]]) -> None:
+        """
+        Вставка пачки по порядку
+
+        Подряд идущие документы одной коллекции вставляются одним
+        insert_many, после каждой такой группы продвигается checkpoint,
+        чтобы повтор после ошибки не передавал on_replayed уже
+        обработанные документы.
+        """
+        start = 0
+        while start < len(batch):
+            name = batch[start][0]
+            end = start
+            while end < len(batch) and batch[end][0] == name:
+                end += 1
+            documents = [entry[2] for entry in batch[start:end]]
+
+            collection = self._get_collection(name)
+            if collection is None:
+                raise ConnectionError(f"Collection {name} is unavailable")
+
+            inserted = documents
+            try:
+                if self.upsert:
+                    upserted = bulk_upsert(collection, documents).upserted_ids
+                    inserted = [doc for i, doc in enumerate(documents) if i in upserted]
+                    self.stats_counters['duplicates'] += len(documents) - len(inserted)
+                else:
+                    collection.insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get('writeErrors', [])
+                rejected = {err['index'] for err in errors}
+                if self.upsert:
+                    # Существовавшие бары - тоже повтор, а не новые документы
+                    upserted = {op['index'] for op in e.details.get('upserted', [])}
+                    rejected |= set(range(len(documents))) - upserted
+                duplicates = sum(1 for err in errors if err['code'] == DUPLICATE_KEY_ERROR)
+                self.stats_counters['duplicates'] += duplicates
+                if len(errors) > duplicates:
+                    # Повтор не поможет (валидация и т.п.) - фиксируем и идем дальше
+                    self.stats_counters['failed'] += len(errors) - duplicates
+                    logger.error(f"Journal replay to {name}: {len(errors) - duplicates} documents rejected")
+                inserted = [doc for i, doc in enumerate(documents) if i not in rejected]
+
+            if self.on_replayed is not None and inserted:
+                try:
+                    self.on_replayed(name, inserted)
+                except Exception as e:
+                    logger.warning(f"Journal replay callback failed for {name}: {e}")
+
+            self._commit(batch[end - 1][3], end - start, batch[end - 1][1])
+            start = end
+
+    def _commit(self, position: Position, count: int, last_time: float) -> None:
+        """Продвижение checkpoint и удаление воспроизведенных сегментов"""
+        self._save_checkpoint(position)
+        self._checkpoint = position
+        for seq in self._segments():
+            if seq >= position[0]:
+                break
+            self._segment_path(seq).unlink(missing_ok=True)
+
+        with self._lock:
+            self._pending -= count
+        self.stats_counters['replayed'] += count
+        self._last_latency = time.time() - last_time
+        self._head_time = None
+
+    def _replay_loop(self) -> None:
+        """Цикл воспроизведения журнала с экспоненциальной паузой при ошибках"""
+        delay = self.retry_interval
+        while True:
+            batch = self._read_batch()
+            if not batch:
+                if self._stop.is_set():
+                    return
+                self._synced_event.wait(timeout=self.fsync_interval * 4)
+                self._synced_event.clear()
+                continue
+
+            try:
+                self._apply(batch)
+            except Exception as e:
+                self.available = False
+                self.last_error = str(e)
+                self.stats_counters['retries'] += 1
+                logger.warning(f"Journal replay failed, retrying in {delay:.1f}s: {e}")
+                if self._stop.wait(delay):
+                    return
+                delay = min(delay * 2, self.max_retry_interval)
+                continue
+
+            if not self.available:
+                logger.info("MongoDB is available again, journal replay resumed")
+            self.available = True
+            self.last_error = None
+            delay = self.retry_interval
+
+    # --- метрики и остановка ---
+
+    @property
+    def pending(self) -> int:
+        """Записей журнала, еще не вставленных в MongoDB"""
+        with self._lock:
+            return self._pending
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Метрики отставания журнала
+
+        Returns:
+            pending_records, pending_bytes, oldest_pending_seconds,
+            last_replay_latency, available, last_error и счетчики
+        """
+        seq, offset = self._checkpoint
+        pending_bytes = 0
+        for segment in self._segments():
+            if segment < seq:
+                continue
+            try:
+                size = self._segment_path(segment).stat().st_size
+            except FileNotFoundError:
+                continue
+            pending_bytes += size - offset if segment == seq else size
+
+        pending = self.pending
+        head_time = self._head_time
+        return {
+            **self.stats_counters,
+            'pending_records': pending,
+            'pending_bytes': max(pending_bytes, 0),
+            'oldest_pending_seconds': round(time.time() - head_time, 3) if pending and head_time else 0.0,
+            'last_replay_latency': round(self._last_latency, 3),
+            'available': self.available,
+            'last_error': self.last_error
+        }
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Ожидание воспроизведения всего журнала
+
+        Returns:
+            True если журнал пуст
+        """
+        self.sync()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._synced_event.set()
+            time.sleep(min(self.fsync_interval, 0.05))
+        return True
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Попытка дописать журнал в MongoDB, остановка потоков и закрытие сегмента"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        self.drain(timeout)
+        self._stop.set()
+        self._synced_event.set()
+        self._sync_thread.join()
+        self._replay_thread.join(timeout)
+        self.sync()
+        with self._lock:
+            self._file.close()
+
+        if self.pending:
+            logger.warning(f"Journal closed with {self.pending} records left for the next start")
+        else:
+            logger.info(f"Journal closed: {self.stats_counters}")
@@ -0,0 +1,245 @@
+"""
+Parquet Store - локальный колоночный кэш исторических данных (symbol/date)
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime, date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.utils.logger import setup_logger
+
+# Логгер
+logger = setup_logger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+PART_FILE = "part-0.parquet"
+META_FILE = "meta.json"
+
+def day_start(day: date) -> datetime:
+    """Начало суток (UTC, naive datetime как в MongoDB)"""
+    return datetime(day.year, day.month, day.day)
+
+def concat_tables(tables: List["pa.Table"]) -> "pa.Table":
+    """Объединение таблиц с разным набором колонок"""
+    try:
+        return pa.concat_tables(tables, promote_options="default")
+    except TypeError:
+        # pyarrow < 14
+        return pa.concat_tables(tables, promote=True)
+
+class ParquetStore:
+    """
+    Партиционированное хранилище Parquet: <root>/symbol=<S>/date=<YYYY-MM-DD>/
+
+    Хранятся только завершенные непустые сутки (раньше текущей даты UTC).
+    Рядом с партицией лежит meta.json с числом строк и watermark
+    (максимальный _id суток в MongoDB): другие процессы могут догрузить,
+    апсертнуть или удалить бары прошлых суток, поэтому перед чтением
+    партиция сверяется со статистикой суток из MongoDB. Перезапись
+    значений уже существующего бара на месте эта сверка не видит - ее
+    отмечает invalidate записывающего процесса. Чтение идет через
+    memory-mapped Arrow с отбором колонок и фильтром по timestamp.
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Корневая директория хранилища
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow is required for ParquetStore, install hydra[full]")
+
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def partition_path(self, symbol: str, day: date) -> Path:
+        """Директория партиции"""
+        return self.root / f"symbol={symbol}" / f"date={day.isoformat()}"
+
+    def has_partition(self, symbol: str, day: date) -> bool:
+        """Есть ли записанная партиция за сутки"""
+        return (self.partition_path(symbol, day) / PART_FILE).exists()
+
+    def partition_meta(self, symbol: str, day: date) -> Optional[Dict[str, Any]]:
+        """Число строк и watermark партиции (None для партиции без meta.json)"""
+        try:
+            with open(self.partition_path(symbol, day) / META_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def complete_days(start_time: datetime, end_time: datetime) -> List[date]:
+        """Завершенные сутки, пересекающиеся с диапазоном"""
+        last_day = min(
+            datetime.utcnow().date() - timedelta(days=1),
+            (end_time - timedelta(microseconds=1)).date()
+        )
+
+        days = []
+        day = start_time.date()
+        while day <= last_day:
+            days.append(day)
+            day += timedelta(days=1)
+        return days
+
+    def is_current(self, symbol: str, day: date,
+                   stats: Optional[Dict[date, Dict[str, Any]]] = None) -> bool:
+        """
+        Соответствует ли партиция суток данным в MongoDB
+
+        Args:
+            stats: День -> {'rows', 'watermark'} из MongoDB (без сверки если None)
+        """
+        if stats is None:
+            return self.has_partition(symbol, day)
+        expected = stats.get(day)
+        if expected is None:
+            # Пустые сутки не хранятся, оставшаяся партиция устарела
+            return not self.partition_path(symbol, day).exists()
+        return self.has_partition(symbol, day) and self.partition_meta(symbol, day) == expected
+
+    def missing_ranges(self, symbol: str, start_time: datetime,
+                       end_time: datetime,
+                       stats: Optional[Dict[date, Dict[str, Any]]] = None) -> List[Tuple[date, date]]:
+        """
+        Непрерывные отрезки завершенных суток без актуальных партиций
+
+        Args:
+            symbol: Торговый символ
+            start_time: Начальное время
+            end_time: Конечное время
+            stats: День -> {'rows', 'watermark'} из MongoDB для сверки
+                   (только отсутствующие партиции если None)
+
+        Returns:
+            Список (первый день, последний день) включительно
+        """
+        ranges: List[Tuple[date, date]] = []
+        for day in self.complete_days(start_time, end_time):
+            if self.is_current(symbol, day, stats):
+                continue
+            if ranges and ranges[-1][1] == day - timedelta(days=1):
+                ranges[-1] = (ranges[-1][0], day)
+            else:
+                ranges.append((day, day))
+        return ranges
+
+    def write_days(self, symbol: str, df: pd.DataFrame,
+                   first_day: date, last_day: date,
+                   stats: Optional[Dict[date, Dict[str, Any]]] = None) -> int:
+        """
+        Запись суточных партиций из отсортированного по timestamp DataFrame
+
+        Сутки без данных не записываются (прежняя партиция удаляется):
+        их пустоту подтверждает сверка stats, а не файл на диске.
+
+        Args:
+            symbol: Торговый символ
+            df: Бары суток first_day..last_day
+            first_day, last_day: Сутки включительно
+            stats: День -> {'rows', 'watermark'} из MongoDB, сохраняется в meta.json
+                   (число строк партиции без watermark если None)
+
+        Returns:
+            Количество обработанных суток
+        """
+        timestamps = df['timestamp'].values if not df.empty else None
+        written = 0
+        day = first_day
+        while day <= last_day:
+            next_day = day + timedelta(days=1)
+            part = df.iloc[0:0]
+            if timestamps is not None:
+                lo = timestamps.searchsorted(pd.Timestamp(day_start(day)).to_datetime64(), side='left')
+                hi = timestamps.searchsorted(pd.Timestamp(day_start(next_day)).to_datetime64(), side='left')
+                part = df.iloc[lo:hi]
+            if part.empty:
+                shutil.rmtree(self.partition_path(symbol, day), ignore_errors=True)
+                written += 1
+            else:
+                meta = (stats or {}).get(day, {'rows': len(part), 'watermark': None})
+                if self._write_partition(symbol, day, part, meta):
+                    written += 1
+            day = next_day
+        return written
+
+    def _write_partition(self, symbol: str, day: date, df: pd.DataFrame,
+                         meta: Dict[str, Any]) -> bool:
+        """Атомарная запись одной партиции с meta.json"""
+        path = self.partition_path(symbol, day)
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            tmp_path.mkdir(parents=True, exist_ok=True)
+            pq.write_table(table, tmp_path / PART_FILE, compression='snappy')
+            with open(tmp_path / META_FILE, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            if path.exists():
+                shutil.rmtree(path)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to write parquet partition {symbol}/{day}: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return False
+
+    def read(self, symbol: str, start_time: datetime, end_time: datetime,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Чтение диапазона из партиций
+
+        Args:
+            symbol: Торговый символ
+            start_time: Начальное время
+            end_time: Конечное время
+            columns: Поля метрик (все если None)
+
+        Returns:
+            DataFrame в формате get_historical_data
+        """
+        tables = []
+        filters = [('timestamp', '>=', start_time), ('timestamp', '<', end_time)]
+
+        day = start_time.date()
+        while day_start(day) < end_time:
+            path = self.partition_path(symbol, day) / PART_FILE
+            day += timedelta(days=1)
+            if not path.exists():
+                continue
+
+            read_columns = None
+            if columns is not None:
+                available = pq.read_schema(path, memory_map=True).names
+                read_columns = [c for c in ['timestamp', 'symbol', *columns] if c in available]
+
+            table = pq.read_table(path, columns=read_columns, filters=filters, memory_map=True)
+            if table.num_rows:
+                tables.append(table)
+
+        if not tables:
+            return pd.DataFrame()
+
+        df = concat_tables(tables).to_pandas()
+        if columns is not None:
+            df = df.reindex(columns=['timestamp', 'symbol', *columns])
+        return df
+
+    def invalidate(self, symbol: str, timestamp: datetime) -> bool:
+        """Удаление партиции суток, в которые записаны новые данные"""
+        path = self.partition_path(symbol, timestamp.date())
+        if not path.exists():
+            return False
+        shutil.rmtree(path, ignore_errors=True)
+        return True
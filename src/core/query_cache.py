@@ -0,0 +1,157 @@
+"""
+Query Cache - LRU кэш результатов исторических запросов
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+import pandas as pd
+
+from src.utils.logger import setup_logger
+
+# Логгер
+logger = setup_logger(__name__)
+
+CacheKey = Tuple[str, datetime, datetime]
+
+class QueryCache:
+    """
+    LRU кэш DataFrame по (символ, диапазон) с лимитом по реальному объему
+
+    Запрос, целиком попадающий в более широкий закэшированный диапазон,
+    обслуживается срезом по timestamp без обращения к MongoDB.
+    """
+
+    def __init__(self, size_limit_mb: float):
+        """
+        Args:
+            size_limit_mb: Лимит суммарного объема DataFrame в MB
+        """
+        self.size_limit = int(size_limit_mb * 1024 * 1024)
+        self.current_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[CacheKey, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, symbol: str, start_time: datetime,
+            end_time: datetime) -> Optional[pd.DataFrame]:
+        """
+        Поиск закэшированного диапазона, покрывающего запрос
+
+        Args:
+            symbol: Торговый символ
+            start_time: Начальное время
+            end_time: Конечное время
+
+        Returns:
+            Копия среза DataFrame или None при промахе
+        """
+        with self._lock:
+            for key in reversed(self._entries):
+                cached_symbol, cached_start, cached_end = key
+                if cached_symbol != symbol or cached_start > start_time or cached_end < end_time:
+                    continue
+
+                df, _ = self._entries[key]
+                self._entries.move_to_end(key)
+                self.hits += 1
+
+                if cached_start == start_time and cached_end == end_time:
+                    return df.copy()
+
+                timestamps = df['timestamp'].values
+                lo = timestamps.searchsorted(pd.Timestamp(start_time).to_datetime64(), side='left')
+                hi = timestamps.searchsorted(pd.Timestamp(end_time).to_datetime64(), side='left')
+                return df.iloc[lo:hi].reset_index(drop=True).copy()
+
+            self.misses += 1
+            return None
+
+    def put(self, symbol: str, start_time: datetime,
+            end_time: datetime, df: pd.DataFrame) -> bool:
+        """
+        Сохранение результата запроса
+
+        Args:
+            symbol: Торговый символ
+            start_time: Начальное время
+            end_time: Конечное время
+            df: Результат запроса с колонкой timestamp
+
+        Returns:
+            True если результат помещен в кэш
+        """
+        if df.empty or 'timestamp' not in df.columns:
+            return False
+
+        if not df['timestamp'].is_monotonic_increasing:
+            df = df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+        else:
+            df = df.copy()
+
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self.size_limit:
+            logger.debug(f"Result for {symbol} ({size} bytes) exceeds cache limit")
+            return False
+
+        key = (symbol, start_time, end_time)
+        with self._lock:
+            if key in self._entries:
+                self.current_size -= self._entries.pop(key)[1]
+
+            # Вытесняем самые давно использованные записи
+            while self._entries and self.current_size + size > self.size_limit:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_size -= evicted_size
+                self.evictions += 1
+
+            self._entries[key] = (df, size)
+            self.current_size += size
+        return True
+
+    def invalidate(self, symbol: str, timestamp: Optional[datetime] = None) -> int:
+        """
+        Удаление записей, затронутых записью новых данных
+
+        Args:
+            symbol: Торговый символ
+            timestamp: Время записанного документа (все записи символа если None)
+
+        Returns:
+            Количество удаленных записей
+        """
+        with self._lock:
+            affected = [
+                key for key in self._entries
+                if key[0] == symbol and (timestamp is None or key[1] <= timestamp < key[2])
+            ]
+            for key in affected:
+                self.current_size -= self._entries.pop(key)[1]
+        return len(affected)
+
+    def clear(self) -> None:
+        """Полная очистка кэша"""
+        with self._lock:
+            self._entries.clear()
+            self.current_size = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика попаданий и заполнения кэша"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'size_mb': round(self.current_size / (1024 * 1024), 2),
+                'limit_mb': round(self.size_limit / (1024 * 1024), 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
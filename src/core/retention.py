@@ -0,0 +1,158 @@
+"""
+Retention - параллельная очистка устаревших данных ограниченными чанками
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from src.core.system_config import CONFIG
+from src.core.rollups import ROLLUP_MARKER
+from src.utils.logger import setup_logger
+
+# Логгер
+logger = setup_logger(__name__)
+
+class RetentionJob:
+    """
+    Удаление документов старше cutoff по всем коллекциям символов
+
+    Коллекции обрабатываются параллельно, внутри коллекции документы
+    удаляются чанками по _id, найденным через индекс (symbol, timestamp),
+    чтобы не держать блокировки записи надолго.
+    """
+
+    def __init__(self, db, cutoff: datetime,
+                 chunk_size: Optional[int] = None,
+                 pause: float = 0.0,
+                 max_workers: Optional[int] = None,
+                 dry_run: bool = False,
+                 coverage=None):
+        """
+        Args:
+            db: База данных MongoDB
+            cutoff: Удалять документы с timestamp раньше этого момента
+            chunk_size: Документов в одном delete_many (batch_sizes['realtime'] если None)
+            pause: Пауза между чанками в секундах
+            max_workers: Параллельных коллекций (CONFIG.max_workers если None)
+            dry_run: Только посчитать документы, ничего не удалять
+            coverage: CoverageIndex, с которого снимаются очищенные диапазоны
+        """
+        self.db = db
+        self.cutoff = cutoff
+        self.chunk_size = chunk_size or CONFIG.batch_sizes['realtime']
+        self.pause = pause
+        self.max_workers = max_workers or CONFIG.max_workers
+        self.dry_run = dry_run
+        self.coverage = coverage
+
+    def list_collections(self) -> List[str]:
+        """Коллекции символов, к которым применяется очистка"""
+        names = []
+        for info in self.db.list_collections():
+            name = info['name']
+            if name.startswith(('system.', '_')):
+                continue
+            if info.get('type') == 'timeseries' and info.get('options', {}).get('expireAfterSeconds'):
+                # Time-series коллекцию с expireAfterSeconds очищает сама MongoDB
+                continue
+            if ROLLUP_MARKER in name:
+                # Агрегаты хранятся дольше сырых данных
+                continue
+            names.append(name)
+        return sorted(names)
+
+    def run(self, collection_names: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Запуск очистки
+
+        Args:
+            collection_names: Коллекции для очистки (все коллекции символов если None)
+
+        Returns:
+            Отчет по коллекциям: deleted (или matched для dry-run), chunks, seconds, docs_per_sec
+        """
+        if collection_names is None:
+            collection_names = self.list_collections()
+
+        report: Dict[str, Dict[str, Any]] = {}
+        if not collection_names:
+            return report
+
+        workers = max(1, min(self.max_workers, len(collection_names)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hydra-retention") as executor:
+            futures = {
+                executor.submit(self._cleanup_collection, name): name
+                for name in collection_names
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    report[name] = future.result()
+                except Exception as e:
+                    logger.error(f"Retention failed for {name}: {e}")
+                    report[name] = {'error': str(e)}
+
+        if self.coverage is not None and not self.dry_run:
+            self.coverage.flush()
+        return report
+
+    def _queries(self, collection) -> List[Dict[str, Any]]:
+        """Запросы по символам, чтобы каждый чанк шел по индексу (symbol, timestamp)"""
+        symbols = collection.distinct('symbol')
+        return [
+            {'symbol': symbol, 'timestamp': {'$lt': self.cutoff}}
+            for symbol in [*symbols, None]
+        ]
+
+    def _cleanup_collection(self, name: str) -> Dict[str, Any]:
+        """Очистка одной коллекции"""
+        collection = self.db[name]
+        started = time.time()
+
+        if self.dry_run:
+            matched = sum(
+                collection.count_documents(query) for query in self._queries(collection)
+            )
+            stats = {'matched': matched, 'seconds': round(time.time() - started, 3)}
+            logger.info(f"[dry-run] {name}: {matched} documents older than {self.cutoff}")
+            return stats
+
+        deleted = 0
+        chunks = 0
+        for query in self._queries(collection):
+            while True:
+                ids = [
+                    doc['_id'] for doc in collection.find(
+                        query, {'_id': 1}, sort=[('timestamp', 1)], limit=self.chunk_size
+                    )
+                ]
+                if not ids:
+                    break
+
+                deleted += collection.delete_many({'_id': {'$in': ids}}).deleted_count
+                chunks += 1
+
+                elapsed = time.time() - started
+                logger.info(
+                    f"{name}: {deleted} deleted in {chunks} chunks "
+                    f"({deleted / elapsed if elapsed > 0 else 0:.0f} docs/s)"
+                )
+
+                if len(ids) < self.chunk_size:
+                    break
+                if self.pause:
+                    time.sleep(self.pause)
+
+            if self.coverage is not None and query['symbol'] is not None:
+                # Иначе gaps() считал бы удаленную историю сохраненной
+                self.coverage.remove_range(query['symbol'], None, self.cutoff)
+
+        seconds = time.time() - started
+        return {
+            'deleted': deleted,
+            'chunks': chunks,
+            'seconds': round(seconds, 3),
+            'docs_per_sec': round(deleted / seconds, 1) if seconds > 0 else 0.0
+        }
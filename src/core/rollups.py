@@ -0,0 +1,321 @@
+"""
+Rollups - инкрементально поддерживаемые OHLCV агрегаты по интервалам
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from pymongo import ASCENDING, UpdateOne
+
+from src.utils.logger import setup_logger
+
+# Логгер
+logger = setup_logger(__name__)
+
+ROLLUP_INTERVALS = ('1m', '5m', '1h', '1d')
+ROLLUP_MARKER = "_ohlcv_"
+ROLLUP_INDEX = "symbol_timestamp_unique"
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'count']
+
+_INTERVAL_UNITS = {'s': 'second', 'm': 'minute', 'h': 'hour', 'd': 'day'}
+_INTERVAL_RE = re.compile(r'^(\d+)([smhd])$')
+# $dateTrunc отсчитывает binSize от 2000-01-01, бакеты выравниваются так же
+_ORIGIN = datetime(2000, 1, 1)
+
+def _split_interval(interval: str) -> Tuple[int, str]:
+    match = _INTERVAL_RE.match(interval)
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid interval {interval!r}, expected e.g. '30s', '5m', '1h', '1d'")
+    return int(match.group(1)), match.group(2)
+
+def parse_interval(interval: str) -> timedelta:
+    """Длительность интервала вида '30s', '5m', '1h', '1d'"""
+    size, unit = _split_interval(interval)
+    return timedelta(**{_INTERVAL_UNITS[unit] + 's': size})
+
+def date_trunc(field: str, interval: str) -> Dict[str, Any]:
+    """Выражение $dateTrunc начала бакета (совпадает с bucket_start: оба от 2000-01-01)"""
+    size, unit = _split_interval(interval)
+    return {'$dateTrunc': {'date': field, 'unit': _INTERVAL_UNITS[unit], 'binSize': size}}
+
+def bucket_start(timestamp: datetime, interval: str) -> datetime:
+    """Начало бакета, выровненного от 2000-01-01 (как $dateTrunc)"""
+    delta = parse_interval(interval)
+    return timestamp - (timestamp - _ORIGIN) % delta
+
+def rollup_collection_name(symbol: str, interval: str) -> str:
+    """Имя коллекции агрегатов символа"""
+    return f"{symbol.lower()}{ROLLUP_MARKER}{interval}"
+
+def resample_ohlcv(df: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """
+    Агрегация баров (или сырых метрик) в OHLCV более крупного интервала
+
+    Отсутствующие open/high/low берутся из close, count - число строк.
+    """
+    if df.empty:
+        return df
+
+    close = df['close']
+    frame = pd.DataFrame({
+        'open': df['open'] if 'open' in df.columns else close,
+        'high': df['high'] if 'high' in df.columns else close,
+        'low': df['low'] if 'low' in df.columns else close,
+        'close': close,
+        'volume': df['volume'] if 'volume' in df.columns else 0.0,
+        'count': df['count'] if 'count' in df.columns else 1
+    })
+    timestamps = pd.to_datetime(df['timestamp'])
+    origin = pd.Timestamp(_ORIGIN, tz=timestamps.dt.tz)
+    buckets = timestamps - (timestamps - origin) % parse_interval(interval)
+    result = frame.groupby(buckets.values, sort=True).agg({
+        'open': 'first', 'high': 'max', 'low': 'min',
+        'close': 'last', 'volume': 'sum', 'count': 'sum'
+    })
+    result.index.name = 'timestamp'
+    result = result.reset_index()
+    result.insert(1, 'symbol', df['symbol'].iloc[0])
+    return result
+
+def metric_field(name: str, fallback: Any = None) -> Dict[str, Any]:
+    """Поле сырого документа: плоское (по схеме) или вложенное metrics"""
+    return {'$ifNull': [f'${name}', {'$ifNull': [f'$metrics.{name}', fallback]}]}
+
+class RollupEngine:
+    """
+    Материализованные OHLCV агрегаты <symbol>_ohlcv_<interval>
+
+    Сохраненные бары сливаются во все интервалы одним bulk_write на
+    коллекцию агрегатов, по pipeline-апсерту на бакет: open/close по
+    самому раннему/позднему timestamp, high/low - экстремумы, volume и
+    count - суммы. Бэкфилл
+    строит первый интервал из сырых документов, а каждый следующий -
+    из предыдущего, через $group и $merge на сервере.
+    """
+
+    def __init__(self, collection_getter: Callable[[str], Any],
+                 intervals: Sequence[str] = ROLLUP_INTERVALS):
+        """
+        Args:
+            collection_getter: Функция получения коллекции по имени
+            intervals: Интервалы агрегатов по возрастанию
+        """
+        self.collection_getter = collection_getter
+        self.intervals = sorted(intervals, key=parse_interval)
+        self._prepared: set = set()
+
+    def collection(self, symbol: str, interval: str):
+        """Коллекция агрегатов с уникальным индексом (symbol, timestamp)"""
+        name = rollup_collection_name(symbol, interval)
+        collection = self.collection_getter(name)
+        if name not in self._prepared:
+            collection.create_index(
+                [('symbol', ASCENDING), ('timestamp', ASCENDING)],
+                name=ROLLUP_INDEX, unique=True
+            )
+            self._prepared.add(name)
+        return collection
+
+    def update(self, symbol: str, timestamp: datetime, metrics: Dict[str, Any]) -> int:
+        """
+        Слияние одного бара во все интервалы
+
+        Args:
+            symbol: Торговый символ
+            timestamp: Время бара
+            metrics: Метрики бара (нужен хотя бы close)
+
+        Returns:
+            Количество обновленных интервалов
+        """
+        return len(self.intervals) if self.update_many([(symbol, timestamp, metrics)]) else 0
+
+    def update_many(self, bars: Iterable[Tuple[str, datetime, Dict[str, Any]]]) -> int:
+        """
+        Слияние пачки баров во все интервалы
+
+        Бары одного бакета сначала сворачиваются в один частичный агрегат,
+        затем каждая коллекция агрегатов получает один неупорядоченный
+        bulk_write - round trip на интервал, а не на бар.
+
+        Args:
+            bars: (символ, время бара, метрики); бары без close пропускаются
+
+        Returns:
+            Количество учтенных баров
+        """
+        partials: Dict[Tuple[str, str], Dict[datetime, Dict[str, Any]]] = {}
+        merged = 0
+        for symbol, timestamp, metrics in bars:
+            close = metrics.get('close')
+            if close is None:
+                continue
+            merged += 1
+            bar = {
+                'open': metrics.get('open', close),
+                'high': metrics.get('high', close),
+                'low': metrics.get('low', close),
+                'close': close,
+                'volume': metrics.get('volume') or 0
+            }
+            for interval in self.intervals:
+                buckets = partials.setdefault((symbol, interval), {})
+                bucket = bucket_start(timestamp, interval)
+                partial = buckets.get(bucket)
+                if partial is None:
+                    buckets[bucket] = dict(bar, count=1, first_ts=timestamp, last_ts=timestamp)
+                    continue
+                if timestamp < partial['first_ts']:
+                    partial['open'], partial['first_ts'] = bar['open'], timestamp
+                if timestamp >= partial['last_ts']:
+                    partial['close'], partial['last_ts'] = bar['close'], timestamp
+                partial['high'] = max(partial['high'], bar['high'])
+                partial['low'] = min(partial['low'], bar['low'])
+                partial['volume'] += bar['volume']
+                partial['count'] += 1
+
+        for (symbol, interval), buckets in partials.items():
+            self.collection(symbol, interval).bulk_write([
+                UpdateOne({'symbol': symbol, 'timestamp': bucket}, self._merge_pipeline(partial), upsert=True)
+                for bucket, partial in buckets.items()
+            ], ordered=False)
+        return merged
+
+    @staticmethod
+    def _merge_pipeline(partial: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Pipeline-апдейт бакета частичным агрегатом; выражения видят значения до обновления"""
+        is_first = {'$or': [
+            {'$eq': [{'$type': '$first_ts'}, 'missing']},
+            {'$lt': [partial['first_ts'], '$first_ts']}
+        ]}
+        is_last = {'$or': [
+            {'$eq': [{'$type': '$last_ts'}, 'missing']},
+            {'$gte': [partial['last_ts'], '$last_ts']}
+        ]}
+        return [{'$set': {
+            'open': {'$cond': [is_first, partial['open'], '$open']},
+            'close': {'$cond': [is_last, partial['close'], '$close']},
+            'high': {'$max': ['$high', partial['high']]},
+            'low': {'$min': ['$low', partial['low']]},
+            'volume': {'$add': [{'$ifNull': ['$volume', 0]}, partial['volume']]},
+            'count': {'$add': [{'$ifNull': ['$count', 0]}, partial['count']]},
+            'first_ts': {'$min': ['$first_ts', partial['first_ts']]},
+            'last_ts': {'$max': ['$last_ts', partial['last_ts']]}
+        }}]
+
+    def backfill(self, source, symbol: str,
+                 start_time: Optional[datetime] = None,
+                 end_time: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Пересчет агрегатов по существующей истории (идемпотентно)
+
+        Границы выравниваются по самому крупному интервалу, чтобы
+        крайние бакеты пересчитывались целиком.
+
+        Args:
+            source: Коллекция сырых метрик символа
+            symbol: Торговый символ
+            start_time: Начало истории (вся если None)
+            end_time: Конец истории (вся если None)
+
+        Returns:
+            Число бакетов по интервалам
+        """
+        coarsest = self.intervals[-1]
+        time_range: Dict[str, Any] = {}
+        if start_time is not None:
+            time_range['$gte'] = bucket_start(start_time, coarsest)
+        if end_time is not None:
+            end_bucket = bucket_start(end_time, coarsest)
+            time_range['$lt'] = end_bucket if end_bucket == end_time else end_bucket + parse_interval(coarsest)
+
+        match: Dict[str, Any] = {'symbol': symbol}
+        if time_range:
+            match['timestamp'] = time_range
+
+        report = {}
+        previous = None
+        for interval in self.intervals:
+            target = self.collection(symbol, interval)
+            divisible = previous is not None and parse_interval(interval) % parse_interval(previous) == timedelta(0)
+            if divisible:
+                pipeline_source = self.collection(symbol, previous)
+                has_close = {'close': {'$ne': None}}
+                group = {
+                    'open': {'$first': '$open'},
+                    'high': {'$max': '$high'},
+                    'low': {'$min': '$low'},
+                    'close': {'$last': '$close'},
+                    'volume': {'$sum': '$volume'},
+                    'count': {'$sum': '$count'},
+                    'first_ts': {'$min': '$first_ts'},
+                    'last_ts': {'$max': '$last_ts'}
+                }
+            else:
+                pipeline_source = source
+                has_close = {'$or': [{'close': {'$ne': None}}, {'metrics.close': {'$ne': None}}]}
+                close = metric_field('close')
+                group = {
+                    'open': {'$first': metric_field('open', close)},
+                    'high': {'$max': metric_field('high', close)},
+                    'low': {'$min': metric_field('low', close)},
+                    'close': {'$last': close},
+                    'volume': {'$sum': metric_field('volume', 0)},
+                    'count': {'$sum': 1},
+                    'first_ts': {'$min': '$timestamp'},
+                    'last_ts': {'$max': '$timestamp'}
+                }
+
+            pipeline_source.aggregate([
+                {'$match': {**match, **has_close}},
+                {'$sort': {'timestamp': 1}},
+                {'$group': {'_id': date_trunc('$timestamp', interval), **group}},
+                {'$project': {'_id': 0, 'symbol': {'$literal': symbol}, 'timestamp': '$_id',
+                              **{field: 1 for field in group}}},
+                {'$merge': {
+                    'into': target.name,
+                    'on': ['symbol', 'timestamp'],
+                    'whenMatched': 'replace',
+                    'whenNotMatched': 'insert'
+                }}
+            ], allowDiskUse=True)
+
+            report[interval] = target.count_documents(match)
+            logger.info(f"Backfilled {report[interval]} {interval} rollups for {symbol}")
+            previous = interval
+
+        return report
+
+    def select_interval(self, interval: str) -> Optional[str]:
+        """
+        Самый крупный агрегат, из которого собирается интервал
+
+        Returns:
+            Интервал агрегата или None, если запрошенный мельче всех агрегатов
+        """
+        requested = parse_interval(interval)
+        candidates = [
+            rollup for rollup in self.intervals
+            if requested % parse_interval(rollup) == timedelta(0)
+        ]
+        return candidates[-1] if candidates else None
+
+    def read(self, symbol: str, interval: str,
+             start_time: datetime, end_time: datetime) -> pd.DataFrame:
+        """
+        Чтение агрегатов интервала за [start, end)
+
+        Returns:
+            DataFrame timestamp, symbol, open, high, low, close, volume, count
+        """
+        cursor = self.collection(symbol, interval).find(
+            {'symbol': symbol, 'timestamp': {'$gte': bucket_start(start_time, interval), '$lt': end_time}},
+            projection={'_id': 0, 'first_ts': 0, 'last_ts': 0},
+            sort=[('timestamp', 1)]
+        )
+        df = pd.DataFrame(list(cursor))
+        if df.empty:
+            return df
+        return df.reindex(columns=['timestamp', 'symbol', *OHLCV_COLUMNS])
@@ -0,0 +1,360 @@
+"""
+Schema Registry - фиксированные имена и типы полей метрик по символам
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.utils.logger import setup_logger
+
+# Логгер
+logger = setup_logger(__name__)
+
+SCHEMA_COLLECTION = "_schemas"
+
+# Служебные поля документа, которые не могут быть полями метрик
+RESERVED_FIELDS = frozenset({
+    '_id', 'timestamp', 'symbol', 'metrics', 'schema_version', 'processed', 'created_at'
+})
+
+SUPPORTED_DTYPES = ('float32', 'float64', 'int32', 'int64', 'bool')
+
+OHLCV_FIELDS = {
+    'open': 'float32',
+    'high': 'float32',
+    'low': 'float32',
+    'close': 'float32',
+    'volume': 'float32'
+}
+
+# Nullable типы pandas для целых и bool колонок с пропусками
+_NULLABLE_DTYPES = {'int32': 'Int32', 'int64': 'Int64', 'bool': 'boolean'}
+
+class SchemaError(ValueError):
+    """Метрики не соответствуют схеме символа"""
+
+class SchemaUnavailableError(ConnectionError):
+    """Схема символа не загружена и неизвестна ни из кэша, ни из снимка"""
+
+def metrics_from_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Поля метрик документа: вложенные (legacy) или плоские (по схеме)"""
+    metrics = doc.get('metrics')
+    if metrics is not None:
+        return metrics
+    return {key: value for key, value in doc.items() if key not in RESERVED_FIELDS}
+
+class MetricsSchema:
+    """
+    Схема метрик символа: имя поля -> dtype
+
+    Документы по схеме хранят метрики плоскими полями верхнего уровня
+    вместо вложенного metrics, значения приводятся к dtype при записи.
+    """
+
+    def __init__(self, symbol: str, fields: Dict[str, str],
+                 version: int = 1, strict: bool = True):
+        """
+        Args:
+            symbol: Торговый символ
+            fields: Поля метрик и их типы (SUPPORTED_DTYPES)
+            version: Версия схемы, растет при каждом изменении
+            strict: Отклонять метрики с полями вне схемы (иначе отбрасывать их)
+        """
+        for name, dtype in fields.items():
+            if name in RESERVED_FIELDS or name.startswith('$') or '.' in name:
+                raise SchemaError(f"Invalid metrics field name: {name!r}")
+            if dtype not in SUPPORTED_DTYPES:
+                raise SchemaError(f"Unsupported dtype {dtype!r} for field {name!r}")
+
+        self.symbol = symbol
+        self.fields = dict(fields)
+        self.version = version
+        self.strict = strict
+
+    def coerce(self, metrics_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Проверка и приведение метрик к схеме
+
+        Отсутствующие поля не записываются (при чтении - пропуски).
+
+        Raises:
+            SchemaError: Лишние поля в strict режиме или значение не приводится к типу
+        """
+        unknown = set(metrics_data) - self.fields.keys()
+        if unknown:
+            if self.strict:
+                raise SchemaError(f"Fields {sorted(unknown)} are not in the {self.symbol} schema")
+            logger.debug(f"Dropping fields {sorted(unknown)} not in the {self.symbol} schema")
+
+        coerced = {}
+        for name, dtype in self.fields.items():
+            value = metrics_data.get(name)
+            if value is None:
+                continue
+            try:
+                coerced[name] = self._coerce_value(value, dtype)
+            except (TypeError, ValueError) as e:
+                raise SchemaError(f"Field {name!r} of {self.symbol}: cannot coerce {value!r} to {dtype}") from e
+        return coerced
+
+    @staticmethod
+    def _coerce_value(value: Any, dtype: str) -> Any:
+        """Приведение значения к Python типу, который BSON хранит без потерь"""
+        if dtype == 'bool':
+            if not isinstance(value, (bool, np.bool_, int, np.integer)):
+                raise TypeError(f"{type(value).__name__} is not a bool")
+            return bool(value)
+        if dtype.startswith('int'):
+            number = float(value)
+            if not number.is_integer():
+                raise ValueError("not an integer")
+            info = np.iinfo(dtype)
+            if not info.min <= number <= info.max:
+                raise ValueError("out of range")
+            return int(number)
+        number = float(value)
+        if dtype == 'float32' and math.isfinite(number):
+            # Округление до float32 - при чтении значение восстанавливается точно
+            number = float(np.float32(number))
+        return number
+
+    def projection(self, columns: Optional[List[str]] = None) -> Dict[str, int]:
+        """Проекция плоских полей схемы (только columns если заданы)"""
+        names = self.fields if columns is None else [c for c in columns if c in self.fields]
+        return {name: 1 for name in names}
+
+    def column(self, name: str, values: List[Any]):
+        """Типизированная колонка из значений поля (None - пропуск)"""
+        dtype = self.fields[name]
+        try:
+            return np.asarray(values, dtype=dtype)
+        except (TypeError, ValueError):
+            # Пропуски в целых/bool полях - nullable тип pandas
+            return pd.array(values, dtype=_NULLABLE_DTYPES.get(dtype, dtype))
+
+    def to_document(self) -> Dict[str, Any]:
+        """Документ для хранения в SCHEMA_COLLECTION"""
+        return {
+            '_id': self.symbol,
+            'fields': self.fields,
+            'version': self.version,
+            'strict': self.strict,
+            'updated_at': datetime.utcnow()
+        }
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> "MetricsSchema":
+        """Схема из документа SCHEMA_COLLECTION"""
+        return cls(doc['_id'], doc['fields'], doc.get('version', 1), doc.get('strict', True))
+
+class SchemaRegistry:
+    """
+    Реестр схем метрик по символам
+
+    Схемы хранятся в коллекции SCHEMA_COLLECTION и кэшируются в памяти;
+    символ без схемы пишется по-старому, вложенным metrics. С snapshot_path
+    каждая известная схема дублируется в локальный JSON файл, из которого
+    get_local отвечает без обращения к MongoDB.
+    """
+
+    def __init__(self, collection_getter: Optional[Callable[[], Any]] = None,
+                 retry_interval: float = 30.0,
+                 snapshot_path: Optional[str] = None):
+        """
+        Args:
+            collection_getter: Функция получения коллекции схем (только память если None)
+            retry_interval: Пауза перед повторной загрузкой схемы после ошибки
+            snapshot_path: Локальный снимок схем (без снимка если None)
+        """
+        self.collection_getter = collection_getter
+        self.retry_interval = retry_interval
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self._schemas: Dict[str, Optional[MetricsSchema]] = {}
+        self._retry_at: Dict[str, float] = {}
+        # Последний успешный ответ по символу (None - схемы нет), reload его не сбрасывает
+        self._last_known: Dict[str, Optional[MetricsSchema]] = {}
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._local: Dict[str, MetricsSchema] = self._read_snapshot()
+
+    def _read_snapshot(self) -> Dict[str, MetricsSchema]:
+        if self.snapshot_path is None or not self.snapshot_path.exists():
+            return {}
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                docs = json.load(f)
+            return {symbol: MetricsSchema.from_document(dict(doc, _id=symbol)) for symbol, doc in docs.items()}
+        except Exception as e:
+            logger.warning(f"Failed to read schema snapshot {self.snapshot_path}: {e}")
+            return {}
+
+    def _remember(self, symbol: str, schema: Optional[MetricsSchema]) -> None:
+        """Обновление локального снимка, если схема символа изменилась"""
+        with self._snapshot_lock:
+            with self._lock:
+                current = self._local.get(symbol)
+                if current is None and schema is None:
+                    return
+                if current is not None and schema is not None and current.version == schema.version:
+                    return
+                if schema is None:
+                    self._local.pop(symbol, None)
+                else:
+                    self._local[symbol] = schema
+                docs = {name: {'fields': s.fields, 'version': s.version, 'strict': s.strict}
+                        for name, s in self._local.items()}
+
+            if self.snapshot_path is None:
+                return
+            try:
+                self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(docs, f)
+                os.replace(tmp_path, self.snapshot_path)
+            except OSError as e:
+                logger.warning(f"Failed to write schema snapshot {self.snapshot_path}: {e}")
+
+    def get_local(self, symbol: str) -> Optional[MetricsSchema]:
+        """
+        Схема символа без обращения к MongoDB
+
+        Из кэша памяти или локального снимка; для пути записи, который
+        должен работать при недоступной базе.
+        """
+        with self._lock:
+            schema = self._schemas.get(symbol)
+            return schema if schema is not None else self._local.get(symbol)
+
+    def refresh(self) -> int:
+        """
+        Загрузка всех схем из MongoDB в кэш и локальный снимок
+
+        Returns:
+            Количество загруженных схем (0 при ошибке)
+        """
+        try:
+            collection = self._collection()
+            if collection is None:
+                raise ConnectionError("schema collection is unavailable")
+            schemas = [MetricsSchema.from_document(doc) for doc in collection.find({})]
+        except Exception as e:
+            logger.warning(f"Failed to refresh metrics schemas: {e}")
+            return 0
+
+        for schema in schemas:
+            with self._lock:
+                self._schemas[schema.symbol] = schema
+                self._last_known[schema.symbol] = schema
+                self._retry_at.pop(schema.symbol, None)
+            self._remember(schema.symbol, schema)
+        return len(schemas)
+
+    def _collection(self):
+        if self.collection_getter is None:
+            return None
+        return self.collection_getter()
+
+    def get(self, symbol: str, required: bool = False) -> Optional[MetricsSchema]:
+        """
+        Схема символа или None
+
+        Отсутствие схемы тоже кэшируется, схемы других процессов
+        подхватываются через reload. Пока MongoDB недоступна, возвращается
+        последняя известная схема (из памяти или локального снимка), чтобы
+        коллекция не получала документы в другом формате.
+
+        Args:
+            symbol: Торговый символ
+            required: Для записи - без известной схемы ошибка вместо None
+
+        Raises:
+            SchemaUnavailableError: required, схема не загружается и ранее не была известна
+        """
+        with self._lock:
+            if symbol in self._schemas:
+                return self._schemas[symbol]
+            if time.monotonic() < self._retry_at.get(symbol, 0.0):
+                return self._fallback(symbol, required)
+
+        try:
+            collection = self._collection()
+            if collection is None and self.collection_getter is not None:
+                raise ConnectionError("schema collection is unavailable")
+            doc = collection.find_one({'_id': symbol}) if collection is not None else None
+            schema = MetricsSchema.from_document(doc) if doc else None
+        except Exception as e:
+            # Ошибка не кэшируется, но повтор не раньше retry_interval,
+            # чтобы недоступная база не тормозила каждую запись
+            logger.warning(f"Failed to load metrics schema for {symbol}: {e}")
+            with self._lock:
+                self._retry_at[symbol] = time.monotonic() + self.retry_interval
+                return self._fallback(symbol, required)
+
+        with self._lock:
+            self._schemas[symbol] = schema
+            self._last_known[symbol] = schema
+            self._retry_at.pop(symbol, None)
+        self._remember(symbol, schema)
+        return schema
+
+    def _fallback(self, symbol: str, required: bool) -> Optional[MetricsSchema]:
+        """Последняя известная схема символа (вызывается под self._lock)"""
+        if symbol in self._last_known:
+            return self._last_known[symbol]
+        if symbol in self._local:
+            return self._local[symbol]
+        if not required:
+            # Чтение разбирает оба формата документов
+            return None
+        raise SchemaUnavailableError(f"Metrics schema for {symbol} is unavailable")
+
+    def register(self, symbol: str, fields: Dict[str, str],
+                 strict: bool = True) -> MetricsSchema:
+        """
+        Регистрация или изменение схемы символа
+
+        Args:
+            symbol: Торговый символ
+            fields: Поля метрик и их типы
+            strict: Отклонять метрики с полями вне схемы
+
+        Returns:
+            Актуальная схема (версия увеличивается, если поля изменились)
+        """
+        current = self.get(symbol)
+        if current is not None and current.fields == fields and current.strict == strict:
+            return current
+
+        version = current.version + 1 if current is not None else 1
+        schema = MetricsSchema(symbol, fields, version, strict)
+
+        collection = self._collection()
+        if collection is not None:
+            collection.replace_one({'_id': symbol}, schema.to_document(), upsert=True)
+
+        with self._lock:
+            self._schemas[symbol] = schema
+            self._last_known[symbol] = schema
+        self._remember(symbol, schema)
+        logger.info(f"Registered metrics schema v{version} for {symbol}: {fields}")
+        return schema
+
+    def reload(self, symbol: Optional[str] = None) -> None:
+        """Сброс кэша схем (одного символа или всех)"""
+        with self._lock:
+            if symbol is None:
+                self._schemas.clear()
+                self._retry_at.clear()
+            else:
+                self._schemas.pop(symbol, None)
+                self._retry_at.pop(symbol, None)
@@ -0,0 +1,277 @@
+"""
+Write Buffer - буферизованная пакетная запись документов в MongoDB
+"""
+
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Dict, Any, List, Tuple, Callable, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from src.core.system_config import CONFIG
+from src.utils.logger import setup_logger
+
+# Логгер
+logger = setup_logger(__name__)
+
+# Ключ бара для идемпотентной записи (уникальный индекс коллекции)
+BAR_KEY_FIELDS = ('symbol', 'timestamp')
+# Поля, которые задаются только при вставке и не меняются повтором
+INSERT_ONLY_FIELDS = ('_id', 'processed', 'created_at')
+
+def upsert_operation(document: Dict[str, Any]) -> UpdateOne:
+    """
+    Апсерт документа по (symbol, timestamp)
+
+    Повтор того же документа ничего не меняет, новые значения метрик
+    перезаписывают старые, а _id, processed и created_at остаются от
+    первой вставки.
+    """
+    key = {field: document[field] for field in BAR_KEY_FIELDS}
+    update: Dict[str, Any] = {
+        '$setOnInsert': {field: document[field] for field in INSERT_ONLY_FIELDS if field in document}
+    }
+    fields = {k: v for k, v in document.items() if k not in BAR_KEY_FIELDS and k not in INSERT_ONLY_FIELDS}
+    if fields:
+        update['$set'] = fields
+    return UpdateOne(key, update, upsert=True)
+
+def bulk_upsert(collection, documents: List[Dict[str, Any]]):
+    """
+    Неупорядоченный bulk апсерт документов по (symbol, timestamp)
+
+    Returns:
+        BulkWriteResult (upserted_ids - индексы новых документов)
+    """
+    return collection.bulk_write([upsert_operation(doc) for doc in documents], ordered=False)
+
+class BufferedWriter:
+    """
+    Буфер записи с группировкой документов по коллекциям
+
+    Документы копятся в памяти и сбрасываются неупорядоченным insert_many,
+    когда в коллекции набралось batch_size документов или прошло
+    flush_interval секунд - что наступит раньше. Для каждого документа
+    возвращается Future, который получает строковый id после сброса.
+    В режиме upsert пачка пишется bulk апсертом по (symbol, timestamp),
+    и Future уже существовавшего бара получает None.
+    """
+
+    def __init__(self, collection_getter: Callable[[str], Any],
+                 batch_size: Optional[int] = None,
+                 flush_interval: float = 1.0,
+                 max_pending: Optional[int] = None,
+                 put_timeout: Optional[float] = 30.0,
+                 upsert: bool = False,
+                 on_written: Optional[Callable[[str, List[Dict[str, Any]]], None]] = None):
+        """
+        Args:
+            collection_getter: Функция получения коллекции по имени
+            batch_size: Порог размера пачки (CONFIG.batch_sizes['realtime'] если None)
+            flush_interval: Порог времени между сбросами в секундах
+            max_pending: Максимум несохраненных документов (back-pressure)
+            put_timeout: Сколько ждать места в буфере, None - без ограничения
+            upsert: Писать апсертом по (symbol, timestamp) вместо insert_many
+            on_written: Вызывается с (коллекция, новые документы) после успешной записи
+        """
+        self._get_collection = collection_getter
+        self.batch_size = batch_size or CONFIG.batch_sizes['realtime']
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending or self.batch_size * 10
+        self.put_timeout = put_timeout
+        self.upsert = upsert
+        self.on_written = on_written
+
+        self._buffers: Dict[str, List[Tuple[Dict[str, Any], Future]]] = defaultdict(list)
+        self._pending = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._flush_needed = threading.Event()
+        self._stop = threading.Event()
+
+        self.stats = {
+            'written': 0,
+            'failed': 0,
+            'batches': 0
+        }
+
+        # Фоновый поток сброса
+        self._thread = threading.Thread(
+            target=self._run, name="hydra-write-buffer", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        """Количество документов, еще не записанных в MongoDB"""
+        with self._lock:
+            return self._pending
+
+    def add(self, collection_name: str, document: Dict[str, Any]) -> Future:
+        """
+        Добавление документа в буфер
+
+        Блокируется, если буфер заполнен, пока фоновый сброс не освободит место.
+
+        Args:
+            collection_name: Имя коллекции
+            document: Документ для вставки
+
+        Returns:
+            Future со строковым id документа после сброса
+
+        Raises:
+            RuntimeError: Буфер уже закрыт
+            TimeoutError: Место в буфере не освободилось за put_timeout
+        """
+        future: Future = Future()
+
+        with self._not_full:
+            if self._closed:
+                raise RuntimeError("BufferedWriter is closed")
+
+            if self._pending >= self.max_pending:
+                self._flush_needed.set()
+                has_space = self._not_full.wait_for(
+                    lambda: self._pending < self.max_pending or self._closed,
+                    timeout=self.put_timeout
+                )
+                if not has_space:
+                    raise TimeoutError(
+                        f"Write buffer is full ({self._pending} pending documents)"
+                    )
+                if self._closed:
+                    raise RuntimeError("BufferedWriter is closed")
+
+            buffer = self._buffers[collection_name]
+            buffer.append((document, future))
+            self._pending += 1
+
+            if len(buffer) >= self.batch_size:
+                self._flush_needed.set()
+
+        return future
+
+    def flush(self) -> int:
+        """
+        Сброс всех накопленных документов
+
+        Returns:
+            Количество успешно записанных документов
+        """
+        with self._flush_lock:
+            with self._lock:
+                buffers = self._buffers
+                self._buffers = defaultdict(list)
+
+            written = 0
+            total = 0
+            for collection_name, items in buffers.items():
+                total += len(items)
+                for start in range(0, len(items), self.batch_size):
+                    written += self._write_batch(
+                        collection_name, items[start:start + self.batch_size]
+                    )
+
+            with self._not_full:
+                self._pending -= total
+                self._not_full.notify_all()
+
+            if total:
+                logger.debug(f"Flushed {written}/{total} buffered documents")
+            return written
+
+    def close(self) -> None:
+        """Остановка фонового потока и финальный сброс буфера"""
+        with self._not_full:
+            if self._closed:
+                return
+            self._closed = True
+            self._not_full.notify_all()
+
+        self._stop.set()
+        self._flush_needed.set()
+        self._thread.join()
+        self.flush()
+        logger.info(f"Write buffer closed: {self.stats}")
+
+    def _run(self) -> None:
+        """Цикл фонового сброса по размеру или по времени"""
+        while not self._stop.is_set():
+            self._flush_needed.wait(timeout=self.flush_interval)
+            self._flush_needed.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Background flush failed: {e}")
+
+    def _write_batch(self, collection_name: str,
+                     items: List[Tuple[Dict[str, Any], Future]]) -> int:
+        """Неупорядоченная вставка одной пачки и разрешение Future"""
+        documents = [document for document, _ in items]
+
+        try:
+            collection = self._get_collection(collection_name)
+            if collection is None:
+                raise ConnectionError(f"Collection {collection_name} is unavailable")
+
+            if self.upsert:
+                new_indexes = set(bulk_upsert(collection, documents).upserted_ids)
+            else:
+                # insert_many проставляет _id в документы без него
+                collection.insert_many(documents, ordered=False)
+                new_indexes = set(range(len(items)))
+
+            self.stats['written'] += len(items)
+            self.stats['batches'] += 1
+            self._notify_written(collection_name, [documents[index] for index in sorted(new_indexes)])
+            for index, (document, future) in enumerate(items):
+                future.set_result(str(document['_id']) if index in new_indexes else None)
+            return len(items)
+
+        except BulkWriteError as e:
+            write_errors = {err['index']: err for err in e.details.get('writeErrors', [])}
+            upserted = {op['index'] for op in e.details.get('upserted', [])}
+            new_indexes = {index for index in range(len(items))
+                           if index not in write_errors and (not self.upsert or index in upserted)}
+
+            self.stats['written'] += len(items) - len(write_errors)
+            self.stats['failed'] += len(write_errors)
+            self.stats['batches'] += 1
+            logger.error(f"Bulk write to {collection_name}: {len(write_errors)} documents failed")
+            self._notify_written(collection_name, [documents[index] for index in sorted(new_indexes)])
+
+            for index, (document, future) in enumerate(items):
+                if index in write_errors:
+                    future.set_exception(RuntimeError(write_errors[index].get('errmsg')))
+                else:
+                    future.set_result(str(document['_id']) if index in new_indexes else None)
+            return len(items) - len(write_errors)
+
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+            self.stats['failed'] += len(items)
+            logger.error(f"Error flushing {len(items)} documents to {collection_name}: {e}")
+            return 0
+
+    def _notify_written(self, collection_name: str, documents: List[Dict[str, Any]]) -> None:
+        """on_written для записанных документов (ошибка не отменяет запись)"""
+        if self.on_written is None or not documents:
+            return
+        try:
+            self.on_written(collection_name, documents)
+        except Exception as e:
+            logger.warning(f"Write callback failed for {collection_name}: {e}")
+
+    def __enter__(self):
+        """Контекстный менеджер"""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Контекстный менеджер - выход"""
+        self.close()
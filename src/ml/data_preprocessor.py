@@ -5,6 +5,8 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 import joblib
 
+from .dataset import DEFAULT_FEATURES, add_features
+
 class MLDataPreprocessor:
     """Подготовка данных для ML моделей"""
 
@@ -16,6 +18,27 @@ class MLDataPreprocessor:
                               target_column: str = "target",
                               test_size: float = 0.2,
                               random_state: int = 42) -> Tuple:
+        X, y = self.prepare_features(df, target_column)
+
+        print("🔧 Splitting train/test...")
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=test_size, random_state=random_state, shuffle=False
+        )
+
+        print("🔧 Scaling features...")
+        X_train_scaled, X_test_scaled = self._scale_features(X_train, X_test)
+
+        return X_train_scaled, X_test_scaled, y_train, y_test
+
+    def prepare_features(self, df: pd.DataFrame, target_column: str = "target") -> Tuple:
+        """
+        Фичи и target без разбиения и масштабирования
+
+        Для WalkForwardValidator, который масштабирует каждый фолд по его train части.
+        """
+        print("🔧 Computing indicators...")
+        df = self._add_indicators(df)
+
         print("🔧 Creating target variable...")
         df = self._create_target_variable(df, target_column)
 
@@ -28,15 +51,7 @@ class MLDataPreprocessor:
         X = X[valid_indices]
         y = y[valid_indices]
 
-        print("🔧 Splitting train/test...")
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=random_state, shuffle=False
-        )
-
-        print("🔧 Scaling features...")
-        X_train_scaled, X_test_scaled = self._scale_features(X_train, X_test)
-
-        return X_train_scaled, X_test_scaled, y_train, y_test
+        return X, y
 
     def _create_target_variable(self, df: pd.DataFrame, target_column: str) -> pd.DataFrame:
         if "close" in df.columns:
@@ -45,11 +60,15 @@ class MLDataPreprocessor:
         else:
             raise ValueError("Column 'close' not found in DataFrame")
 
+    def _add_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
+        # Сырые OHLCV без фич - считаем индикаторы векторными ядрами
+        missing = [f for f in DEFAULT_FEATURES if f not in df.columns]
+        if missing and "close" in df.columns:
+            df = add_features(df.copy())
+        return df
+
     def _select_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        base_features = [
-            "open", "high", "low", "close", "volume",
-            "returns", "volatility", "rsi_14", "sma_20", "sma_50"
-        ]
+        base_features = DEFAULT_FEATURES
         available_features = [f for f in base_features if f in df.columns]
         self.feature_columns = available_features
         print(f"📋 Using features: {available_features}")
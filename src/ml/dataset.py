@@ -0,0 +1,212 @@
+"""
+ML Dataset - потоковый экспорт обучающих данных в memory-mapped бинарный формат
+"""
+
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import indicators
+
+# Фичи, которые использует MLDataPreprocessor
+DEFAULT_FEATURES = [
+    'open', 'high', 'low', 'close', 'volume',
+    'returns', 'volatility', 'rsi_14', 'sma_20', 'sma_50'
+]
+
+# Самое длинное окно фич - столько строк переносится между чанками
+WARMUP_ROWS = 50
+
+META_FILE = "meta.json"
+FEATURES_FILE = "features.f32"
+TARGET_FILE = "target.i8"
+TIMESTAMP_FILE = "timestamp.i64"
+
+def add_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Расчет технических фич по цене закрытия
+
+    Все окна конечные (не длиннее WARMUP_ROWS), поэтому результат
+    по чанкам с перекрытием совпадает с расчетом по всему ряду.
+    """
+    if 'close' not in df.columns:
+        raise ValueError("Column 'close' not found in DataFrame")
+
+    close = df['close'].to_numpy(dtype=np.float64)
+    df['returns'] = indicators.returns(close)
+    df['volatility'] = indicators.rolling_std(df['returns'].to_numpy(), 20)
+    sma = indicators.sma(close, [20, 50])
+    df['sma_20'] = sma[:, 0]
+    df['sma_50'] = sma[:, 1]
+    df['rsi_14'] = indicators.rsi(close, 14, method='sma')
+    return df
+
+def iter_collection_frames(collection, query: Optional[Dict[str, Any]] = None,
+                           chunk_rows: int = 10000) -> Iterator[pd.DataFrame]:
+    """
+    Чтение коллекции чанками DataFrame в порядке timestamp
+
+    Поля вложенного документа metrics поднимаются на верхний уровень,
+    так что подходят и документы save_metrics, и плоские свечи коллекторов.
+    """
+    cursor = collection.find(query or {}, sort=[('timestamp', 1)], batch_size=chunk_rows)
+    try:
+        rows = []
+        for doc in cursor:
+            doc.pop('_id', None)
+            metrics = doc.pop('metrics', None)
+            if metrics:
+                doc.update(metrics)
+            rows.append(doc)
+            if len(rows) >= chunk_rows:
+                yield pd.DataFrame(rows)
+                rows = []
+        if rows:
+            yield pd.DataFrame(rows)
+    finally:
+        cursor.close()
+
+@dataclass
+class MLDataset:
+    """Экспортированный датасет: массивы открыты через memmap без копирования"""
+
+    X: np.ndarray
+    y: np.ndarray
+    timestamps: np.ndarray
+    feature_columns: List[str]
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    def split(self, test_size: float = 0.2) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Хронологическое разбиение train/test срезами (view) memmap
+
+        Returns:
+            X_train, X_test, y_train, y_test
+        """
+        split_at = int(len(self) * (1 - test_size))
+        return self.X[:split_at], self.X[split_at:], self.y[:split_at], self.y[split_at:]
+
+def export_dataset(chunks: Iterable[pd.DataFrame], path: str,
+                   feature_columns: Optional[List[str]] = None,
+                   warmup_rows: int = WARMUP_ROWS) -> Dict[str, Any]:
+    """
+    Потоковый экспорт: чанки -> фичи -> бинарные файлы на диске
+
+    Между чанками переносятся последние warmup_rows строк, чтобы скользящие
+    окна считались так же, как по всему ряду, и последняя строка чанка,
+    которой для target нужна следующая. В памяти находится один чанк.
+
+    Args:
+        chunks: DataFrame чанки в порядке возрастания timestamp
+                (DataManager.iter_historical или iter_collection_frames)
+        path: Директория датасета
+        feature_columns: Колонки фич (доступные из DEFAULT_FEATURES если None)
+        warmup_rows: Строк перекрытия между чанками
+
+    Returns:
+        Метаданные датасета
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    tmp_path.mkdir(parents=True)
+
+    rows = 0
+    dropped = 0
+    history: Optional[pd.DataFrame] = None
+
+    try:
+        with open(tmp_path / FEATURES_FILE, 'wb') as features_file, \
+             open(tmp_path / TARGET_FILE, 'wb') as target_file, \
+             open(tmp_path / TIMESTAMP_FILE, 'wb') as timestamp_file:
+
+            for chunk in chunks:
+                if chunk.empty:
+                    continue
+
+                # Последняя строка history еще не выгружена - ждала следующей цены
+                emit_from = 0 if history is None else len(history) - 1
+                frame = chunk if history is None else pd.concat([history, chunk], ignore_index=True)
+                history = frame.iloc[-(warmup_rows + 1):].reset_index(drop=True)
+
+                frame = add_features(frame.copy())
+                if feature_columns is None:
+                    feature_columns = [c for c in DEFAULT_FEATURES if c in frame.columns]
+
+                close = frame['close'].astype(np.float64)
+                target = (close.shift(-1) > close).astype(np.int8).to_numpy()
+                X = frame.reindex(columns=feature_columns).to_numpy(dtype=np.float32)
+
+                # Последняя строка без следующей цены, строки прогрева с NaN фичами
+                emit = slice(emit_from, len(frame) - 1)
+                X, target = X[emit], target[emit]
+                valid = ~np.isnan(X).any(axis=1)
+                dropped += int((~valid).sum())
+
+                X, target = X[valid], target[valid]
+                timestamps = pd.to_datetime(frame['timestamp'].iloc[emit]).to_numpy(dtype='datetime64[ns]')[valid]
+
+                np.ascontiguousarray(X).tofile(features_file)
+                target.tofile(target_file)
+                timestamps.view(np.int64).tofile(timestamp_file)
+                rows += len(target)
+
+        meta = {
+            'rows': rows,
+            'feature_columns': feature_columns or [],
+            'dtypes': {'features': 'float32', 'target': 'int8', 'timestamp': 'datetime64[ns]'},
+            'dropped_rows': dropped,
+            'warmup_rows': warmup_rows
+        }
+        with open(tmp_path / META_FILE, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+        return meta
+
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+def load_dataset(path: str, mmap: bool = True) -> MLDataset:
+    """
+    Загрузка датасета, экспортированного export_dataset
+
+    Args:
+        path: Директория датасета
+        mmap: Открыть массивы через memmap (только чтение) вместо загрузки в память
+
+    Returns:
+        MLDataset
+    """
+    path = Path(path)
+    with open(path / META_FILE, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+
+    rows = meta['rows']
+    columns = meta['feature_columns']
+
+    def _open(name: str, dtype, shape):
+        if rows == 0:
+            return np.empty(shape, dtype=dtype)
+        if mmap:
+            return np.memmap(path / name, dtype=dtype, mode='r', shape=shape)
+        return np.fromfile(path / name, dtype=dtype).reshape(shape)
+
+    X = _open(FEATURES_FILE, np.float32, (rows, len(columns)))
+    y = _open(TARGET_FILE, np.int8, (rows,))
+    timestamps = _open(TIMESTAMP_FILE, np.int64, (rows,)).view('datetime64[ns]')
+
+    return MLDataset(X=X, y=y, timestamps=timestamps, feature_columns=columns, meta=meta)
@@ -0,0 +1,386 @@
+"""
+Indicators - векторизованные технические индикаторы для ML фич
+
+Все ядра работают за O(n) по непрерывным float64 массивам без циклов
+Python по строкам: скользящие окна считаются разностью блочных
+префиксных сумм, EMA и сглаживание Уайлдера - линейным фильтром
+scipy.signal.lfilter. Окна передаются списком, и общая часть
+(префиксные суммы, true range) считается один раз на все окна.
+
+Первые window - 1 значений (и окна, задевающие NaN во входе) - NaN,
+как у pandas rolling с min_periods=window.
+"""
+
+import warnings
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.signal import lfilter
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+Windows = Union[int, Sequence[int]]
+
+# Индикаторы compute_indicators по умолчанию: имя -> окна
+DEFAULT_INDICATORS: Dict[str, Tuple[int, ...]] = {
+    'sma': (20, 50),
+    'ema': (12, 26),
+    'volatility': (20,),
+    'rsi': (14,),
+    'atr': (14,),
+    'bollinger': (20,),
+    'vwap': (20,)
+}
+
+def _as_array(values) -> np.ndarray:
+    """Непрерывный float64 массив без копии, если он уже такой"""
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+def _as_windows(windows: Windows) -> List[int]:
+    windows = [windows] if np.isscalar(windows) else list(windows)
+    if not windows or any(int(w) < 1 for w in windows):
+        raise ValueError(f"Windows must be positive integers, got {windows}")
+    return [int(w) for w in windows]
+
+def _shape_output(out: np.ndarray, windows: Windows) -> np.ndarray:
+    """(n,) для одного окна, (n, len(windows)) для списка"""
+    return out[:, 0] if np.isscalar(windows) else out
+
+def _require_scipy() -> None:
+    if not SCIPY_AVAILABLE:
+        raise ImportError("scipy is required for EMA/Wilder indicators, install hydra[ml]")
+
+def _block_size(windows: List[int]) -> int:
+    """Размер блока префиксных сумм: больше любого окна, но небольшой"""
+    return max(4096, 4 * max(windows))
+
+def _window_sums(x: np.ndarray, windows: List[int], power: int = 1) -> np.ndarray:
+    """
+    Скользящие суммы x ** power для всех окон по одним префиксным суммам
+
+    Префиксные суммы накапливаются блоками фиксированного размера, а окно,
+    пересекающее границу блока, складывается из хвоста одного блока и
+    начала следующего. Слагаемые остаются порядка суммы блока, а не всего
+    ряда, поэтому точность не падает на рядах в десятки миллионов строк.
+
+    Returns:
+        Массив (n, len(windows)), NaN где окно неполное или содержит NaN
+    """
+    n = len(x)
+    out = np.full((n, len(windows)), np.nan)
+    if n == 0:
+        return out
+
+    missing = np.isnan(x)
+    has_missing = missing.any()
+    values = np.where(missing, 0.0, x) if has_missing else x
+    if power != 1:
+        values = values ** power
+
+    block = _block_size(windows)
+    pad = -n % block
+    padded = np.concatenate([values, np.zeros(pad)]) if pad else values
+    blocks = np.cumsum(padded.reshape(-1, block), axis=1)
+    totals = blocks[:, -1]
+    local = blocks.ravel()[:n]
+
+    gaps = None
+    if has_missing:
+        gaps = np.empty(n + 1, dtype=np.int64)
+        gaps[0] = 0
+        np.cumsum(missing, out=gaps[1:])
+
+    block_starts = np.arange(block, n, block)
+    for j, w in enumerate(windows):
+        if w > n:
+            continue
+        # Окно, заканчивающееся в t: local[t] - local[t - w] внутри блока
+        column = out[w - 1:, j]
+        column[0] = local[w - 1]
+        np.subtract(local[w:], local[:-w], out=column[1:])
+
+        # Окна, начинающиеся в предыдущем блоке: local[t] + (total - local[t - w])
+        if len(block_starts):
+            ends = (block_starts[:, None] + np.arange(w)).ravel()
+            ends = ends[ends < n]
+            column[ends - w + 1] = local[ends] + (totals[ends // block - 1] - local[ends - w])
+
+        if gaps is not None:
+            column[(gaps[w:] - gaps[:-w]) > 0] = np.nan
+    return out
+
+def rolling_sum(values, windows: Windows) -> np.ndarray:
+    """Скользящая сумма"""
+    return _shape_output(_window_sums(_as_array(values), _as_windows(windows)), windows)
+
+def sma(values, windows: Windows) -> np.ndarray:
+    """Простое скользящее среднее"""
+    window_list = _as_windows(windows)
+    out = _window_sums(_as_array(values), window_list) / np.asarray(window_list, dtype=np.float64)
+    return _shape_output(out, windows)
+
+def _rolling_moments(x: np.ndarray, windows: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Скользящие суммы отклонений и их квадратов для дисперсии
+
+    Каждый блок центрируется по своему среднему: суммы квадратов остаются
+    порядка локального разброса, и разность S2 - S1^2 / n не теряет
+    точность на длинных трендовых рядах. Для окна, пересекающего границу
+    блоков, часть из предыдущего блока пересчитывается к среднему
+    следующего (сдвиг d: S1 + k*d, S2 + 2*d*S1 + k*d^2).
+
+    Returns:
+        (sums, squares) формы (n, len(windows)) относительно среднего
+        блока, в котором заканчивается окно
+    """
+    n = len(x)
+    block = _block_size(windows)
+    pad = -n % block
+    padded = np.concatenate([x, np.full(pad, np.nan)]) if pad else x
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        means = np.nanmean(padded.reshape(-1, block), axis=1)
+    means = np.nan_to_num(means)
+    centered = x - np.repeat(means, block)[:n]
+
+    sums = _window_sums(centered, windows)
+    squares = _window_sums(centered, windows, power=2)
+
+    block_starts = np.arange(block, n, block)
+    if not len(block_starts):
+        return sums, squares
+
+    # Суммы от начала блока - часть окна, лежащая в его последнем блоке
+    values = np.nan_to_num(np.concatenate([centered, np.zeros(pad)]) if pad else centered)
+    heads = np.cumsum(values.reshape(-1, block), axis=1).ravel()
+
+    for j, w in enumerate(windows):
+        if w > n:
+            continue
+        ends = (block_starts[:, None] + np.arange(w - 1)).ravel()
+        ends = ends[ends < n]
+        if not len(ends):
+            continue
+        blocks = ends // block
+        shift = means[blocks - 1] - means[blocks]
+        tail = w - 1 - (ends % block)
+        # Сумма хвоста предыдущего блока, входящего в окно
+        tail_sum = sums[ends, j] - heads[ends]
+        squares[ends, j] += 2.0 * shift * tail_sum + tail * shift * shift
+        sums[ends, j] += tail * shift
+    return sums, squares
+
+def rolling_std(values, windows: Windows, ddof: int = 1) -> np.ndarray:
+    """Скользящее стандартное отклонение"""
+    x = _as_array(values)
+    window_list = _as_windows(windows)
+    if not len(x):
+        return _shape_output(np.empty((0, len(window_list))), windows)
+
+    counts = np.asarray(window_list, dtype=np.float64)
+    sums, squares = _rolling_moments(x, window_list)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (squares - sums * sums / counts) / (counts - ddof)
+    np.maximum(variance, 0.0, out=variance)
+    return _shape_output(np.sqrt(variance), windows)
+
+def returns(values, periods: int = 1) -> np.ndarray:
+    """Относительное изменение за periods шагов (как pandas pct_change)"""
+    x = _as_array(values)
+    out = np.full(len(x), np.nan)
+    if len(x) > periods:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[periods:] = x[periods:] / x[:-periods] - 1.0
+    return out
+
+def log_returns(values, periods: int = 1) -> np.ndarray:
+    """Логарифмическая доходность за periods шагов"""
+    x = _as_array(values)
+    out = np.full(len(x), np.nan)
+    if len(x) > periods:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[periods:] = np.log(x[periods:] / x[:-periods])
+    return out
+
+def volatility(close, windows: Windows) -> np.ndarray:
+    """Скользящее стандартное отклонение доходности"""
+    return rolling_std(returns(close), windows)
+
+def _smooth(x: np.ndarray, alpha: float, seed_window: Optional[int] = None) -> np.ndarray:
+    """
+    Экспоненциальное сглаживание y_t = (1 - alpha) * y_{t-1} + alpha * x_t
+
+    Начинается с первого не-NaN значения: с него самого (EMA) или со
+    среднего первых seed_window значений (сглаживание Уайлдера).
+    NaN внутри ряда распространяется дальше.
+    """
+    out = np.full(len(x), np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if not len(valid):
+        return out
+
+    start = valid[0]
+    if seed_window is None:
+        seed, first = x[start], start
+    else:
+        first = start + seed_window - 1
+        if first >= len(x):
+            return out
+        seed = x[start:first + 1].mean()
+
+    out[first] = seed
+    if first + 1 < len(x):
+        out[first + 1:], _ = lfilter([alpha], [1.0, alpha - 1.0], x[first + 1:], zi=[(1.0 - alpha) * seed])
+    return out
+
+def ema(values, spans: Windows) -> np.ndarray:
+    """Экспоненциальное среднее с alpha = 2 / (span + 1) (pandas ewm(span, adjust=False))"""
+    _require_scipy()
+    x = _as_array(values)
+    span_list = _as_windows(spans)
+    out = np.column_stack([_smooth(x, 2.0 / (span + 1.0)) for span in span_list])
+    return _shape_output(out.reshape(len(x), len(span_list)), spans)
+
+def wilder(values, windows: Windows) -> np.ndarray:
+    """Сглаживание Уайлдера: alpha = 1 / window, старт со среднего первого окна"""
+    _require_scipy()
+    x = _as_array(values)
+    window_list = _as_windows(windows)
+    out = np.column_stack([_smooth(x, 1.0 / w, seed_window=w) for w in window_list])
+    return _shape_output(out.reshape(len(x), len(window_list)), windows)
+
+def rsi(close, windows: Windows, method: str = 'sma') -> np.ndarray:
+    """
+    Relative Strength Index
+
+    Args:
+        close: Цены закрытия
+        windows: Окна
+        method: 'sma' - средние прибыли/убытка по окну (конечная память,
+                одинаково по чанкам), 'wilder' - классическое сглаживание
+
+    Returns:
+        Значения 0..100
+    """
+    x = _as_array(close)
+    delta = np.empty(len(x))
+    delta[:1] = np.nan
+    np.subtract(x[1:], x[:-1], out=delta[1:])
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    gain[np.isnan(delta)] = np.nan
+    loss[np.isnan(delta)] = np.nan
+
+    if method == 'sma':
+        average = sma
+    elif method == 'wilder':
+        average = wilder
+    else:
+        raise ValueError(f"Unknown RSI method {method!r}, expected 'sma' or 'wilder'")
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100.0 - 100.0 / (1.0 + average(gain, windows) / average(loss, windows))
+
+def true_range(high, low, close) -> np.ndarray:
+    """True range; для первого бара - high - low"""
+    h, l, c = _as_array(high), _as_array(low), _as_array(close)
+    prev_close = np.empty(len(c))
+    prev_close[:1] = np.nan
+    prev_close[1:] = c[:-1]
+    ranges = np.stack([h - l, np.abs(h - prev_close), np.abs(l - prev_close)])
+    return np.fmax.reduce(ranges, axis=0)
+
+def atr(high, low, close, windows: Windows, method: str = 'wilder') -> np.ndarray:
+    """Average True Range ('wilder' или 'sma' усреднение true range)"""
+    tr = true_range(high, low, close)
+    if method == 'wilder':
+        return wilder(tr, windows)
+    if method == 'sma':
+        return sma(tr, windows)
+    raise ValueError(f"Unknown ATR method {method!r}, expected 'wilder' or 'sma'")
+
+def bollinger(close, windows: Windows, num_std: float = 2.0,
+              ddof: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Полосы Боллинджера
+
+    Returns:
+        (middle, upper, lower)
+    """
+    middle = sma(close, windows)
+    width = num_std * rolling_std(close, windows, ddof=ddof)
+    return middle, middle + width, middle - width
+
+def vwap(close, volume, windows: Windows, high=None, low=None) -> np.ndarray:
+    """
+    Скользящая VWAP: сумма price * volume / сумма volume по окну
+
+    С high и low цена берется типичной (high + low + close) / 3.
+    """
+    price = _as_array(close)
+    if high is not None and low is not None:
+        price = (_as_array(high) + _as_array(low) + price) / 3.0
+    v = _as_array(volume)
+    window_list = _as_windows(windows)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out = _window_sums(price * v, window_list) / _window_sums(v, window_list)
+    return _shape_output(out, windows)
+
+def _named(prefix: str, windows: Iterable[int], values: np.ndarray) -> Dict[str, np.ndarray]:
+    return {f"{prefix}_{w}": values[:, j] for j, w in enumerate(windows)}
+
+def compute_indicators(df: pd.DataFrame,
+                       spec: Optional[Dict[str, Sequence[int]]] = None) -> pd.DataFrame:
+    """
+    Набор индикаторов по OHLCV DataFrame
+
+    Индикаторы, которым не хватает колонок (atr без high/low, vwap без
+    volume), пропускаются.
+
+    Args:
+        df: DataFrame с close и, по возможности, high, low, volume
+        spec: Индикатор -> окна (DEFAULT_INDICATORS если None)
+
+    Returns:
+        DataFrame индикаторов с тем же индексом: returns, sma_20, ema_12,
+        volatility_20, rsi_14, atr_14, bb_middle_20, bb_upper_20,
+        bb_lower_20, vwap_20, ...
+    """
+    if 'close' not in df.columns:
+        raise ValueError("Column 'close' not found in DataFrame")
+    spec = DEFAULT_INDICATORS if spec is None else spec
+    unknown = set(spec) - set(DEFAULT_INDICATORS)
+    if unknown:
+        raise ValueError(f"Unknown indicators: {sorted(unknown)}")
+
+    close = _as_array(df['close'])
+    has_range = 'high' in df.columns and 'low' in df.columns
+    high = _as_array(df['high']) if has_range else None
+    low = _as_array(df['low']) if has_range else None
+
+    columns: Dict[str, np.ndarray] = {'returns': returns(close)}
+    for name, windows in spec.items():
+        windows = _as_windows(windows)
+        if name == 'sma':
+            columns.update(_named('sma', windows, sma(close, windows)))
+        elif name == 'ema':
+            columns.update(_named('ema', windows, ema(close, windows)))
+        elif name == 'volatility':
+            columns.update(_named('volatility', windows, rolling_std(columns['returns'], windows)))
+        elif name == 'rsi':
+            columns.update(_named('rsi', windows, rsi(close, windows)))
+        elif name == 'atr' and has_range:
+            columns.update(_named('atr', windows, atr(high, low, close, windows)))
+        elif name == 'bollinger':
+            middle, upper, lower = bollinger(close, windows)
+            columns.update(_named('bb_middle', windows, middle))
+            columns.update(_named('bb_upper', windows, upper))
+            columns.update(_named('bb_lower', windows, lower))
+        elif name == 'vwap' and 'volume' in df.columns:
+            columns.update(_named('vwap', windows, vwap(close, df['volume'], windows, high, low)))
+
+    return pd.DataFrame(columns, index=df.index)
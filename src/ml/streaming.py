@@ -0,0 +1,382 @@
+"""
+Streaming Features - инкрементальный расчет индикаторов по живым барам
+"""
+
+import json
+import math
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence
+
+import pandas as pd
+
+from .indicators import DEFAULT_INDICATORS
+
+STATE_VERSION = 1
+
+class _RollingWindows:
+    """
+    Скользящие суммы ряда по нескольким окнам на одном кольцевом буфере
+
+    Суммы обновляются за O(число окон) на значение. Квадраты считаются
+    относительно опорного значения, а раз в длину буфера все суммы
+    пересчитываются из буфера заново: ошибка округления не копится, а
+    амортизированная стоимость остается O(1).
+    """
+
+    def __init__(self, windows: Sequence[int], squares: bool = False):
+        self.windows = sorted(set(int(w) for w in windows))
+        self.size = self.windows[-1]
+        self.track_squares = squares
+        self.buffer: List[float] = [math.nan] * self.size
+        self.count = 0
+        self.ref = 0.0
+        self.sums = [0.0] * len(self.windows)
+        self.squares = [0.0] * len(self.windows)
+        self.nans = [0] * len(self.windows)
+
+    def push(self, value: float) -> None:
+        """Добавление значения (NaN - пропуск, окна с ним дают NaN)"""
+        value = float(value)
+        if self.count == 0 and not math.isnan(value):
+            self.ref = value
+        for j, w in enumerate(self.windows):
+            if self.count >= w:
+                self._remove(j, self.buffer[(self.count - w) % self.size])
+            self._add(j, value)
+
+        self.buffer[self.count % self.size] = value
+        self.count += 1
+        if self.count % self.size == 0:
+            self._recompute()
+
+    def _add(self, j: int, value: float) -> None:
+        if math.isnan(value):
+            self.nans[j] += 1
+            return
+        self.sums[j] += value
+        if self.track_squares:
+            self.squares[j] += (value - self.ref) ** 2
+
+    def _remove(self, j: int, value: float) -> None:
+        if math.isnan(value):
+            self.nans[j] -= 1
+            return
+        self.sums[j] -= value
+        if self.track_squares:
+            self.squares[j] -= (value - self.ref) ** 2
+
+    def _recompute(self) -> None:
+        """Точный пересчет сумм из буфера с новым опорным значением"""
+        latest = self.buffer[(self.count - 1) % self.size]
+        if not math.isnan(latest):
+            self.ref = latest
+        for j, w in enumerate(self.windows):
+            values = [self.buffer[(self.count - 1 - i) % self.size] for i in range(min(w, self.count))]
+            finite = [v for v in values if not math.isnan(v)]
+            self.sums[j] = math.fsum(finite)
+            self.squares[j] = math.fsum((v - self.ref) ** 2 for v in finite) if self.track_squares else 0.0
+            self.nans[j] = len(values) - len(finite)
+
+    def ready(self, window: int) -> bool:
+        """Окно заполнено и без пропусков"""
+        j = self.windows.index(window)
+        return self.count >= window and self.nans[j] == 0
+
+    def sum(self, window: int) -> float:
+        return self.sums[self.windows.index(window)] if self.ready(window) else math.nan
+
+    def mean(self, window: int) -> float:
+        return self.sum(window) / window
+
+    def std(self, window: int, ddof: int = 1) -> float:
+        if not self.ready(window) or window - ddof <= 0:
+            return math.nan
+        j = self.windows.index(window)
+        shifted = self.sums[j] - window * self.ref
+        variance = (self.squares[j] - shifted * shifted / window) / (window - ddof)
+        return math.sqrt(max(variance, 0.0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'windows': self.windows, 'squares': self.track_squares, 'buffer': self.buffer,
+            'count': self.count, 'ref': self.ref, 'sums': self.sums,
+            'square_sums': self.squares, 'nans': self.nans
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_RollingWindows":
+        rolling = cls(data['windows'], data['squares'])
+        rolling.buffer = [float(v) for v in data['buffer']]
+        rolling.count = data['count']
+        rolling.ref = data['ref']
+        rolling.sums = data['sums']
+        rolling.squares = data['square_sums']
+        rolling.nans = data['nans']
+        return rolling
+
+class _Smoother:
+    """
+    Состояние экспоненциального сглаживания одного окна
+
+    Как indicators._smooth: старт с первого не-NaN значения (EMA) или со
+    среднего первых seed_window значений (Уайлдер), NaN после старта
+    распространяется дальше.
+    """
+
+    def __init__(self, alpha: float, seed_window: Optional[int] = None):
+        self.alpha = alpha
+        self.seed_window = seed_window
+        self.value = math.nan
+        self.seen = 0
+        self.seed_sum = 0.0
+
+    def push(self, x: float) -> float:
+        x = float(x)
+        if self.seen == 0 and math.isnan(x):
+            return math.nan
+        self.seen += 1
+        if self.seed_window is None:
+            if self.seen == 1:
+                self.value = x
+            else:
+                self.value = (1.0 - self.alpha) * self.value + self.alpha * x
+        elif self.seen < self.seed_window:
+            self.seed_sum += x
+        elif self.seen == self.seed_window:
+            self.value = (self.seed_sum + x) / self.seed_window
+        else:
+            self.value = (1.0 - self.alpha) * self.value + self.alpha * x
+        return self.value if self.seed_window is None or self.seen >= self.seed_window else math.nan
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'alpha': self.alpha, 'seed_window': self.seed_window, 'value': self.value,
+                'seen': self.seen, 'seed_sum': self.seed_sum}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_Smoother":
+        smoother = cls(data['alpha'], data['seed_window'])
+        smoother.value = data['value']
+        smoother.seen = data['seen']
+        smoother.seed_sum = data['seed_sum']
+        return smoother
+
+class StreamingFeatureState:
+    """
+    Состояние индикаторов символа для инкрементального расчета
+
+    update принимает один бар и возвращает вектор фич с теми же именами
+    и значениями (с точностью до округления), что compute_indicators по
+    всей истории, за время, не зависящее от длины истории. Состояние
+    сериализуется в JSON и переживает перезапуск.
+    """
+
+    def __init__(self, symbol: str,
+                 spec: Optional[Dict[str, Sequence[int]]] = None,
+                 has_range: bool = True, has_volume: bool = True):
+        """
+        Args:
+            symbol: Торговый символ
+            spec: Индикатор -> окна (DEFAULT_INDICATORS если None)
+            has_range: В барах есть high/low (для atr и типичной цены vwap)
+            has_volume: В барах есть volume (для vwap)
+        """
+        spec = {name: tuple(int(w) for w in windows)
+                for name, windows in (DEFAULT_INDICATORS if spec is None else spec).items()}
+        unknown = set(spec) - set(DEFAULT_INDICATORS)
+        if unknown:
+            raise ValueError(f"Unknown indicators: {sorted(unknown)}")
+
+        self.symbol = symbol
+        self.spec = spec
+        self.has_range = has_range
+        self.has_volume = has_volume
+        self.bars = 0
+        self.last_timestamp: Optional[datetime] = None
+        self.prev_close = math.nan
+
+        def windows(*names: str) -> List[int]:
+            return sorted({w for name in names for w in spec.get(name, ())})
+
+        self._close = _RollingWindows(windows('sma', 'bollinger'), squares=True) if windows('sma', 'bollinger') else None
+        self._returns = _RollingWindows(spec['volatility'], squares=True) if spec.get('volatility') else None
+        self._gain = _RollingWindows(spec['rsi']) if spec.get('rsi') else None
+        self._loss = _RollingWindows(spec['rsi']) if spec.get('rsi') else None
+        self._ema = {w: _Smoother(2.0 / (w + 1.0)) for w in spec.get('ema', ())}
+        self._atr = {w: _Smoother(1.0 / w, seed_window=w) for w in spec.get('atr', ())} if has_range else {}
+        use_vwap = has_volume and spec.get('vwap')
+        self._pv = _RollingWindows(spec['vwap']) if use_vwap else None
+        self._volume = _RollingWindows(spec['vwap']) if use_vwap else None
+
+        self.feature_names = self._feature_names()
+
+    def _feature_names(self) -> List[str]:
+        """Имена фич в порядке колонок compute_indicators"""
+        names = ['returns']
+        for name, windows in self.spec.items():
+            if name == 'bollinger':
+                for prefix in ('bb_middle', 'bb_upper', 'bb_lower'):
+                    names.extend(f"{prefix}_{w}" for w in windows)
+            elif (name == 'atr' and not self.has_range) or (name == 'vwap' and self._pv is None):
+                continue
+            else:
+                names.extend(f"{name}_{w}" for w in windows)
+        return names
+
+    def update(self, bar: Dict[str, Any]) -> Dict[str, float]:
+        """
+        Учет нового закрытого бара
+
+        Args:
+            bar: close и, по возможности, high, low, volume, timestamp
+
+        Returns:
+            Фичи бара по feature_names (NaN, пока окно не заполнено)
+        """
+        close = float(bar['close'])
+        high = float(bar['high']) if self.has_range else math.nan
+        low = float(bar['low']) if self.has_range else math.nan
+
+        ret = close / self.prev_close - 1.0 if self.prev_close and not math.isnan(self.prev_close) else math.nan
+        delta = close - self.prev_close
+        features: Dict[str, float] = {'returns': ret}
+
+        if self._close is not None:
+            self._close.push(close)
+        if self._returns is not None:
+            self._returns.push(ret)
+        if self._gain is not None:
+            self._gain.push(max(delta, 0.0) if not math.isnan(delta) else math.nan)
+            self._loss.push(max(-delta, 0.0) if not math.isnan(delta) else math.nan)
+        ema = {w: smoother.push(close) for w, smoother in self._ema.items()}
+
+        atr = {}
+        if self._atr:
+            # Как true_range: без предыдущего close - просто high - low
+            ranges = [high - low, abs(high - self.prev_close), abs(low - self.prev_close)]
+            finite = [r for r in ranges if not math.isnan(r)]
+            tr = max(finite) if finite else math.nan
+            atr = {w: smoother.push(tr) for w, smoother in self._atr.items()}
+
+        if self._pv is not None:
+            volume = float(bar['volume'])
+            price = (high + low + close) / 3.0 if self.has_range else close
+            self._pv.push(price * volume)
+            self._volume.push(volume)
+
+        for name, windows in self.spec.items():
+            for w in windows:
+                if name == 'sma':
+                    features[f"sma_{w}"] = self._close.mean(w)
+                elif name == 'ema':
+                    features[f"ema_{w}"] = ema[w]
+                elif name == 'volatility':
+                    features[f"volatility_{w}"] = self._returns.std(w)
+                elif name == 'rsi':
+                    gain, loss = self._gain.mean(w), self._loss.mean(w)
+                    features[f"rsi_{w}"] = self._rsi(gain, loss)
+                elif name == 'atr' and self._atr:
+                    features[f"atr_{w}"] = atr[w]
+                elif name == 'vwap' and self._pv is not None:
+                    volume_sum = self._volume.sum(w)
+                    features[f"vwap_{w}"] = self._pv.sum(w) / volume_sum if volume_sum else math.nan
+            if name == 'bollinger':
+                for w in windows:
+                    middle = self._close.mean(w)
+                    width = 2.0 * self._close.std(w, ddof=0)
+                    features[f"bb_middle_{w}"] = middle
+                    features[f"bb_upper_{w}"] = middle + width
+                    features[f"bb_lower_{w}"] = middle - width
+
+        self.prev_close = close
+        self.bars += 1
+        if bar.get('timestamp') is not None:
+            self.last_timestamp = pd.Timestamp(bar['timestamp']).to_pydatetime()
+        return {name: features[name] for name in self.feature_names}
+
+    @staticmethod
+    def _rsi(gain: float, loss: float) -> float:
+        """RSI как 100 - 100 / (1 + gain / loss) с правилами деления numpy"""
+        if math.isnan(gain) or math.isnan(loss):
+            return math.nan
+        if loss == 0.0:
+            return math.nan if gain == 0.0 else 100.0
+        return 100.0 - 100.0 / (1.0 + gain / loss)
+
+    @classmethod
+    def from_history(cls, df: pd.DataFrame, symbol: str,
+                     spec: Optional[Dict[str, Sequence[int]]] = None) -> "StreamingFeatureState":
+        """
+        Прогрев состояния по истории (один проход)
+
+        Args:
+            df: OHLCV бары по возрастанию timestamp
+            symbol: Торговый символ
+            spec: Индикатор -> окна
+
+        Returns:
+            Состояние после последнего бара истории
+        """
+        state = cls(symbol, spec,
+                    has_range='high' in df.columns and 'low' in df.columns,
+                    has_volume='volume' in df.columns)
+        for bar in df.to_dict('records'):
+            state.update(bar)
+        return state
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-совместимое состояние"""
+        def rolling(value: Optional[_RollingWindows]):
+            return value.to_dict() if value is not None else None
+
+        return {
+            'version': STATE_VERSION,
+            'symbol': self.symbol,
+            'spec': {name: list(windows) for name, windows in self.spec.items()},
+            'has_range': self.has_range,
+            'has_volume': self.has_volume,
+            'bars': self.bars,
+            'last_timestamp': self.last_timestamp.isoformat() if self.last_timestamp else None,
+            'prev_close': self.prev_close,
+            'close': rolling(self._close),
+            'returns': rolling(self._returns),
+            'gain': rolling(self._gain),
+            'loss': rolling(self._loss),
+            'pv': rolling(self._pv),
+            'volume': rolling(self._volume),
+            'ema': {str(w): s.to_dict() for w, s in self._ema.items()},
+            'atr': {str(w): s.to_dict() for w, s in self._atr.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StreamingFeatureState":
+        """Восстановление состояния из to_dict"""
+        if data.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported feature state version: {data.get('version')}")
+
+        state = cls(data['symbol'], data['spec'], data['has_range'], data['has_volume'])
+        state.bars = data['bars']
+        state.last_timestamp = datetime.fromisoformat(data['last_timestamp']) if data['last_timestamp'] else None
+        state.prev_close = data['prev_close']
+        for name in ('close', 'returns', 'gain', 'loss', 'pv', 'volume'):
+            if data[name] is not None:
+                setattr(state, f"_{name}", _RollingWindows.from_dict(data[name]))
+        state._ema = {int(w): _Smoother.from_dict(s) for w, s in data['ema'].items()}
+        state._atr = {int(w): _Smoother.from_dict(s) for w, s in data['atr'].items()}
+        return state
+
+    def save(self, path: str) -> None:
+        """Атомарное сохранение состояния в JSON файл"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "StreamingFeatureState":
+        """Загрузка состояния, сохраненного save"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,399 @@
+# src/ml/training/hyperparameter_search.py
+"""
+Hyperparameter Search - successive halving с нативной ранней остановкой
+
+Ресурс раунда - число деревьев бустинга: все конфигурации начинают с
+min_resource, в следующий раунд проходит лучшая 1/eta часть с ресурсом
+в eta раз больше. xgboost и lightgbm останавливаются сами по
+валидационному фолду. Испытания раунда идут параллельно в процессах,
+поиск ограничен по времени, а каждое испытание пишется в JSONL журнал,
+по которому прерванный поиск продолжается.
+"""
+
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.metrics import f1_score, log_loss
+import xgboost as xgb
+import lightgbm as lgb
+
+from src.core.system_config import CONFIG
+from .scheduler import SharedArray, share_array
+from .walk_forward import fingerprint
+
+@dataclass(frozen=True)
+class Uniform:
+    """Равномерное распределение на [low, high] (log - по логарифмической шкале)"""
+
+    low: float
+    high: float
+    log: bool = False
+
+    def sample(self, rng: np.random.Generator) -> float:
+        if self.log:
+            return float(math.exp(rng.uniform(math.log(self.low), math.log(self.high))))
+        return float(rng.uniform(self.low, self.high))
+
+@dataclass(frozen=True)
+class IntUniform:
+    """Целые числа на [low, high] включительно"""
+
+    low: int
+    high: int
+
+    def sample(self, rng: np.random.Generator) -> int:
+        return int(rng.integers(self.low, self.high + 1))
+
+@dataclass(frozen=True)
+class Choice:
+    """Один из перечисленных вариантов"""
+
+    options: Sequence[Any]
+
+    def sample(self, rng: np.random.Generator) -> Any:
+        value = self.options[int(rng.integers(len(self.options)))]
+        return value.item() if isinstance(value, np.generic) else value
+
+SEARCH_SPACES: Dict[str, Dict[str, Any]] = {
+    'xgboost': {
+        'learning_rate': Uniform(0.01, 0.3, log=True),
+        'max_depth': IntUniform(3, 10),
+        'min_child_weight': Uniform(1.0, 20.0, log=True),
+        'subsample': Uniform(0.5, 1.0),
+        'colsample_bytree': Uniform(0.5, 1.0),
+        'reg_lambda': Uniform(1e-3, 10.0, log=True),
+    },
+    'lightgbm': {
+        'learning_rate': Uniform(0.01, 0.3, log=True),
+        'num_leaves': IntUniform(15, 255),
+        'min_child_samples': IntUniform(10, 200),
+        'subsample': Uniform(0.5, 1.0),
+        'subsample_freq': Choice([1]),
+        'colsample_bytree': Uniform(0.5, 1.0),
+        'reg_lambda': Uniform(1e-3, 10.0, log=True),
+    },
+}
+
+def sample_configs(space: Dict[str, Any], n_trials: int, seed: int) -> List[Dict[str, Any]]:
+    """Детерминированная выборка конфигураций: тот же seed - те же испытания при продолжении"""
+    rng = np.random.default_rng(seed)
+    return [{name: dist.sample(rng) for name, dist in space.items()} for _ in range(n_trials)]
+
+def halving_rungs(n_trials: int, min_resource: int, max_resource: int, eta: int) -> List[Tuple[int, int]]:
+    """
+    Раунды successive halving
+
+    Returns:
+        (число конфигураций, ресурс) для каждого раунда
+    """
+    if eta < 2:
+        raise ValueError("eta must be at least 2")
+    if not 0 < min_resource <= max_resource:
+        raise ValueError("min_resource must be positive and not exceed max_resource")
+
+    rungs = []
+    trials, resource = n_trials, min_resource
+    while trials >= 1:
+        rungs.append((trials, min(resource, max_resource)))
+        if resource >= max_resource or trials == 1:
+            break
+        trials, resource = trials // eta, resource * eta
+    return rungs
+
+class _XGBDeadline(xgb.callback.TrainingCallback):
+    """Остановка обучения xgboost по истечении бюджета времени"""
+
+    def __init__(self, deadline: Optional[float]):
+        super().__init__()
+        self.deadline = deadline
+        self.expired = False
+
+    def after_iteration(self, model, epoch, evals_log) -> bool:
+        self.expired = self.deadline is not None and time.time() > self.deadline
+        return self.expired
+
+def _lgb_deadline(deadline: Optional[float], state: Dict[str, bool]):
+    """Callback lightgbm: остановка по истечении бюджета времени"""
+    def _callback(env):
+        if deadline is not None and time.time() > deadline:
+            state['expired'] = True
+            raise lgb.callback.EarlyStopException(env.iteration, env.evaluation_result_list)
+    _callback.order = 40
+    return _callback
+
+def build_model(model: str, params: Dict[str, Any], n_estimators: int, n_jobs: int,
+                early_stopping_rounds: Optional[int] = None, callbacks: Optional[List[Any]] = None):
+    """
+    Модель с параметрами испытания
+
+    Args:
+        model: 'xgboost' или 'lightgbm'
+        params: Параметры из пространства поиска
+        n_estimators: Максимум деревьев (ресурс раунда)
+        n_jobs: Потоков
+        early_stopping_rounds: Ранняя остановка (только xgboost - задается в конструкторе)
+        callbacks: Callbacks xgboost
+    """
+    if model == 'xgboost':
+        return xgb.XGBClassifier(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs,
+                                 eval_metric='logloss', early_stopping_rounds=early_stopping_rounds,
+                                 callbacks=callbacks, **params)
+    if model == 'lightgbm':
+        return lgb.LGBMClassifier(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs,
+                                  verbose=-1, **params)
+    raise ValueError(f"Unknown model {model!r}, expected one of {sorted(SEARCH_SPACES)}")
+
+def _run_trial(model: str, params: Dict[str, Any], resource: int, threads: int,
+               early_stopping_rounds: int, deadline: Optional[float],
+               arrays: Dict[str, SharedArray]) -> Dict[str, Any]:
+    """Обучение одной конфигурации в воркере с ранней остановкой на валидации"""
+    X_train, y_train, X_val, y_val = (arrays[key].open() for key in ('X_train', 'y_train', 'X_val', 'y_val'))
+    started = time.perf_counter()
+
+    if model == 'xgboost':
+        deadline_callback = _XGBDeadline(deadline)
+        estimator = build_model(model, params, resource, threads, early_stopping_rounds, [deadline_callback])
+        estimator.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+        expired = deadline_callback.expired
+        best_iteration = getattr(estimator, 'best_iteration', None)
+    else:
+        state = {'expired': False}
+        estimator = build_model(model, params, resource, threads)
+        estimator.fit(X_train, y_train, eval_set=[(X_val, y_val)], eval_metric='binary_logloss',
+                      callbacks=[lgb.early_stopping(early_stopping_rounds, verbose=False),
+                                 _lgb_deadline(deadline, state)])
+        expired = state['expired']
+        best_iteration = estimator.best_iteration_ - 1 if estimator.best_iteration_ else None
+
+    # predict/predict_proba обеих библиотек берут деревья до лучшей итерации
+    proba = estimator.predict_proba(X_val)[:, 1]
+    return {
+        'status': 'timeout' if expired else 'ok',
+        'score': float(log_loss(y_val, proba, labels=[0, 1])),
+        'f1': float(f1_score(y_val, (proba > 0.5).astype(int), zero_division=0)),
+        'n_estimators': (best_iteration + 1) if best_iteration is not None else resource,
+        'seconds': time.perf_counter() - started
+    }
+
+@dataclass
+class SearchResult:
+    """Лучшая конфигурация и все оценки поиска"""
+
+    model: str
+    params: Dict[str, Any]
+    n_estimators: int
+    score: float
+    trials: List[Dict[str, Any]] = field(default_factory=list)
+    seconds: float = 0.0
+    completed: bool = True
+    train_rows: int = 0
+
+class HyperparameterSearch:
+    """Successive halving по пространству параметров xgboost/lightgbm"""
+
+    def __init__(self, model: str = 'xgboost',
+                 space: Optional[Dict[str, Any]] = None,
+                 n_trials: int = 27, min_resource: int = 50, max_resource: int = 1000,
+                 eta: int = 3, early_stopping_rounds: int = 20,
+                 validation_size: float = 0.2, time_budget: Optional[float] = None,
+                 max_workers: Optional[int] = None, log_path: Optional[str] = None,
+                 seed: int = 42, mp_context: str = 'spawn'):
+        """
+        Args:
+            model: 'xgboost' или 'lightgbm'
+            space: Параметр -> распределение (SEARCH_SPACES[model] если None)
+            n_trials: Конфигураций в первом раунде
+            min_resource, max_resource: Деревьев в первом и максимум в последнем раунде
+            eta: Во сколько раз сокращается число конфигураций между раундами
+            early_stopping_rounds: Итераций без улучшения logloss на валидации до остановки
+            validation_size: Доля последних по времени строк train под валидацию,
+                             если валидация не передана явно
+            time_budget: Бюджет на поиск в секундах (без ограничения если None)
+            max_workers: Потоков на все испытания (CONFIG.max_workers если None)
+            log_path: JSONL журнал испытаний для продолжения поиска
+            seed: Seed выборки конфигураций
+            mp_context: Способ запуска процессов
+        """
+        if model not in SEARCH_SPACES:
+            raise ValueError(f"Unknown model {model!r}, expected one of {sorted(SEARCH_SPACES)}")
+
+        self.model = model
+        self.space = SEARCH_SPACES[model] if space is None else space
+        self.n_trials = n_trials
+        self.early_stopping_rounds = early_stopping_rounds
+        self.validation_size = validation_size
+        self.time_budget = time_budget
+        self.max_workers = max(1, max_workers or CONFIG.max_workers)
+        self.log_path = Path(log_path) if log_path else None
+        self.seed = seed
+        self.mp_context = mp_context
+        self.rungs = halving_rungs(n_trials, min_resource, max_resource, eta)
+
+    def _signature(self, data: str) -> Dict[str, Any]:
+        """
+        Описание поиска: журнал продолжается только с тем же описанием
+
+        Args:
+            data: Отпечаток train/валидации (оценки на других данных не переиспользуются)
+        """
+        space = {name: repr(dist) for name, dist in sorted(self.space.items())}
+        return {
+            'type': 'search',
+            'model': self.model,
+            'seed': self.seed,
+            'n_trials': self.n_trials,
+            'rungs': self.rungs,
+            'early_stopping_rounds': self.early_stopping_rounds,
+            'space': hashlib.sha1(json.dumps(space, sort_keys=True).encode()).hexdigest(),
+            'data': data
+        }
+
+    @staticmethod
+    def _data_fingerprint(X_train, y_train, X_val, y_val) -> str:
+        """Хеш выборок и границы валидации - тот же, что у кеша фолдов walk-forward"""
+        parts = [fingerprint(np.asarray(array)) for array in (X_train, y_train, X_val, y_val)]
+        return hashlib.blake2b("".join(parts).encode(), digest_size=16).hexdigest()
+
+    def _load_log(self, signature: Dict[str, Any]) -> Optional[Dict[Tuple[int, int], Dict[str, Any]]]:
+        """
+        Готовые оценки из журнала по (trial, rung)
+
+        Returns:
+            None, если журнала нет или он записан другим поиском (или на других данных)
+        """
+        if self.log_path is None or not self.log_path.exists():
+            return None
+
+        done = {}
+        matched = False
+        signature = json.loads(json.dumps(signature))
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Оборванная при прерывании последняя строка
+                    continue
+                if record.get('type') == 'search':
+                    if record != signature:
+                        print(f"⚠️ Trial log {self.log_path} belongs to a different search or data, starting over")
+                        return None
+                    matched = True
+                elif record.get('status') == 'ok':
+                    done[(record['trial'], record['rung'])] = record
+        return done if matched else None
+
+    def _append_log(self, record: Dict[str, Any], mode: str = 'a') -> None:
+        if self.log_path is None:
+            return
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.log_path, mode, encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def run(self, X_train, y_train, X_val=None, y_val=None) -> SearchResult:
+        """
+        Поиск лучшей конфигурации
+
+        Args:
+            X_train, y_train: Обучающая выборка в хронологическом порядке
+            X_val, y_val: Валидация для ранней остановки и отбора (хвост train если None)
+
+        Returns:
+            SearchResult; completed=False, если поиск остановлен бюджетом времени
+        """
+        if X_val is None or y_val is None:
+            split_at = int(len(X_train) * (1 - self.validation_size))
+            X_train, X_val = X_train[:split_at], X_train[split_at:]
+            y_train, y_val = y_train[:split_at], y_train[split_at:]
+
+        started = time.perf_counter()
+        deadline = time.time() + self.time_budget if self.time_budget is not None else None
+        configs = sample_configs(self.space, self.n_trials, self.seed)
+        signature = self._signature(self._data_fingerprint(X_train, y_train, X_val, y_val))
+        done = self._load_log(signature)
+        if done is None:
+            # Новый журнал вместо чужого: старые оценки к этим данным не относятся
+            self._append_log(signature, mode='w')
+            done = {}
+        if done:
+            print(f"📂 Resuming search: {len(done)} evaluations from {self.log_path}")
+
+        evaluations: List[Dict[str, Any]] = []
+        alive = list(range(self.n_trials))
+        completed = True
+        directory = tempfile.mkdtemp(prefix="hydra-search-")
+        try:
+            arrays = {key: share_array(value, directory, key)
+                      for key, value in (('X_train', X_train), ('y_train', y_train),
+                                         ('X_val', X_val), ('y_val', y_val))}
+
+            context = multiprocessing.get_context(self.mp_context)
+            processes = min(self.max_workers, self.n_trials)
+            with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+                for rung, (keep, resource) in enumerate(self.rungs):
+                    if rung > 0:
+                        scored = sorted((r for r in evaluations if r['rung'] == rung - 1 and r['status'] == 'ok'),
+                                        key=lambda r: r['score'])
+                        alive = [r['trial'] for r in scored[:keep]]
+                    if not alive:
+                        break
+                    if deadline is not None and time.time() > deadline:
+                        completed = False
+                        break
+
+                    threads = max(1, self.max_workers // min(len(alive), self.max_workers))
+                    print(f"🔎 Rung {rung}: {len(alive)} {self.model} configs, up to {resource} trees, "
+                          f"{threads} threads each")
+
+                    futures = {}
+                    for trial in alive:
+                        if (trial, rung) in done:
+                            evaluations.append(done[(trial, rung)])
+                            continue
+                        future = executor.submit(_run_trial, self.model, configs[trial], resource, threads,
+                                                 self.early_stopping_rounds, deadline, arrays)
+                        futures[future] = trial
+
+                    for future in as_completed(futures):
+                        trial = futures[future]
+                        record = dict({'trial': trial, 'rung': rung, 'resource': resource,
+                                       'params': configs[trial]}, **future.result())
+                        evaluations.append(record)
+                        self._append_log(record)
+                        print(f"   ✅ Trial {trial}: logloss={record['score']:.4f} "
+                              f"trees={record['n_estimators']} ({record['seconds']:.1f}s)")
+
+                    if any(r['status'] == 'timeout' for r in evaluations if r['rung'] == rung):
+                        completed = False
+                        print("⏰ Time budget exhausted")
+                        break
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        finished = [r for r in evaluations if r['status'] == 'ok']
+        if not finished:
+            raise RuntimeError("No trial finished within the time budget")
+
+        # Лучшая оценка самого старшего раунда, до которого дошли
+        top_rung = max(r['rung'] for r in finished)
+        best = min((r for r in finished if r['rung'] == top_rung), key=lambda r: r['score'])
+        seconds = time.perf_counter() - started
+        print(f"🏆 Best {self.model} trial {best['trial']}: logloss={best['score']:.4f}, "
+              f"{best['n_estimators']} trees in {seconds:.1f}s")
+
+        return SearchResult(model=self.model, params=best['params'], n_estimators=best['n_estimators'],
+                            score=best['score'], trials=evaluations, seconds=seconds, completed=completed,
+                            train_rows=len(X_train))
@@ -0,0 +1,300 @@
+# src/ml/training/scheduler.py
+"""
+Training Scheduler - параллельное обучение моделей-кандидатов в процессах
+
+Каждый кандидат обучается в своем процессе со своей долей потоков из
+CONFIG.max_workers, так что суммарно ядра не переподписываются. Матрицы
+признаков передаются воркерам как memmap файлы (только чтение), а не
+копией через pickle.
+"""
+
+import mmap
+import multiprocessing
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from threadpoolctl import threadpool_limits
+import xgboost as xgb
+import lightgbm as lgb
+
+from src.core.system_config import CONFIG
+
+def _random_forest(n_jobs: int):
+    return RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs)
+
+def _xgboost(n_jobs: int):
+    return xgb.XGBClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs)
+
+def _lightgbm(n_jobs: int):
+    return lgb.LGBMClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs, verbose=-1)
+
+def _logistic_regression(n_jobs: int):
+    # lbfgs однопоточный, потоки ограничиваются только для BLAS
+    return LogisticRegression(random_state=42)
+
+@dataclass(frozen=True)
+class ModelCandidate:
+    """Модель-кандидат: фабрика по числу потоков и относительная стоимость обучения"""
+
+    factory: Callable[[int], Any]
+    label: str
+    weight: float = 1.0
+    max_threads: Optional[int] = None
+
+# Порядок - порядок обучения и вывода результатов
+CANDIDATE_MODELS: Dict[str, ModelCandidate] = {
+    'random_forest': ModelCandidate(_random_forest, "🌲 Training Random Forest...", weight=3.0),
+    'xgboost': ModelCandidate(_xgboost, "🚀 Training XGBoost...", weight=3.0),
+    'lightgbm': ModelCandidate(_lightgbm, "💡 Training LightGBM...", weight=2.0),
+    'logistic_regression': ModelCandidate(_logistic_regression, "📊 Training Logistic Regression...",
+                                          weight=0.5, max_threads=1),
+}
+
+def evaluate_model(model, X_test, y_test) -> Dict[str, float]:
+    """Метрики классификации на тестовой выборке"""
+    y_pred = model.predict(X_test)
+
+    return {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'precision': precision_score(y_test, y_pred, zero_division=0),
+        'recall': recall_score(y_test, y_pred, zero_division=0),
+        'f1': f1_score(y_test, y_pred, zero_division=0)
+    }
+
+def split_thread_budget(candidates: Dict[str, ModelCandidate], budget: int) -> Dict[str, int]:
+    """
+    Распределение потоков между одновременно обучаемыми моделями
+
+    Каждой модели минимум один поток, остаток делится пропорционально
+    весу (методом наибольшего остатка) с учетом max_threads.
+
+    Args:
+        candidates: Имя -> кандидат
+        budget: Всего потоков
+
+    Returns:
+        Имя -> число потоков
+    """
+    threads = {name: 1 for name in candidates}
+    spare = max(0, budget - len(threads))
+    while spare > 0:
+        open_names = [name for name, c in candidates.items()
+                      if c.max_threads is None or threads[name] < c.max_threads]
+        if not open_names:
+            break
+        total_weight = sum(candidates[name].weight for name in open_names)
+        shares = {name: spare * candidates[name].weight / total_weight for name in open_names}
+        granted = 0
+        for name in open_names:
+            extra = int(shares[name])
+            limit = candidates[name].max_threads
+            if limit is not None:
+                extra = min(extra, limit - threads[name])
+            threads[name] += extra
+            granted += extra
+        if granted == 0:
+            # Остаток меньше числа моделей - по одному потоку самым тяжелым
+            name = max(open_names, key=lambda n: shares[n] - int(shares[n]))
+            threads[name] += 1
+            granted = 1
+        spare -= granted
+    return threads
+
+def slot_thread_budget(candidates: Dict[str, ModelCandidate], max_workers: int,
+                       processes: int) -> Dict[str, int]:
+    """
+    Потоки моделей, когда процессы берут задачи из общей очереди
+
+    Одновременно может обучаться любая комбинация моделей, поэтому каждая
+    получает долю процесса max_workers // processes (не больше max_threads):
+    сумма потоков работающих процессов не превышает max_workers.
+
+    Args:
+        candidates: Имя -> кандидат
+        max_workers: Всего потоков
+        processes: Одновременно работающих процессов
+
+    Returns:
+        Имя -> число потоков
+    """
+    per_slot = max(1, max_workers // max(1, processes))
+    return {name: per_slot if c.max_threads is None else min(per_slot, c.max_threads)
+            for name, c in candidates.items()}
+
+@dataclass(frozen=True)
+class SharedArray:
+    """Ссылка на массив в файле: воркер открывает его memmap только для чтения"""
+
+    path: str
+    dtype: str
+    shape: Tuple[int, ...]
+    offset: int = 0
+
+    def open(self) -> np.ndarray:
+        return np.memmap(self.path, dtype=np.dtype(self.dtype), mode='r',
+                         shape=self.shape, offset=self.offset)
+
+    def rows(self, start: int, stop: int) -> "SharedArray":
+        """Ссылка на строки [start, stop) того же файла"""
+        row_bytes = np.dtype(self.dtype).itemsize * int(np.prod(self.shape[1:], dtype=np.int64))
+        return SharedArray(self.path, self.dtype, (stop - start,) + tuple(self.shape[1:]),
+                           self.offset + start * row_bytes)
+
+def _existing_memmap(array: np.ndarray) -> Optional[SharedArray]:
+    """
+    Ссылка на C-непрерывный memmap (в т.ч. срез строк MLDataset) без копирования
+
+    Смещение в файле считается по публичным атрибутам: offset корневого
+    memmap плюс сдвиг данных среза от начала корня. Если корень не найден,
+    возвращается None и массив копируется.
+    """
+    if not isinstance(array, np.memmap) or not array.filename or not array.flags.c_contiguous:
+        return None
+    # Срезы memmap наследуют offset корня, сам корень держит mmap.mmap в base
+    root = array
+    while isinstance(root.base, np.memmap):
+        root = root.base
+    if not isinstance(root.base, mmap.mmap):
+        return None
+    shift = array.ctypes.data - root.ctypes.data
+    if shift < 0:
+        return None
+    return SharedArray(array.filename, array.dtype.str, array.shape, root.offset + shift)
+
+def share_array(array, directory: str, name: str) -> SharedArray:
+    """
+    Массив в виде memmap файла для воркеров
+
+    Уже отображенные в память массивы (load_dataset) передаются как есть,
+    остальные один раз записываются в directory.
+
+    Args:
+        array: Массив или DataFrame/Series
+        directory: Каталог временных файлов
+        name: Имя файла
+
+    Returns:
+        Ссылка на массив
+    """
+    existing = _existing_memmap(array)
+    if existing is not None:
+        return existing
+
+    values = np.ascontiguousarray(np.asarray(array))
+    if not values.size:
+        raise ValueError(f"Cannot share empty array {name!r}")
+    path = str(Path(directory) / name)
+    target = np.memmap(path, dtype=values.dtype, mode='w+', shape=values.shape)
+    target[:] = values
+    target.flush()
+    del target
+    return SharedArray(path, values.dtype.str, values.shape)
+
+@dataclass
+class TrainingResult:
+    """Обученная модель, ее метрики и время обучения"""
+
+    name: str
+    model: Any
+    metrics: Dict[str, float]
+    seconds: float
+    threads: int
+
+def _fit_candidate(name: str, candidate: ModelCandidate, threads: int,
+                   arrays: Dict[str, SharedArray]) -> TrainingResult:
+    """Обучение и оценка одного кандидата в процессе воркера"""
+    X_train, y_train, X_test, y_test = (arrays[key].open() for key in ('X_train', 'y_train', 'X_test', 'y_test'))
+    started = time.perf_counter()
+    with threadpool_limits(limits=threads):
+        model = candidate.factory(threads)
+        model.fit(X_train, y_train)
+        metrics = evaluate_model(model, X_test, y_test)
+    return TrainingResult(name, model, metrics, time.perf_counter() - started, threads)
+
+@dataclass
+class TrainingTimings:
+    """Время обучения по моделям и общее время расписания"""
+
+    models: Dict[str, float] = field(default_factory=dict)
+    total: float = 0.0
+
+class TrainingScheduler:
+    """Параллельное обучение кандидатов в пуле процессов с общим бюджетом потоков"""
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 tmp_dir: Optional[str] = None,
+                 mp_context: str = 'spawn'):
+        """
+        Args:
+            max_workers: Бюджет потоков на все модели (CONFIG.max_workers если None)
+            tmp_dir: Каталог для memmap файлов (системный временный если None)
+            mp_context: Способ запуска процессов; spawn не наследует потоки
+                        и OpenMP состояние родителя
+        """
+        self.max_workers = max(1, max_workers or CONFIG.max_workers)
+        self.tmp_dir = tmp_dir
+        self.mp_context = mp_context
+        self.timings = TrainingTimings()
+
+    def run(self, X_train, y_train, X_test, y_test,
+            candidates: Optional[Dict[str, ModelCandidate]] = None) -> Dict[str, TrainingResult]:
+        """
+        Обучение всех кандидатов
+
+        Args:
+            X_train, y_train, X_test, y_test: Выборки (массивы, DataFrame или memmap)
+            candidates: Имя -> кандидат (CANDIDATE_MODELS если None)
+
+        Returns:
+            Имя -> результат в порядке candidates
+        """
+        candidates = CANDIDATE_MODELS if candidates is None else candidates
+        processes = min(len(candidates), self.max_workers)
+        if processes == len(candidates):
+            # Все модели обучаются одновременно - max_workers делится по весу
+            threads = split_thread_budget(candidates, self.max_workers)
+        else:
+            # Модели ждут свободный процесс - каждой max_workers // processes потоков
+            threads = slot_thread_budget(candidates, self.max_workers, processes)
+
+        started = time.perf_counter()
+        directory = tempfile.mkdtemp(prefix="hydra-train-", dir=self.tmp_dir)
+        try:
+            arrays = {key: share_array(value, directory, key)
+                      for key, value in (('X_train', X_train), ('y_train', y_train),
+                                         ('X_test', X_test), ('y_test', y_test))}
+
+            print(f"⚙️ Training {len(candidates)} models in {processes} processes, "
+                  f"{self.max_workers} threads: "
+                  + ", ".join(f"{name}={n}" for name, n in threads.items()))
+
+            results: Dict[str, TrainingResult] = {}
+            context = multiprocessing.get_context(self.mp_context)
+            with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+                futures = {
+                    executor.submit(_fit_candidate, name, candidate, threads[name], arrays): name
+                    for name, candidate in candidates.items()
+                }
+                for future in as_completed(futures):
+                    result = future.result()
+                    results[result.name] = result
+                    print(f"✅ {result.name}: {result.seconds:.1f}s ({result.threads} threads)")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        self.timings = TrainingTimings(
+            models={name: results[name].seconds for name in candidates},
+            total=time.perf_counter() - started
+        )
+        print(f"⏱️ Total training time: {self.timings.total:.1f}s "
+              f"(sum of models {sum(self.timings.models.values()):.1f}s)")
+        return {name: results[name] for name in candidates}
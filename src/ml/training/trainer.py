@@ -1,12 +1,13 @@
 # src/ml/training/trainer.py
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-import xgboost as xgb
-import lightgbm as lgb
 import joblib
-from typing import Dict, Any, Tuple
-import numpy as np
+import time
+from typing import Dict, Any, Optional
+
+import pandas as pd
+
+from .scheduler import CANDIDATE_MODELS, TrainingScheduler, TrainingTimings, evaluate_model
+from .hyperparameter_search import HyperparameterSearch, SearchResult, build_model
+from .walk_forward import WalkForwardValidator
 
 class MLTrainer:
     """Тренер ML моделей"""
@@ -14,54 +15,109 @@ class MLTrainer:
     def __init__(self):
         self.models: Dict[str, Any] = {}
         self.best_model: Any = None
+        self.timings = TrainingTimings()
         
-    def train_models(self, X_train, y_train, X_test, y_test) -> Dict[str, Dict]:
-        """Обучение нескольких моделей"""
-        results = {}
-        
-        # 1. Random Forest
-        print("🌲 Training Random Forest...")
-        rf_model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
-        rf_model.fit(X_train, y_train)
-        self.models['random_forest'] = rf_model
-        results['random_forest'] = self._evaluate_model(rf_model, X_test, y_test)
-        
-        # 2. XGBoost
-        print("🚀 Training XGBoost...")
-        xgb_model = xgb.XGBClassifier(n_estimators=100, random_state=42, n_jobs=-1)
-        xgb_model.fit(X_train, y_train)
-        self.models['xgboost'] = xgb_model
-        results['xgboost'] = self._evaluate_model(xgb_model, X_test, y_test)
-        
-        # 3. LightGBM
-        print("💡 Training LightGBM...")
-        lgb_model = lgb.LGBMClassifier(n_estimators=100, random_state=42, n_jobs=-1)
-        lgb_model.fit(X_train, y_train)
-        self.models['lightgbm'] = lgb_model
-        results['lightgbm'] = self._evaluate_model(lgb_model, X_test, y_test)
-        
-        # 4. Logistic Regression (baseline)
-        print("📊 Training Logistic Regression...")
-        lr_model = LogisticRegression(random_state=42, n_jobs=-1)
-        lr_model.fit(X_train, y_train)
-        self.models['logistic_regression'] = lr_model
-        results['logistic_regression'] = self._evaluate_model(lr_model, X_test, y_test)
+    def train_models(self, X_train, y_train, X_test, y_test,
+                     parallel: bool = False, max_workers: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        Обучение нескольких моделей
+
+        Args:
+            parallel: Обучать модели одновременно в процессах (TrainingScheduler),
+                      поделив между ними max_workers потоков
+            max_workers: Бюджет потоков при parallel (CONFIG.max_workers если None)
+        """
+        if parallel:
+            scheduler = TrainingScheduler(max_workers=max_workers)
+            trained = scheduler.run(X_train, y_train, X_test, y_test)
+            results = {}
+            for name, result in trained.items():
+                self.models[name] = result.model
+                results[name] = result.metrics
+            self.timings = scheduler.timings
+        else:
+            results = self._train_sequential(X_train, y_train, X_test, y_test)
         
         # Выбираем лучшую модель
         self._select_best_model(results)
         
         return results
     
+    def walk_forward(self, X, y, n_folds: int = 5, mode: str = 'expanding', **kwargs) -> pd.DataFrame:
+        """
+        Walk-forward валидация всех моделей вместо одного holdout
+
+        Args:
+            X, y: Немасштабированные фичи и target (MLDataPreprocessor.prepare_features)
+            n_folds: Число фолдов
+            mode: 'expanding' или 'rolling'
+            **kwargs: Остальные параметры WalkForwardValidator
+
+        Returns:
+            Метрики по (фолд, модель)
+        """
+        validator = WalkForwardValidator(n_folds=n_folds, mode=mode, **kwargs)
+        results = validator.run(X, y)
+        print(validator.summary())
+        return results
+    
+    def search_hyperparameters(self, X_train, y_train, model: str = 'xgboost',
+                               X_val=None, y_val=None, **kwargs) -> SearchResult:
+        """
+        Подбор параметров бустинга successive halving и обучение лучшей конфигурации
+
+        Итоговая модель обучается на всем X_train и заменяет модель с
+        параметрами по умолчанию в self.models. Если валидация отрезана от
+        X_train, найденное ранней остановкой число деревьев масштабируется
+        на отношение строк len(X_train) / result.train_rows: при том же
+        learning_rate большей выборке нужно больше деревьев, а последние по
+        времени строки не выбрасываются из итогового обучения.
+
+        Args:
+            X_train, y_train: Обучающая выборка
+            model: 'xgboost' или 'lightgbm'
+            X_val, y_val: Валидация (хвост X_train если None)
+            **kwargs: Параметры HyperparameterSearch (time_budget, log_path, ...)
+
+        Returns:
+            Результат поиска
+        """
+        result = HyperparameterSearch(model=model, **kwargs).run(X_train, y_train, X_val, y_val)
+
+        n_estimators = result.n_estimators
+        if result.train_rows and len(X_train) > result.train_rows:
+            n_estimators = max(1, round(result.n_estimators * len(X_train) / result.train_rows))
+
+        print(f"🎯 Refitting {model} with tuned parameters ({n_estimators} trees)...")
+        tuned = build_model(model, result.params, n_estimators, n_jobs=-1)
+        tuned.fit(X_train, y_train)
+        self.models[model] = tuned
+        return result
+    
+    def _train_sequential(self, X_train, y_train, X_test, y_test) -> Dict[str, Dict]:
+        """Поочередное обучение, каждая модель на всех ядрах"""
+        results = {}
+        timings = TrainingTimings()
+        started = time.perf_counter()
+        
+        for name, candidate in CANDIDATE_MODELS.items():
+            print(candidate.label)
+            model_started = time.perf_counter()
+            model = candidate.factory(-1)
+            model.fit(X_train, y_train)
+            self.models[name] = model
+            results[name] = self._evaluate_model(model, X_test, y_test)
+            timings.models[name] = time.perf_counter() - model_started
+            print(f"✅ {name}: {timings.models[name]:.1f}s")
+        
+        timings.total = time.perf_counter() - started
+        self.timings = timings
+        print(f"⏱️ Total training time: {timings.total:.1f}s")
+        return results
+    
     def _evaluate_model(self, model, X_test, y_test) -> Dict[str, float]:
         """Оценка модели"""
-        y_pred = model.predict(X_test)
-        
-        return {
-            'accuracy': accuracy_score(y_test, y_pred),
-            'precision': precision_score(y_test, y_pred, zero_division=0),
-            'recall': recall_score(y_test, y_pred, zero_division=0),
-            'f1': f1_score(y_test, y_pred, zero_division=0)
-        }
+        return evaluate_model(model, X_test, y_test)
     
     def _select_best_model(self, results: Dict[str, Dict]):
         """Выбор лучшей модели по F1-score"""
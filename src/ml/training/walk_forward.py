@@ -0,0 +1,258 @@
+# src/ml/training/walk_forward.py
+"""
+Walk-Forward Validation - хронологическая кросс-валидация по многим фолдам
+
+Фолды масштабируются один раз (StandardScaler по train части фолда) и
+кешируются memmap файлами, которые читают все типы моделей. Пары
+(фолд, модель) обучаются параллельно в пуле процессов.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from src.core.system_config import CONFIG
+from .scheduler import (
+    CANDIDATE_MODELS, ModelCandidate, SharedArray, _fit_candidate, share_array, slot_thread_budget
+)
+
+# Строк за один шаг масштабирования - ограничивает память воркера
+SCALE_BLOCK_ROWS = 262144
+
+FOLD_META_FILE = "meta.json"
+
+class Fold(NamedTuple):
+    """Границы фолда: строки [train_start, train_end) и [test_start, test_end)"""
+
+    index: int
+    train_start: int
+    train_end: int
+    test_start: int
+    test_end: int
+
+    @property
+    def key(self) -> str:
+        return f"fold-{self.train_start}-{self.train_end}-{self.test_start}-{self.test_end}"
+
+def walk_forward_splits(n_samples: int, n_folds: int = 5, mode: str = 'expanding',
+                        test_size: Optional[int] = None, train_size: Optional[int] = None,
+                        gap: int = 0) -> List[Fold]:
+    """
+    Хронологические фолды: тестовые окна подряд в конце ряда, train - перед каждым
+
+    Args:
+        n_samples: Строк в выборке
+        n_folds: Число фолдов
+        mode: 'expanding' - train с начала ряда, 'rolling' - последние train_size строк
+        test_size: Строк в тесте фолда (n_samples // (n_folds + 1) если None)
+        train_size: Строк в train для rolling (train первого фолда если None)
+        gap: Пропуск строк между train и test (против утечки через окна фич)
+
+    Returns:
+        Список фолдов по времени
+
+    Raises:
+        ValueError: Неизвестный mode или не хватает строк на фолды
+    """
+    if mode not in ('expanding', 'rolling'):
+        raise ValueError(f"Unknown walk-forward mode {mode!r}, expected 'expanding' or 'rolling'")
+    if n_folds < 1:
+        raise ValueError("n_folds must be at least 1")
+
+    test_size = test_size or n_samples // (n_folds + 1)
+    first_test = n_samples - n_folds * test_size
+    if test_size < 1 or first_test - gap < 1:
+        raise ValueError(f"Not enough rows ({n_samples}) for {n_folds} folds of {test_size} test rows")
+    if mode == 'rolling':
+        train_size = train_size or first_test - gap
+
+    folds = []
+    for index in range(n_folds):
+        test_start = first_test + index * test_size
+        train_end = test_start - gap
+        train_start = 0 if mode == 'expanding' else max(0, train_end - train_size)
+        folds.append(Fold(index, train_start, train_end, test_start, test_start + test_size))
+    return folds
+
+def fingerprint(X: np.ndarray, block_rows: int = SCALE_BLOCK_ROWS) -> str:
+    """Хеш содержимого матрицы признаков - ключ кеша масштабированных фолдов"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{X.dtype.str}{X.shape}".encode())
+    for start in range(0, len(X), block_rows):
+        digest.update(np.ascontiguousarray(X[start:start + block_rows]).tobytes())
+    return digest.hexdigest()
+
+def _scale_fold(X_ref: SharedArray, fold: Fold, fold_dir: str) -> Dict[str, SharedArray]:
+    """
+    Масштабирование фолда в воркере блоками: scaler по train, запись float32 memmap
+
+    meta.json пишется последним, поэтому его наличие означает готовый кеш.
+    """
+    fold_dir = Path(fold_dir)
+    X = X_ref.open()
+    scaler = StandardScaler()
+    for start in range(fold.train_start, fold.train_end, SCALE_BLOCK_ROWS):
+        scaler.partial_fit(X[start:min(start + SCALE_BLOCK_ROWS, fold.train_end)])
+
+    fold_dir.mkdir(parents=True, exist_ok=True)
+    refs = {}
+    for name, (start, stop) in (('X_train', (fold.train_start, fold.train_end)),
+                                ('X_test', (fold.test_start, fold.test_end))):
+        path = fold_dir / name
+        out = np.memmap(path, dtype=np.float32, mode='w+', shape=(stop - start, X.shape[1]))
+        for block in range(start, stop, SCALE_BLOCK_ROWS):
+            block_stop = min(block + SCALE_BLOCK_ROWS, stop)
+            out[block - start:block_stop - start] = scaler.transform(X[block:block_stop])
+        out.flush()
+        del out
+        refs[name] = SharedArray(str(path), np.dtype(np.float32).str, (stop - start, X.shape[1]))
+
+    meta = {
+        'fold': fold._asdict(),
+        'mean': scaler.mean_.tolist(),
+        'scale': scaler.scale_.tolist()
+    }
+    tmp_path = fold_dir / (FOLD_META_FILE + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, fold_dir / FOLD_META_FILE)
+    return refs
+
+def _cached_fold(fold: Fold, fold_dir: Path, n_features: int) -> Optional[Dict[str, SharedArray]]:
+    """Ссылки на уже масштабированный фолд или None"""
+    if not (fold_dir / FOLD_META_FILE).exists():
+        return None
+    dtype = np.dtype(np.float32).str
+    return {
+        'X_train': SharedArray(str(fold_dir / 'X_train'), dtype, (fold.train_end - fold.train_start, n_features)),
+        'X_test': SharedArray(str(fold_dir / 'X_test'), dtype, (fold.test_end - fold.test_start, n_features))
+    }
+
+class WalkForwardValidator:
+    """Параллельная walk-forward валидация моделей-кандидатов"""
+
+    def __init__(self, n_folds: int = 5, mode: str = 'expanding',
+                 test_size: Optional[int] = None, train_size: Optional[int] = None,
+                 gap: int = 0, max_workers: Optional[int] = None,
+                 cache_dir: Optional[str] = None, mp_context: str = 'spawn'):
+        """
+        Args:
+            n_folds, mode, test_size, train_size, gap: Параметры walk_forward_splits
+            max_workers: Бюджет потоков (CONFIG.max_workers если None)
+            cache_dir: Каталог кеша масштабированных фолдов между запусками
+                       (временный, удаляемый после run, если None)
+            mp_context: Способ запуска процессов
+        """
+        self.n_folds = n_folds
+        self.mode = mode
+        self.test_size = test_size
+        self.train_size = train_size
+        self.gap = gap
+        self.max_workers = max(1, max_workers or CONFIG.max_workers)
+        self.cache_dir = cache_dir
+        self.mp_context = mp_context
+        self.results = pd.DataFrame()
+
+    def run(self, X, y, candidates: Optional[Dict[str, ModelCandidate]] = None) -> pd.DataFrame:
+        """
+        Оценка кандидатов на всех фолдах
+
+        Args:
+            X: Признаки без масштабирования в хронологическом порядке
+            y: Целевая переменная
+            candidates: Имя -> кандидат (CANDIDATE_MODELS если None)
+
+        Returns:
+            DataFrame по строке на (фолд, модель): границы фолда, метрики,
+            время обучения и число потоков
+
+        Raises:
+            ValueError: Пустой словарь кандидатов или не хватает строк на фолды
+        """
+        candidates = CANDIDATE_MODELS if candidates is None else candidates
+        if not candidates:
+            raise ValueError("No candidate models to validate")
+        X = X.to_numpy() if isinstance(X, pd.DataFrame) else X
+        folds = walk_forward_splits(len(X), self.n_folds, self.mode, self.test_size, self.train_size, self.gap)
+
+        tasks = len(folds) * len(candidates)
+        processes = min(tasks, self.max_workers)
+        # Каждый процесс обучает одну модель за раз, и тяжелые модели могут
+        # совпасть по времени - каждой задаче не больше доли процесса
+        threads = slot_thread_budget(candidates, self.max_workers, processes)
+
+        started = time.perf_counter()
+        work_dir = tempfile.mkdtemp(prefix="hydra-walk-forward-")
+        if self.cache_dir is not None:
+            cache_root = Path(self.cache_dir) / fingerprint(X)
+        else:
+            cache_root = Path(work_dir) / "folds"
+
+        rows = []
+        try:
+            X_ref = share_array(X, work_dir, 'X')
+            y_ref = share_array(y, work_dir, 'y')
+
+            print(f"⚙️ Walk-forward: {len(folds)} {self.mode} folds x {len(candidates)} models "
+                  f"in {processes} processes")
+
+            context = multiprocessing.get_context(self.mp_context)
+            with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+                pending = {}
+
+                def submit_models(fold: Fold, fold_refs: Dict[str, SharedArray]):
+                    arrays = dict(fold_refs,
+                                  y_train=y_ref.rows(fold.train_start, fold.train_end),
+                                  y_test=y_ref.rows(fold.test_start, fold.test_end))
+                    for name, candidate in candidates.items():
+                        future = executor.submit(_fit_candidate, name, candidate, threads[name], arrays)
+                        pending[future] = ('model', fold)
+
+                for fold in folds:
+                    fold_dir = cache_root / fold.key
+                    cached = _cached_fold(fold, fold_dir, X.shape[1])
+                    if cached is not None:
+                        submit_models(fold, cached)
+                    else:
+                        pending[executor.submit(_scale_fold, X_ref, fold, str(fold_dir))] = ('scale', fold)
+
+                # Модели фолда стартуют, как только фолд масштабирован
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        kind, fold = pending.pop(future)
+                        if kind == 'scale':
+                            submit_models(fold, future.result())
+                            continue
+                        result = future.result()
+                        rows.append(dict(fold._asdict(), model=result.name, **result.metrics,
+                                         seconds=result.seconds, threads=result.threads))
+                        print(f"✅ Fold {fold.index} {result.name}: f1={result.metrics['f1']:.3f} "
+                              f"({result.seconds:.1f}s)")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        self.results = (pd.DataFrame(rows)
+                        .rename(columns={'index': 'fold'})
+                        .sort_values(['fold', 'model'])
+                        .reset_index(drop=True))
+        print(f"⏱️ Walk-forward finished in {time.perf_counter() - started:.1f}s")
+        return self.results
+
+    def summary(self) -> pd.DataFrame:
+        """Среднее и стандартное отклонение метрик по фолдам для каждой модели"""
+        if self.results.empty:
+            return pd.DataFrame()
+        metrics = ['accuracy', 'precision', 'recall', 'f1', 'seconds']
+        return self.results.groupby('model')[metrics].agg(['mean', 'std'])
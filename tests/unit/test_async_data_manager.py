@@ -0,0 +1,152 @@
+"""
+Unit tests for AsyncDataManager
+"""
+
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.core.async_data_manager import AsyncDataManager
+from src.core.schema import SchemaRegistry
+
+START = datetime(2024, 1, 1)
+
+class _AsyncCursor:
+    """Курсор motor: асинхронная итерация по документам"""
+
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+def _make_docs(count, symbol="BTCUSDT"):
+    """Документы в формате save_metrics"""
+    return [{
+        '_id': i,
+        'timestamp': START + timedelta(hours=i),
+        'symbol': symbol,
+        'metrics': {'close': float(i), 'volume': 1.0}
+    } for i in range(count)]
+
+class TestAsyncDataManager(unittest.IsolatedAsyncioTestCase):
+    """Тесты чтения и записи через замоканный motor"""
+
+    def setUp(self):
+        self.collection = MagicMock()
+        self.collection.insert_one = AsyncMock()
+        self.collection.create_index = AsyncMock()
+
+        self.client = MagicMock()
+        self.client.admin.command = AsyncMock(side_effect=self._ping)
+        self.client.__getitem__.return_value.__getitem__.return_value = self.collection
+
+        patcher = patch('motor.motor_asyncio.AsyncIOMotorClient', return_value=self.client)
+        self.client_class = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.data_manager = AsyncDataManager(max_concurrency=4, schemas=SchemaRegistry())
+
+    @staticmethod
+    async def _ping(command):
+        # Отдаем управление, чтобы одновременные подключения пересеклись
+        await asyncio.sleep(0)
+        return {'ok': 1}
+
+    async def test_save_metrics(self):
+        """Документ пишется insert_one и попадает в очередь реального времени"""
+        self.assertTrue(await self.data_manager.save_metrics({'close': 1.0}, "BTCUSDT"))
+
+        document = self.collection.insert_one.await_args.args[0]
+        self.assertEqual(document['symbol'], "BTCUSDT")
+        self.assertEqual(document['metrics'], {'close': 1.0})
+        self.assertEqual(len(self.data_manager.get_realtime_queue('metrics')), 1)
+
+    async def test_historical_data(self):
+        """История читается одним отсортированным запросом в DataFrame"""
+        self.collection.find.return_value = _AsyncCursor(_make_docs(5))
+
+        df = await self.data_manager.get_historical_data("BTCUSDT", START, START + timedelta(days=1))
+
+        self.assertEqual(self.collection.find.call_args.kwargs['sort'], [('timestamp', 1)])
+        self.assertEqual(df['close'].tolist(), [0.0, 1.0, 2.0, 3.0, 4.0])
+
+    async def test_latest_metrics(self):
+        """Последние метрики читаются по убыванию времени"""
+        self.collection.find.return_value = _AsyncCursor(list(reversed(_make_docs(3))))
+
+        latest = await self.data_manager.get_latest_metrics("BTCUSDT", limit=3)
+
+        self.assertEqual([m['id'] for m in latest], ['2', '1', '0'])
+        self.assertEqual(self.collection.find.call_args.kwargs['sort'], [('timestamp', -1)])
+
+    async def test_concurrent_connect_creates_one_client(self):
+        """Одновременные первые обращения создают один клиент"""
+        collections = await asyncio.gather(*(
+            self.data_manager.db.get_collection(name) for name in ("btcusdt", "ethusdt", "solusdt")
+        ))
+
+        self.assertTrue(all(collection is self.collection for collection in collections))
+        self.client_class.assert_called_once()
+        self.client.admin.command.assert_awaited_once_with('ping')
+
+    async def test_failed_connect_closes_client(self):
+        """Клиент без подключения закрывается, коллекция не выдается"""
+        self.client.admin.command.side_effect = ConnectionError("down")
+
+        self.assertFalse(await self.data_manager.save_metrics({'close': 1.0}, "BTCUSDT"))
+
+        self.client.close.assert_called_once()
+        self.assertIsNone(self.data_manager.db.client)
+        self.collection.insert_one.assert_not_called()
+
+    async def test_save_is_insert_only(self):
+        """Асинхронная запись только вставляет: без upsert, агрегатов и покрытия"""
+        self.collection.update_one = AsyncMock()
+        self.collection.bulk_write = AsyncMock()
+
+        self.assertTrue(await self.data_manager.save_metrics({'close': 1.0}, "BTCUSDT"))
+
+        self.collection.insert_one.assert_awaited_once()
+        self.collection.update_one.assert_not_called()
+        self.collection.bulk_write.assert_not_called()
+        self.assertFalse(hasattr(self.data_manager, 'coverage'))
+
+class TestLoopBoundPrimitives(unittest.TestCase):
+    """Семафор и блокировка подключения создаются в работающем цикле"""
+
+    def test_built_before_asyncio_run(self):
+        """Объект, созданный вне цикла, работает в нескольких asyncio.run подряд"""
+        collection = MagicMock()
+        collection.insert_one = AsyncMock()
+        collection.create_index = AsyncMock()
+        client = MagicMock()
+        client.admin.command = AsyncMock(return_value={'ok': 1})
+        client.__getitem__.return_value.__getitem__.return_value = collection
+
+        with patch('motor.motor_asyncio.AsyncIOMotorClient', return_value=client):
+            data_manager = AsyncDataManager(max_concurrency=2, schemas=SchemaRegistry())
+            self.assertIsNone(data_manager._semaphore_obj)
+            self.assertIsNone(data_manager.db._connect_lock)
+
+            async def save():
+                self.assertTrue(await data_manager.save_metrics({'close': 1.0}, "BTCUSDT"))
+                data_manager.db.database = None
+                return data_manager._semaphore, data_manager.db._connect_lock
+
+            first = asyncio.run(save())
+            second = asyncio.run(save())
+
+        self.assertIsNot(first[0], second[0])
+        self.assertIsNot(first[1], second[1])
+        self.assertEqual(collection.insert_one.await_count, 2)
+
+if __name__ == "__main__":
+    unittest.main()
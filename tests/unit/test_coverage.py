@@ -0,0 +1,215 @@
+"""
+Unit tests for the coverage index
+"""
+
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+from src.core.coverage import CoverageIndex, merge_ranges, subtract_ranges
+from src.core.data_manager import DataManager
+from src.core.schema import SchemaRegistry
+
+START = datetime(2024, 1, 1)
+
+def _hours(*offsets):
+    return [START + timedelta(hours=h) for h in offsets]
+
+def _span(start, end):
+    return (START + timedelta(hours=start), START + timedelta(hours=end))
+
+class _FakeCoverageCollection:
+    """Коллекция покрытия в памяти с фильтром по версии, как у replace_one"""
+
+    def __init__(self):
+        self.docs = {}
+
+    def find_one(self, query):
+        doc = self.docs.get(query['_id'])
+        return dict(doc, _id=query['_id']) if doc else None
+
+    def find(self, query, projection=None):
+        return [dict(doc, _id=key) for key, doc in self.docs.items() if doc['symbol'] == query['symbol']]
+
+    def replace_one(self, query, doc, upsert=False):
+        current = self.docs.get(query['_id'])
+        matched = current is not None and current.get('version') == query['version']
+        if matched or (current is None and upsert):
+            self.docs[query['_id']] = doc
+        return Mock(matched_count=int(matched), upserted_id=query['_id'] if current is None and upsert else None)
+
+class TestCoverageIndex(unittest.TestCase):
+    """Тесты покрытия и поиска пропусков"""
+
+    def setUp(self):
+        self.collection = Mock()
+        self.collection.find_one.return_value = None
+        self.coverage = CoverageIndex(lambda: self.collection, persist_interval=3600)
+
+    def test_merge_ranges(self):
+        """Смежные и пересекающиеся диапазоны объединяются"""
+        a, b, c, d = _hours(0, 1, 2, 3)
+        self.assertEqual(merge_ranges([(c, d), (a, b), (b, c)]), [(a, d)])
+
+    def test_points_collapse_into_ranges(self):
+        """Подряд идущие бары дают один диапазон, пропуск - два"""
+        self.coverage.add_points("BTCUSDT", '1h', _hours(0, 1, 2, 5, 6))
+
+        self.assertEqual(self.coverage.ranges("BTCUSDT", '1h'),
+                         [(START, START + timedelta(hours=3)),
+                          (START + timedelta(hours=5), START + timedelta(hours=7))])
+
+    def test_gaps(self):
+        """Пропуски внутри и по краям запрошенного диапазона"""
+        self.coverage.add_points("BTCUSDT", '1h', _hours(2, 3, 6))
+        gaps = self.coverage.gaps("BTCUSDT", '1h', START, START + timedelta(hours=10))
+
+        self.assertEqual(gaps, [
+            (START, START + timedelta(hours=2)),
+            (START + timedelta(hours=4), START + timedelta(hours=6)),
+            (START + timedelta(hours=7), START + timedelta(hours=10))
+        ])
+        self.assertTrue(self.coverage.is_covered("BTCUSDT", '1h', *_hours(2, 4)))
+
+    def test_persistence_is_debounced(self):
+        """Изменения сохраняются при flush, а не на каждой записи"""
+        self.coverage.add_points("BTCUSDT", '1h', _hours(0))
+        self.coverage.add_points("BTCUSDT", '1h', _hours(1))
+        self.collection.replace_one.assert_not_called()
+
+        self.assertEqual(self.coverage.flush(), 1)
+        (query, doc), _ = self.collection.replace_one.call_args
+        self.assertEqual(query, {'_id': "BTCUSDT:1h", 'version': None})
+        self.assertEqual(doc['version'], 1)
+        self.assertEqual(doc['ranges'], [{'start': START, 'end': START + timedelta(hours=2)}])
+        self.assertEqual(self.coverage.flush(), 0)
+
+    def test_rebuild_from_collection(self):
+        """Покрытие строится по уже сохраненным документам"""
+        source = Mock()
+        source.find.return_value = iter([{'timestamp': t} for t in _hours(0, 1, 4)])
+
+        ranges = self.coverage.rebuild(source, "BTCUSDT", '1h')
+
+        self.assertEqual(len(ranges), 2)
+        self.collection.replace_one.assert_called_once()
+
+    def test_unreadable_coverage_is_merged_on_flush(self):
+        """Покрытие, не прочитанное из-за ошибки, не затирается при сохранении"""
+        stored = {'ranges': [{'start': START, 'end': START + timedelta(hours=1)}]}
+        self.collection.find_one.side_effect = [ConnectionError("down"), stored]
+        self.coverage.add_points("BTCUSDT", '1h', _hours(5))
+        self.assertEqual(self.coverage.ranges("BTCUSDT", '1h'), [(START + timedelta(hours=5), START + timedelta(hours=6))])
+
+        self.assertEqual(self.coverage.flush(), 1)
+        (_, doc), _ = self.collection.replace_one.call_args
+        self.assertEqual(len(doc['ranges']), 2)
+
+    def test_marking_does_not_read_collection(self):
+        """Отметка баров не читает коллекцию, сохраненное покрытие подмешивается при чтении"""
+        self.collection.find_one.return_value = {'ranges': [{'start': START, 'end': START + timedelta(hours=1)}]}
+        self.coverage.add_points("BTCUSDT", '1h', _hours(1))
+        self.collection.find_one.assert_not_called()
+
+        self.assertEqual(self.coverage.ranges("BTCUSDT", '1h'), [(START, START + timedelta(hours=2))])
+
+    def test_subtract_ranges(self):
+        """Вычитание режет диапазоны, None - с начала ряда"""
+        ranges = [_span(0, 4), _span(6, 8)]
+        self.assertEqual(subtract_ranges(ranges, [_span(1, 2)]), [_span(0, 1), _span(2, 4), _span(6, 8)])
+        self.assertEqual(subtract_ranges(ranges, [(None, START + timedelta(hours=7))]), [_span(7, 8)])
+
+class TestSharedCoverage(unittest.TestCase):
+    """Покрытие, которое сохраняют несколько процессов"""
+
+    def setUp(self):
+        self.collection = _FakeCoverageCollection()
+
+    def _index(self):
+        return CoverageIndex(lambda: self.collection, persist_interval=3600)
+
+    def test_flushes_merge_instead_of_overwriting(self):
+        """Два индекса с загруженным покрытием не затирают диапазоны друг друга"""
+        live, backfill = self._index(), self._index()
+        self.assertEqual(live.ranges("BTCUSDT", '1h'), [])
+        self.assertEqual(backfill.ranges("BTCUSDT", '1h'), [])
+
+        backfill.add_range("BTCUSDT", '1h', *_span(0, 10))
+        backfill.flush()
+        live.add_points("BTCUSDT", '1h', _hours(20))
+        live.flush()
+
+        stored = self.collection.find_one({'_id': "BTCUSDT:1h"})
+        self.assertEqual(len(stored['ranges']), 2)
+        self.assertEqual(stored['version'], 2)
+        self.assertEqual(live.ranges("BTCUSDT", '1h'), [_span(0, 10), _span(20, 21)])
+
+    def test_concurrent_change_is_retried(self):
+        """Документ, измененный между чтением и записью, перечитывается"""
+        index = self._index()
+        index.add_range("BTCUSDT", '1h', *_span(0, 2))
+        original = self.collection.replace_one
+        other = self._index()
+        other.add_range("BTCUSDT", '1h', *_span(5, 6))
+
+        def _race(query, doc, upsert=False):
+            if other._pending:
+                other.flush()
+            return original(query, doc, upsert)
+
+        self.collection.replace_one = _race
+        self.assertEqual(index.flush(), 1)
+
+        stored = self.collection.find_one({'_id': "BTCUSDT:1h"})
+        self.assertEqual([(r['start'], r['end']) for r in stored['ranges']], [_span(0, 2), _span(5, 6)])
+
+    def test_removed_range_is_persisted_for_all_intervals(self):
+        """Снятие покрытия после очистки применяется ко всем интервалам символа"""
+        writer = self._index()
+        writer.add_range("BTCUSDT", '1h', *_span(0, 10))
+        writer.add_range("BTCUSDT", '1d', *_span(0, 48))
+        writer.flush()
+
+        retention = self._index()
+        retention.remove_range("BTCUSDT", None, START + timedelta(hours=5))
+        self.assertEqual(retention.flush(), 2)
+
+        reader = self._index()
+        self.assertEqual(reader.gaps("BTCUSDT", '1h', *_span(0, 10)), [_span(0, 5)])
+        self.assertEqual(reader.ranges("BTCUSDT", '1d'), [_span(5, 48)])
+
+class TestJournalCoverage(unittest.TestCase):
+    """Покрытие на пути записи через журнал"""
+
+    def test_save_metrics_does_not_wait_for_coverage_collection(self):
+        """save_metrics с журналом отмечает покрытие в памяти, не дожидаясь MongoDB"""
+        def _stalled():
+            time.sleep(5)
+            raise ConnectionError("server selection timeout")
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+             patch('src.core.data_manager.get_collection', side_effect=ConnectionError("down")), \
+             patch.object(SchemaRegistry, 'refresh', return_value=0):
+            data_manager = DataManager(journal_dir=tmp_dir)
+            data_manager.coverage.persist_interval = 0
+            getter = Mock(side_effect=_stalled)
+            data_manager.coverage.collection_getter = getter
+
+            with patch.object(data_manager.journal, 'append'):
+                started = time.monotonic()
+                for hour in range(3):
+                    self.assertTrue(data_manager.save_metrics(
+                        {'close': 1.0}, "BTCUSDT", interval='1h', timestamp=START + timedelta(hours=hour)
+                    ))
+                elapsed = time.monotonic() - started
+
+            getter.assert_not_called()
+            self.assertLess(elapsed, 1.0)
+            data_manager.coverage.collection_getter = None
+            self.assertEqual(data_manager.coverage.ranges("BTCUSDT", '1h'), [(START, START + timedelta(hours=3))])
+            data_manager.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,266 @@
+"""
+Unit tests for DataManager historical reads
+"""
+
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import Mock, MagicMock, patch
+
+import numpy as np
+import pandas as pd
+
+from src.core.data_manager import DataManager
+
+START = datetime(2024, 1, 1)
+
+def _make_docs(count, symbol="BTCUSDT"):
+    """Документы в формате save_metrics"""
+    return [{
+        'timestamp': START + timedelta(hours=i),
+        'symbol': symbol,
+        'metrics': {'close': float(i), 'volume': 1.0}
+    } for i in range(count)]
+
+def _frame_from_docs(docs):
+    """DataFrame в формате get_historical_data"""
+    return pd.DataFrame([{'timestamp': d['timestamp'], 'symbol': d['symbol'], **d['metrics']} for d in docs])
+
+class TestHistoricalData(unittest.TestCase):
+    """Тесты чтения исторических данных"""
+
+    def setUp(self):
+        self.collection = Mock()
+        self.collection.find.return_value = iter(_make_docs(48))
+        patcher = patch('src.core.data_manager.get_collection', return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.data_manager = DataManager()
+
+    def test_streaming_uses_single_sorted_query(self):
+        """Весь диапазон читается одним отсортированным запросом"""
+        df = self.data_manager.get_historical_data("BTCUSDT", START, START + timedelta(days=2))
+
+        self.collection.find.assert_called_once()
+        _, kwargs = self.collection.find.call_args
+        self.assertEqual(kwargs['sort'], [('timestamp', 1)])
+        self.assertEqual(kwargs['projection']['_id'], 0)
+        self.assertEqual(list(df.columns), ['timestamp', 'symbol', 'close', 'volume'])
+        self.assertEqual(len(df), 48)
+
+    def test_missing_metrics_are_filled(self):
+        """Поля, отсутствующие в части документов, заполняются пропусками"""
+        docs = _make_docs(3)
+        docs[1]['metrics']['rsi'] = 55.0
+        self.collection.find.return_value = iter(docs)
+
+        df = self.data_manager.get_historical_data("BTCUSDT", START, START + timedelta(days=1))
+
+        self.assertEqual(df['rsi'].isna().tolist(), [True, False, True])
+
+    def test_empty_range(self):
+        """Пустой диапазон возвращает пустой DataFrame"""
+        self.collection.find.return_value = iter([])
+        df = self.data_manager.get_historical_data("BTCUSDT", START, START + timedelta(days=1))
+        self.assertTrue(df.empty)
+
+    def test_cold_storage_is_merged(self):
+        """Архивированный диапазон дочитывается из холодного хранилища"""
+        docs = _make_docs(48)
+        self.collection.find.return_value = iter(docs[24:])
+
+        with tempfile.TemporaryDirectory() as root:
+            data_manager = DataManager(cold_storage_dir=root)
+            data_manager.cold_storage.write_range("BTCUSDT", _frame_from_docs(docs[:24]))
+
+            df = data_manager.get_historical_data("BTCUSDT", START, START + timedelta(days=2))
+
+        self.assertEqual(len(df), 48)
+        self.assertTrue(df['timestamp'].is_monotonic_increasing)
+        self.assertEqual(df['close'].tolist(), [float(i) for i in range(48)])
+
+    def test_cold_overlap_is_not_duplicated(self):
+        """Бары, которые есть и в архиве, и в горячем чтении, возвращаются один раз"""
+        docs = _make_docs(48)
+        self.collection.find.return_value = iter(docs[12:])
+
+        with tempfile.TemporaryDirectory() as root:
+            data_manager = DataManager(cold_storage_dir=root)
+            data_manager.cold_storage.write_range("BTCUSDT", _frame_from_docs(docs[:24]))
+
+            df = data_manager.get_historical_data("BTCUSDT", START, START + timedelta(days=2))
+
+        self.assertEqual(len(df), 48)
+        self.assertFalse(df['timestamp'].duplicated().any())
+        self.assertEqual(df['close'].tolist(), [float(i) for i in range(48)])
+
+class TestLatestMetrics(unittest.TestCase):
+    """Тесты чтения последних метрик"""
+
+    def test_latest_metrics_from_collection(self):
+        """Коллекция pymongo не приводится к bool, документы возвращаются"""
+        collection = MagicMock()
+        collection.__bool__.side_effect = NotImplementedError("Collection objects do not implement truth value testing")
+        docs = [dict(doc, _id=i) for i, doc in enumerate(reversed(_make_docs(3)))]
+        collection.find.return_value = iter(docs)
+
+        with patch('src.core.data_manager.get_collection', return_value=collection):
+            latest = DataManager().get_latest_metrics("BTCUSDT", limit=3)
+
+        self.assertEqual([m['timestamp'] for m in latest], [d['timestamp'] for d in docs])
+        self.assertEqual(latest[0]['metrics'], {'close': 2.0, 'volume': 1.0})
+        self.assertEqual(collection.find.call_args.kwargs['sort'], [('timestamp', -1)])
+
+class TestIterHistorical(unittest.TestCase):
+    """Тесты потокового чтения чанками"""
+
+    def setUp(self):
+        self.collection = Mock()
+        self.cursor = MagicMock()
+        self.cursor.__iter__.return_value = iter(_make_docs(25))
+        self.collection.find.return_value = self.cursor
+        patcher = patch('src.core.data_manager.get_collection', return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.data_manager = DataManager()
+
+    def test_chunks_are_bounded(self):
+        """Чанки не превышают chunk_rows и покрывают все строки"""
+        chunks = list(self.data_manager.iter_historical(
+            "BTCUSDT", START, START + timedelta(days=2), chunk_rows=10
+        ))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        self.assertEqual(chunks[-1]['close'].iloc[-1], 24.0)
+        self.cursor.close.assert_called_once()
+
+    def test_projection_and_downcast(self):
+        """Проекция полей и понижение float64 до float32"""
+        chunks = list(self.data_manager.iter_historical(
+            "BTCUSDT", START, START + timedelta(days=2), chunk_rows=100,
+            columns=['close', 'rsi'], downcast=True
+        ))
+
+        _, kwargs = self.collection.find.call_args
+        self.assertIn('metrics.close', kwargs['projection'])
+        self.assertEqual(list(chunks[0].columns), ['timestamp', 'symbol', 'close', 'rsi'])
+        self.assertEqual(str(chunks[0]['close'].dtype), 'float32')
+
+class TestAggregate(unittest.TestCase):
+    """Тесты серверной агрегации по бакетам"""
+
+    def setUp(self):
+        self.collection = Mock()
+        self.collection.find_one.return_value = None
+        self.collection.aggregate.return_value = iter([
+            {'timestamp': START, 'close': 1.5, 'volume': 20.0, 'close_vwap': 1.25}
+        ])
+        patcher = patch('src.core.data_manager.get_collection', return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.data_manager = DataManager()
+
+    def test_pipeline_groups_by_bucket(self):
+        """Запрос компилируется в $match, $group по $dateTrunc и $project"""
+        df = self.data_manager.aggregate(
+            "BTCUSDT", START, START + timedelta(days=1), '1h',
+            {'close': 'mean', 'volume': 'sum'}
+        )
+
+        pipeline = self.collection.aggregate.call_args[0][0]
+        self.assertEqual(pipeline[0]['$match']['symbol'], "BTCUSDT")
+        group = pipeline[2]['$group']
+        self.assertEqual(group['_id']['$dateTrunc']['unit'], 'hour')
+        self.assertIn('$avg', group['close'])
+        self.assertEqual(list(df.columns), ['timestamp', 'close', 'volume'])
+
+    def test_vwap_and_multiple_ops(self):
+        """VWAP считается через суммы, список операций дает field_op колонки"""
+        pipeline = DataManager._aggregation_pipeline(
+            "BTCUSDT", START, START + timedelta(days=1), '1d', {'close': ['vwap', 'max']}
+        )
+
+        self.assertIn('$divide', pipeline[-1]['$project']['close_vwap']['$cond'][2])
+        self.assertIn('close_max', pipeline[2]['$group'])
+        with self.assertRaises(ValueError):
+            DataManager._aggregation_pipeline("BTCUSDT", START, START, '1h', {'close': 'median'})
+
+class TestUpsertMetrics(unittest.TestCase):
+    """Тесты идемпотентной записи баров"""
+
+    def setUp(self):
+        self.collection = Mock()
+        self.collection.find_one.return_value = None
+        self.collection.bulk_write.return_value = Mock(
+            upserted_count=1, matched_count=1, modified_count=0, upserted_ids={1: 'new'}
+        )
+        patcher = patch('src.core.data_manager.get_collection', return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        ensure = patch('src.core.data_manager.mongodb_config.ensure_unique_index', return_value=True)
+        self.ensure_unique_index = ensure.start()
+        self.addCleanup(ensure.stop)
+        self.data_manager = DataManager(upsert_writes=True)
+
+    def test_bars_are_upserted_with_own_timestamp(self):
+        """Бары пишутся bulk апсертом по (symbol, timestamp) из записи"""
+        records = [{'timestamp': START + timedelta(hours=h), 'close': 1.0} for h in range(2)]
+        report = self.data_manager.upsert_metrics(records, "BTCUSDT", interval='1h')
+
+        self.assertEqual(report, {'upserted': 1, 'matched': 1, 'modified': 0})
+        self.ensure_unique_index.assert_called_once_with(self.collection)
+        operations = self.collection.bulk_write.call_args.args[0]
+        self.assertEqual([op._filter['timestamp'] for op in operations], [START, START + timedelta(hours=1)])
+        self.collection.insert_one.assert_not_called()
+        self.assertTrue(self.data_manager.coverage.is_covered("BTCUSDT", '1h', START, START + timedelta(hours=2)))
+
+    def test_record_without_timestamp(self):
+        """Запись без собственного времени отклоняется"""
+        with self.assertRaises(ValueError):
+            self.data_manager.upsert_metrics([{'close': 1.0}], "BTCUSDT")
+
+    def test_duplicates_fall_back_to_inserts(self):
+        """Без уникального индекса менеджер один раз переходит на вставки"""
+        self.ensure_unique_index.return_value = False
+
+        self.assertTrue(self.data_manager.save_metrics({'close': 1.0}, "BTCUSDT"))
+        self.assertTrue(self.data_manager.save_metrics({'close': 2.0}, "BTCUSDT"))
+
+        self.assertFalse(self.data_manager.upsert_writes)
+        self.ensure_unique_index.assert_called_once_with(self.collection)
+        self.collection.bulk_write.assert_not_called()
+        self.assertEqual(self.collection.insert_one.call_count, 2)
+
+class TestHistoricalPanel(unittest.TestCase):
+    """Тесты выровненной панели по нескольким символам"""
+
+    def setUp(self):
+        frames = {
+            "BTCUSDT": _frame_from_docs(_make_docs(4, "BTCUSDT")),
+            "ETHUSDT": _frame_from_docs(_make_docs(4, "ETHUSDT")[::2])
+        }
+        self.data_manager = DataManager()
+        self.data_manager.get_historical_data = lambda symbol, start, end: frames[symbol]
+
+    def test_panel_is_aligned_and_filled(self):
+        """Общая ось времени, пропуски заполняются предыдущим баром"""
+        panel = self.data_manager.get_historical_panel(
+            ["BTCUSDT", "ETHUSDT"], START, START + timedelta(hours=4), fields=['close']
+        )
+
+        self.assertEqual(panel.shape, (4, 2))
+        self.assertEqual(panel[('ETHUSDT', 'close')].tolist(), [0.0, 0.0, 2.0, 2.0])
+
+    def test_dense_array(self):
+        """Плотный массив формы (time, symbol, field) без заполнения"""
+        array = self.data_manager.get_historical_panel(
+            ["BTCUSDT", "ETHUSDT"], START, START + timedelta(hours=4),
+            fill=None, as_array=True
+        )
+
+        self.assertEqual(array.shape, (4, 2, 2))
+        self.assertEqual(array[:, 0, 0].tolist(), [0.0, 1.0, 2.0, 3.0])
+        self.assertTrue(np.isnan(array[1, 1, 0]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,8 +3,13 @@ Unit tests for database module
 """
 
 import unittest
-from unittest.mock import Mock, patch
-from config.database import MongoDBConfig
+from unittest.mock import Mock, MagicMock, patch
+from pymongo import monitoring
+from pymongo.errors import DuplicateKeyError
+from config.database import (
+    MongoDBConfig, ConnectionManager, PoolStatsListener, BACKGROUND_CONNECTIONS
+)
+from src.core.system_config import CONFIG
 
 class TestDatabaseConfig(unittest.TestCase):
     """Тесты конфигурации базы данных"""
@@ -31,4 +36,173 @@ class TestDatabaseConfig(unittest.TestCase):
         """Тест кастомного имени БД"""
         mock_getenv.return_value = "custom_db"
         config = MongoDBConfig()
-        self.assertEqual(config.db_name, "custom_db")
\ No newline at end of file
+        self.assertEqual(config.db_name, "custom_db")
+
+    def test_indexes_ensured_once(self):
+        """Индексы создаются только при первом обращении к коллекции"""
+        config = MongoDBConfig()
+        config.database = Mock()
+        config.database.list_collections.return_value = iter([{'name': 'btcusdt'}])
+        collection = config.database.__getitem__ = Mock()
+        collection.return_value.name = "btcusdt"
+
+        config.get_collection("btcusdt")
+        config.get_collection("btcusdt")
+
+        collection.return_value.create_index.assert_called_once()
+
+    @patch.dict('os.environ', {'MONGODB_TTL_DAYS': '30'})
+    def test_ttl_index(self):
+        """TTL индекс по created_at при заданном MONGODB_TTL_DAYS"""
+        config = MongoDBConfig()
+        config.database = Mock()
+        config.database.list_collections.return_value = iter([])
+        collection = Mock()
+
+        config.ensure_indexes(collection)
+
+        self.assertTrue(config.ttl_enabled)
+        collection.create_index.assert_any_call(
+            'created_at', name='created_at_ttl', expireAfterSeconds=30 * 24 * 3600
+        )
+
+    @patch.dict('os.environ', {'MONGODB_UNIQUE_BARS': 'true'})
+    def test_unique_index_replaces_plain_index(self):
+        """Уникальный индекс бара заменяет обычный индекс (symbol, timestamp)"""
+        config = MongoDBConfig()
+        config.database = Mock()
+        config.database.list_collections.return_value = iter([{'name': 'btcusdt'}])
+        collection = Mock()
+        collection.name = "btcusdt"
+        collection.index_information.return_value = {'symbol_timestamp': {'key': []}}
+
+        config.ensure_indexes(collection)
+
+        collection.drop_index.assert_called_once_with('symbol_timestamp')
+        collection.create_index.assert_called_once_with(
+            [('symbol', 1), ('timestamp', 1)], name='symbol_timestamp_unique', unique=True
+        )
+        self.assertTrue(config.ensure_unique_index(collection))
+
+    def test_unique_index_not_for_timeseries(self):
+        """Time-series коллекции уникальный индекс не получают"""
+        config = MongoDBConfig()
+        config.database = Mock()
+        config.database.list_collections.return_value = iter([{'name': 'btcusdt', 'type': 'timeseries'}])
+        collection = Mock()
+        collection.name = "btcusdt"
+
+        self.assertFalse(config.ensure_unique_index(collection))
+        collection.create_index.assert_not_called()
+
+    def test_duplicate_bars_remembered(self):
+        """Коллекция с дубликатами не перестраивает индексы при каждой записи"""
+        config = MongoDBConfig()
+        config.database = Mock()
+        config.database.list_collections.return_value = iter([{'name': 'btcusdt'}])
+        collection = Mock()
+        collection.name = "btcusdt"
+        collection.index_information.return_value = {'symbol_timestamp': {'key': []}}
+        collection.create_index.side_effect = [DuplicateKeyError("dup"), 'symbol_timestamp']
+
+        self.assertFalse(config.ensure_unique_index(collection))
+        self.assertFalse(config.ensure_unique_index(collection))
+
+        collection.drop_index.assert_called_once_with('symbol_timestamp')
+        self.assertEqual(collection.create_index.call_count, 2)
+
+    @patch.dict('os.environ', {'MONGODB_STORAGE_MODE': 'timeseries', 'MONGODB_TS_GRANULARITY': 'seconds'})
+    def test_timeseries_collection_created(self):
+        """В режиме timeseries новая коллекция создается как time-series"""
+        config = MongoDBConfig()
+        config.database = MagicMock()
+        config.database.list_collections.return_value = iter([])
+
+        config.get_collection("btcusdt")
+
+        config.database.create_collection.assert_called_once_with(
+            "btcusdt",
+            timeseries={'timeField': 'timestamp', 'metaField': 'symbol', 'granularity': 'seconds'}
+        )
+
+
+@patch('config.database.MongoClient')
+class TestConnectionManager(unittest.TestCase):
+    """Тесты клиента на процесс и кэша проверки здоровья"""
+
+    def test_pool_sized_from_config(self, mock_client):
+        """Размер пула по CONFIG.max_workers, клиент создается один раз"""
+        manager = ConnectionManager("mongodb://localhost:27017/")
+
+        self.assertIs(manager.client, manager.client)
+        mock_client.assert_called_once()
+        self.assertEqual(mock_client.call_args.kwargs['maxPoolSize'],
+                         CONFIG.max_workers + BACKGROUND_CONNECTIONS)
+
+    def test_ping_is_cached(self, mock_client):
+        """Повторный ping в пределах TTL не ходит в базу, ошибка тоже кэшируется"""
+        manager = ConnectionManager("mongodb://localhost:27017/", health_ttl=60)
+        manager.ping()
+        manager.ping()
+        mock_client.return_value.admin.command.assert_called_once_with('ping')
+
+        failing = ConnectionManager("mongodb://other:27017/", health_ttl=60)
+        mock_client.return_value.admin.command.side_effect = ConnectionError("down")
+        self.assertFalse(failing.is_healthy())
+        self.assertFalse(failing.is_healthy())
+        self.assertEqual(mock_client.return_value.admin.command.call_count, 2)
+
+    def test_new_client_after_fork(self, mock_client):
+        """В другом процессе создается новый клиент, унаследованный не закрывается"""
+        mock_client.side_effect = [Mock(), Mock()]
+        manager = ConnectionManager("mongodb://localhost:27017/")
+        parent = manager.client
+
+        with patch('os.getpid', return_value=-1):
+            child = manager.client
+
+        self.assertIsNot(parent, child)
+        parent.close.assert_not_called()
+
+    def test_shared_client_closed_by_last_config(self, mock_client):
+        """Конфигурации процесса делят клиент, закрывает его последняя"""
+        first, second = MongoDBConfig(), MongoDBConfig()
+        first.uri = second.uri = "mongodb://shared:27017/"
+        self.assertTrue(first.connect())
+        self.assertTrue(second.connect())
+        self.assertIs(first.client, second.client)
+
+        first.close()
+        mock_client.return_value.close.assert_not_called()
+        second.close()
+        mock_client.return_value.close.assert_called_once()
+
+class TestPoolStatsListener(unittest.TestCase):
+    """Тесты статистики пула"""
+
+    def test_checkout_counters(self):
+        """Выданные соединения и время ожидания"""
+        listener = PoolStatsListener()
+        event = Mock()
+        listener.connection_created(event)
+        listener.connection_check_out_started(event)
+        listener.connection_checked_out(event)
+        listener.connection_check_out_started(event)
+        listener.connection_check_out_failed(event)
+
+        stats = listener.snapshot()
+        self.assertEqual(stats['open_connections'], 1)
+        self.assertEqual(stats['checked_out'], 1)
+        self.assertEqual(stats['checkouts'], 1)
+        self.assertEqual(stats['checkout_failures'], 1)
+
+        listener.connection_checked_in(event)
+        self.assertEqual(listener.snapshot()['checked_out'], 0)
+
+    def test_pool_cleared_event(self):
+        """Очистка пула считается по настоящему событию pymongo"""
+        listener = PoolStatsListener()
+        listener.pool_cleared(monitoring.PoolClearedEvent(('localhost', 27017)))
+        listener.pool_cleared(monitoring.PoolClearedEvent(('localhost', 27017)))
+
+        self.assertEqual(listener.snapshot()['pool_clears'], 2)
@@ -0,0 +1,74 @@
+"""
+Unit tests for streaming ML dataset export
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.ml.dataset import export_dataset, load_dataset
+
+START = datetime(2024, 1, 1)
+
+def _make_frame(count):
+    """Свечи со случайным блужданием цены"""
+    rng = np.random.default_rng(0)
+    close = 100 + rng.standard_normal(count).cumsum()
+    return pd.DataFrame({
+        'timestamp': [START + timedelta(hours=i) for i in range(count)],
+        'symbol': 'BTCUSDT',
+        'open': close, 'high': close + 1, 'low': close - 1,
+        'close': close, 'volume': rng.random(count)
+    })
+
+def _chunks(df, size):
+    return (df.iloc[i:i + size].reset_index(drop=True) for i in range(0, len(df), size))
+
+class TestExportDataset(unittest.TestCase):
+    """Тесты потокового экспорта и memmap загрузки"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.df = _make_frame(300)
+
+    def _export(self, name, chunk_size):
+        path = os.path.join(self.tmp.name, name)
+        export_dataset(_chunks(self.df, chunk_size), path)
+        return load_dataset(path)
+
+    def test_chunked_export_matches_single_pass(self):
+        """Перекрытие чанков дает тот же результат, что и расчет по всему ряду"""
+        full = self._export("full", len(self.df))
+        chunked = self._export("chunked", 17)
+
+        # 49 строк прогрева sma_50 и последняя строка без target
+        self.assertEqual(len(full), 300 - 49 - 1)
+        np.testing.assert_array_equal(chunked.X, full.X)
+        np.testing.assert_array_equal(chunked.y, full.y)
+        np.testing.assert_array_equal(chunked.timestamps, full.timestamps)
+
+    def test_target_and_dtypes(self):
+        """Target - рост следующей цены, массивы открыты через memmap"""
+        dataset = self._export("ds", 64)
+        close = dataset.X[:, dataset.feature_columns.index('close')]
+
+        self.assertIsInstance(dataset.X, np.memmap)
+        self.assertEqual(dataset.X.dtype, np.float32)
+        np.testing.assert_array_equal(dataset.y[:-1], (close[1:] > close[:-1]).astype(np.int8))
+
+    def test_split_is_chronological(self):
+        """Разбиение train/test сохраняет порядок времени"""
+        dataset = self._export("ds", 100)
+        X_train, X_test, y_train, y_test = dataset.split(test_size=0.2)
+
+        self.assertEqual(len(X_train) + len(X_test), len(dataset))
+        self.assertEqual(len(y_test), len(X_test))
+        self.assertLess(dataset.timestamps[len(X_train) - 1], dataset.timestamps[len(X_train)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Unit tests for budgeted hyperparameter search
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.ml.training.hyperparameter_search import (
+    HyperparameterSearch, IntUniform, Uniform, halving_rungs, sample_configs
+)
+from src.ml.training.trainer import MLTrainer
+
+def _classification(rows=800, features=5, seed=9):
+    """Линейно разделимая выборка с шумом"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, features)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] ** 2 - 1 + rng.normal(0, 0.3, rows) > 0).astype(np.int8)
+    return X, y
+
+SMALL_SPACE = {
+    'learning_rate': Uniform(0.05, 0.3, log=True),
+    'max_depth': IntUniform(2, 4),
+}
+
+class TestHalvingPlan(unittest.TestCase):
+    """Раунды и выборка конфигураций"""
+
+    def test_rungs(self):
+        """Конфигурации сокращаются в eta раз, ресурс растет до максимума"""
+        self.assertEqual(halving_rungs(27, 50, 1000, 3), [(27, 50), (9, 150), (3, 450), (1, 1000)])
+        self.assertEqual(halving_rungs(4, 10, 20, 2), [(4, 10), (2, 20)])
+        with self.assertRaises(ValueError):
+            halving_rungs(9, 10, 100, 1)
+
+    def test_configs_are_deterministic(self):
+        """Тот же seed - те же конфигурации (основа продолжения поиска)"""
+        first = sample_configs(SMALL_SPACE, 5, seed=1)
+        self.assertEqual(first, sample_configs(SMALL_SPACE, 5, seed=1))
+        self.assertTrue(all(2 <= c['max_depth'] <= 4 for c in first))
+
+class TestHyperparameterSearch(unittest.TestCase):
+    """Поиск в процессах с журналом испытаний"""
+
+    def _search(self, log_path, **kwargs):
+        params = dict(model='xgboost', space=SMALL_SPACE, n_trials=4, min_resource=10,
+                      max_resource=40, eta=2, early_stopping_rounds=5, max_workers=2, log_path=log_path)
+        params.update(kwargs)
+        return HyperparameterSearch(**params)
+
+    def test_search_and_resume(self):
+        """Лучшая конфигурация с последнего раунда, повторный запуск берет оценки из журнала"""
+        X, y = _classification()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_path = os.path.join(tmp_dir, 'trials.jsonl')
+            result = self._search(log_path).run(X, y)
+
+            self.assertTrue(result.completed)
+            self.assertEqual(len(result.trials), 4 + 2 + 1)
+            self.assertLessEqual(result.n_estimators, 40)
+            with open(log_path, encoding='utf-8') as f:
+                lines = [json.loads(line) for line in f]
+            self.assertEqual(lines[0]['type'], 'search')
+            self.assertEqual(len(lines), 8)
+
+            resumed = self._search(log_path).run(X, y)
+            self.assertEqual(resumed.params, result.params)
+            with open(log_path, encoding='utf-8') as f:
+                self.assertEqual(len(f.readlines()), 8)
+
+
+    def test_log_from_other_data_is_restarted(self):
+        """Журнал другого поиска или других данных не переиспользуется - начинается заново"""
+        X, y = _classification()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_path = os.path.join(tmp_dir, 'trials.jsonl')
+            self._search(log_path).run(X, y)
+            with open(log_path, encoding='utf-8') as f:
+                original = json.loads(f.readline())
+
+            X_new, y_new = _classification(seed=10)
+            self._search(log_path).run(X_new, y_new)
+            with open(log_path, encoding='utf-8') as f:
+                lines = [json.loads(line) for line in f]
+            self.assertEqual(len(lines), 8)
+            self.assertNotEqual(lines[0]['data'], original['data'])
+
+            # Другая граница валидации - тоже другие данные
+            self._search(log_path, validation_size=0.25).run(X_new, y_new)
+            with open(log_path, encoding='utf-8') as f:
+                self.assertNotEqual(json.loads(f.readline())['data'], lines[0]['data'])
+
+            self._search(log_path, seed=7).run(X_new, y_new)
+            with open(log_path, encoding='utf-8') as f:
+                lines = [json.loads(line) for line in f]
+            self.assertEqual((lines[0]['seed'], len(lines)), (7, 8))
+
+    def test_lightgbm_and_time_budget(self):
+        """lightgbm с ранней остановкой; без времени на испытания поиск не возвращает результат"""
+        X, y = _classification()
+        space = {'learning_rate': Uniform(0.05, 0.3, log=True), 'num_leaves': IntUniform(4, 16)}
+
+        trainer = MLTrainer()
+        result = trainer.search_hyperparameters(X, y, model='lightgbm', space=space, n_trials=2,
+                                                min_resource=10, max_resource=20, eta=2,
+                                                early_stopping_rounds=5, max_workers=2)
+        self.assertEqual(len(result.trials), 3)
+        self.assertEqual(result.train_rows, 640)
+        # Валидация отрезана от X_train - деревья масштабируются на 800 / 640 строк
+        self.assertEqual(trainer.models['lightgbm'].n_estimators, round(result.n_estimators * 800 / 640))
+
+        explicit = trainer.search_hyperparameters(X[:640], y[:640], model='lightgbm',
+                                                  X_val=X[640:], y_val=y[640:], space=space, n_trials=2,
+                                                  min_resource=10, max_resource=20, eta=2,
+                                                  early_stopping_rounds=5, max_workers=2)
+        self.assertEqual(trainer.models['lightgbm'].n_estimators, explicit.n_estimators)
+
+        with self.assertRaises(RuntimeError):
+            self._search(None, model='lightgbm', space=space, time_budget=0.0).run(X, y)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Unit tests for vectorized technical indicators
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.ml import indicators
+
+def _ohlcv(rows=500, seed=7):
+    """Случайное блуждание OHLCV"""
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 50, rows))
+    spread = rng.uniform(5, 60, rows)
+    return pd.DataFrame({
+        'open': close + rng.normal(0, 10, rows),
+        'high': close + spread,
+        'low': close - spread,
+        'close': close,
+        'volume': rng.uniform(1, 100, rows)
+    })
+
+class TestIndicators(unittest.TestCase):
+    """Сверка ядер с эталонными расчетами pandas"""
+
+    def setUp(self):
+        self.df = _ohlcv()
+        self.close = self.df['close']
+
+    def assertSeriesClose(self, actual, expected, rtol=1e-9):
+        np.testing.assert_allclose(actual, np.asarray(expected, dtype=np.float64), rtol=rtol, equal_nan=True)
+
+    def test_sma_and_std_many_windows(self):
+        """Все окна за один вызов совпадают с pandas rolling"""
+        windows = [5, 20, 50]
+        means = indicators.sma(self.close, windows)
+        stds = indicators.rolling_std(self.close, windows)
+
+        self.assertEqual(means.shape, (len(self.close), 3))
+        for j, w in enumerate(windows):
+            self.assertSeriesClose(means[:, j], self.close.rolling(w).mean())
+            self.assertSeriesClose(stds[:, j], self.close.rolling(w).std(), rtol=1e-7)
+
+    def test_nan_inside_window(self):
+        """Окно, задевающее NaN, дает NaN, как pandas rolling"""
+        values = self.close.copy()
+        values.iloc[100] = np.nan
+        self.assertSeriesClose(indicators.sma(values, 10), values.rolling(10).mean())
+
+    def test_ema_matches_pandas(self):
+        """EMA совпадает с ewm(span, adjust=False)"""
+        result = indicators.ema(self.close, [12, 26])
+        self.assertSeriesClose(result[:, 0], self.close.ewm(span=12, adjust=False).mean())
+        self.assertSeriesClose(result[:, 1], self.close.ewm(span=26, adjust=False).mean())
+
+    def test_rsi_methods(self):
+        """RSI по средним окна и по Уайлдеру"""
+        delta = self.close.diff()
+        gain, loss = delta.clip(lower=0), -delta.clip(upper=0)
+        expected_sma = 100 - 100 / (1 + gain.rolling(14).mean() / loss.rolling(14).mean())
+        self.assertSeriesClose(indicators.rsi(self.close, 14), expected_sma, rtol=1e-7)
+
+        wilder = indicators.rsi(self.close, 14, method='wilder')
+        self.assertTrue(np.isnan(wilder[:14]).all())
+        avg_gain, avg_loss = gain.iloc[1:15].mean(), loss.iloc[1:15].mean()
+        for t in range(15, 20):
+            avg_gain = (avg_gain * 13 + gain.iloc[t]) / 14
+            avg_loss = (avg_loss * 13 + loss.iloc[t]) / 14
+        self.assertAlmostEqual(wilder[19], 100 - 100 / (1 + avg_gain / avg_loss), places=9)
+
+    def test_atr_bollinger_vwap(self):
+        """ATR, полосы Боллинджера и скользящая VWAP"""
+        high, low, close, volume = (self.df[c] for c in ('high', 'low', 'close', 'volume'))
+        tr = pd.concat([high - low, (high - close.shift()).abs(), (low - close.shift()).abs()], axis=1).max(axis=1)
+        self.assertSeriesClose(indicators.atr(high, low, close, 14, method='sma'), tr.rolling(14).mean())
+
+        middle, upper, lower = indicators.bollinger(close, 20)
+        self.assertSeriesClose(upper - middle, 2 * close.rolling(20).std(ddof=0), rtol=1e-7)
+        self.assertSeriesClose(middle - lower, upper - middle)
+
+        expected = (close * volume).rolling(20).sum() / volume.rolling(20).sum()
+        self.assertSeriesClose(indicators.vwap(close, volume, 20), expected)
+
+    def test_compute_indicators(self):
+        """Набор индикаторов по OHLCV кадру"""
+        features = indicators.compute_indicators(self.df)
+
+        for column in ('returns', 'sma_20', 'sma_50', 'ema_12', 'volatility_20', 'rsi_14',
+                       'atr_14', 'bb_upper_20', 'vwap_20'):
+            self.assertIn(column, features.columns)
+        self.assertEqual(len(features), len(self.df))
+        self.assertFalse(features.iloc[60:].isna().any().any())
+
+        no_range = indicators.compute_indicators(self.df[['close']], {'atr': (14,), 'sma': (5,)})
+        self.assertEqual(list(no_range.columns), ['returns', 'sma_5'])
+
+if __name__ == "__main__":
+    unittest.main()
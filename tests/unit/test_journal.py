@@ -0,0 +1,129 @@
+"""
+Unit tests for the local write-ahead journal
+"""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import Mock
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from src.core.journal import WriteAheadJournal
+
+class TestWriteAheadJournal(unittest.TestCase):
+    """Тесты журнала записи и его воспроизведения"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.collections = {}
+        self.available = True
+        self.replayed = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _get_collection(self, name):
+        if not self.available:
+            return None
+        return self.collections.setdefault(name, Mock())
+
+    def _journal(self, **kwargs):
+        kwargs.setdefault('fsync_interval', 0.01)
+        kwargs.setdefault('retry_interval', 0.01)
+        return WriteAheadJournal(
+            self.directory, self._get_collection,
+            on_replayed=lambda name, docs: self.replayed.append((name, [d['n'] for d in docs])),
+            **kwargs
+        )
+
+    @staticmethod
+    def _inserted(collection):
+        return [d['n'] for call in collection.insert_many.call_args_list for d in call.args[0]]
+
+    def test_replay_in_order(self):
+        """Записи вставляются по порядку, подряд идущие - одной пачкой"""
+        journal = self._journal(batch_size=10)
+        for n, name in enumerate(['btcusdt', 'btcusdt', 'ethusdt', 'btcusdt']):
+            journal.append(name, {'_id': ObjectId(), 'n': n})
+
+        self.assertTrue(journal.drain(timeout=5))
+        journal.close()
+
+        self.assertEqual(self._inserted(self.collections['btcusdt']), [0, 1, 3])
+        self.assertEqual(self._inserted(self.collections['ethusdt']), [2])
+        self.assertEqual(self.replayed, [('btcusdt', [0, 1]), ('ethusdt', [2]), ('btcusdt', [3])])
+        self.assertEqual(journal.stats()['pending_records'], 0)
+
+    def test_outage_keeps_backlog(self):
+        """Пока MongoDB недоступна, записи копятся и видны в метриках отставания"""
+        self.available = False
+        journal = self._journal()
+        for n in range(3):
+            journal.append('btcusdt', {'_id': ObjectId(), 'n': n})
+
+        self.assertFalse(journal.drain(timeout=0.2))
+        stats = journal.stats()
+        self.assertEqual(stats['pending_records'], 3)
+        self.assertGreater(stats['pending_bytes'], 0)
+        self.assertFalse(stats['available'])
+
+        self.available = True
+        self.assertTrue(journal.drain(timeout=5))
+        journal.close()
+        self.assertEqual(self._inserted(self.collections['btcusdt']), [0, 1, 2])
+        self.assertTrue(journal.stats()['available'])
+
+    def test_duplicates_are_skipped(self):
+        """Уже вставленные документы считаются дубликатами и не передаются дальше"""
+        collection = self.collections['btcusdt'] = Mock()
+        collection.insert_many.side_effect = BulkWriteError({
+            'writeErrors': [{'index': 0, 'code': 11000, 'errmsg': 'duplicate key'}]
+        })
+        journal = self._journal()
+        for n in range(2):
+            journal.append('btcusdt', {'_id': ObjectId(), 'n': n})
+
+        self.assertTrue(journal.drain(timeout=5))
+        journal.close()
+        self.assertEqual(journal.stats()['duplicates'], 1)
+        self.assertEqual(self.replayed, [('btcusdt', [1])])
+
+    def test_recovery_after_restart(self):
+        """Недописанный хвост обрезается, остальное воспроизводится после перезапуска"""
+        self.available = False
+        journal = self._journal()
+        for n in range(3):
+            journal.append('btcusdt', {'_id': ObjectId(), 'n': n})
+        journal.close(timeout=0.1)
+
+        segment = next(Path(self.directory).glob("*.wal"))
+        with open(segment, 'ab') as f:
+            f.write(b'\x40\x00\x00\x00torn')
+
+        self.available = True
+        journal = self._journal()
+        self.assertEqual(journal.pending, 3)
+        self.assertTrue(journal.drain(timeout=5))
+        journal.append('btcusdt', {'_id': ObjectId(), 'n': 3})
+        self.assertTrue(journal.drain(timeout=5))
+        journal.close()
+
+        self.assertEqual(self._inserted(self.collections['btcusdt']), [0, 1, 2, 3])
+
+    def test_segments_are_removed_after_replay(self):
+        """Воспроизведенные сегменты удаляются"""
+        journal = self._journal(segment_bytes=256, batch_size=2)
+        for n in range(20):
+            journal.append('btcusdt', {'_id': ObjectId(), 'n': n})
+
+        self.assertTrue(journal.drain(timeout=5))
+        journal.close()
+
+        self.assertEqual(self._inserted(self.collections['btcusdt']), list(range(20)))
+        self.assertLessEqual(len(list(Path(self.directory).glob("*.wal"))), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Unit tests for the Parquet history cache
+"""
+
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from unittest.mock import Mock, patch
+
+from bson import ObjectId
+
+from src.core.data_manager import DataManager
+
+START = datetime(2024, 1, 1)
+
+def _make_docs(hours, symbol="BTCUSDT"):
+    """Документы в формате save_metrics с _id по порядку вставки"""
+    return [{
+        '_id': ObjectId(),
+        'timestamp': START + timedelta(hours=h),
+        'symbol': symbol,
+        'metrics': {'close': float(h)}
+    } for h in hours]
+
+class _Collection:
+    """Коллекция баров: find по диапазону времени и суточная статистика"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.find = Mock(side_effect=self._find)
+
+    def _select(self, query):
+        bounds = query['timestamp']
+        return [doc for doc in self.docs if bounds['$gte'] <= doc['timestamp'] < bounds['$lt']]
+
+    def _find(self, query, projection=None, sort=None, batch_size=None):
+        return iter(sorted(self._select(query), key=lambda doc: doc['timestamp']))
+
+    def aggregate(self, pipeline):
+        stats = {}
+        for doc in self._select(pipeline[0]['$match']):
+            day = doc['timestamp'].strftime('%Y-%m-%d')
+            current = stats.setdefault(day, {'_id': day, 'rows': 0, 'watermark': doc['_id']})
+            current['rows'] += 1
+            current['watermark'] = max(current['watermark'], doc['_id'])
+        return iter(stats.values())
+
+class TestParquetCache(unittest.TestCase):
+    """Сверка суточных партиций с MongoDB"""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.collection = _Collection(_make_docs(range(24)))
+        patcher = patch('src.core.data_manager.get_collection', return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.data_manager = DataManager(parquet_dir=tmp_dir.name)
+        self.store = self.data_manager.parquet_store
+
+    def _read(self):
+        return self.data_manager.get_historical_data("BTCUSDT", START, START + timedelta(days=2), use_cache=False)
+
+    def test_partitions_are_reused_while_current(self):
+        """Сутки читаются из MongoDB один раз, пустые сутки не хранятся"""
+        self.assertEqual(len(self._read()), 24)
+        self.assertEqual(self.store.partition_meta("BTCUSDT", date(2024, 1, 1))['rows'], 24)
+        self.assertFalse(self.store.partition_path("BTCUSDT", date(2024, 1, 2)).exists())
+
+        self.collection.find.reset_mock()
+        self.assertEqual(len(self._read()), 24)
+        self.collection.find.assert_not_called()
+
+    def test_changes_from_other_processes_refresh_partitions(self):
+        """Догрузка и удаление баров другим процессом перечитывают затронутые сутки"""
+        self._read()
+
+        self.collection.docs = self.collection.docs + _make_docs([30])
+        df = self._read()
+        self.assertEqual(len(df), 25)
+        self.assertEqual(self.store.partition_meta("BTCUSDT", date(2024, 1, 2))['rows'], 1)
+
+        self.collection.docs = [doc for doc in self.collection.docs if doc['timestamp'] < START + timedelta(hours=12)]
+        df = self._read()
+        self.assertEqual(df['close'].tolist(), [float(h) for h in range(12)])
+        self.assertFalse(self.store.partition_path("BTCUSDT", date(2024, 1, 2)).exists())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Unit tests for historical query cache
+"""
+
+import unittest
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.core.query_cache import QueryCache
+
+START = datetime(2024, 1, 1)
+
+def _make_frame(hours):
+    """Почасовой DataFrame начиная с START"""
+    return pd.DataFrame({
+        'timestamp': [START + timedelta(hours=i) for i in range(hours)],
+        'symbol': 'BTCUSDT',
+        'close': [float(i) for i in range(hours)]
+    })
+
+class TestQueryCache(unittest.TestCase):
+    """Тесты LRU кэша запросов"""
+
+    def setUp(self):
+        self.cache = QueryCache(size_limit_mb=1)
+
+    def test_hit_and_miss_counters(self):
+        """Промах, затем попадание по тому же диапазону"""
+        end = START + timedelta(hours=24)
+        self.assertIsNone(self.cache.get("BTCUSDT", START, end))
+
+        self.cache.put("BTCUSDT", START, end, _make_frame(24))
+        self.assertEqual(len(self.cache.get("BTCUSDT", START, end)), 24)
+
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_subrange_is_sliced(self):
+        """Вложенный диапазон отдается срезом закэшированного"""
+        self.cache.put("BTCUSDT", START, START + timedelta(hours=24), _make_frame(24))
+
+        df = self.cache.get("BTCUSDT", START + timedelta(hours=5), START + timedelta(hours=10))
+
+        self.assertEqual(df['close'].tolist(), [5.0, 6.0, 7.0, 8.0, 9.0])
+        self.assertIsNone(self.cache.get("BTCUSDT", START, START + timedelta(hours=25)))
+
+    def test_eviction_respects_size_limit(self):
+        """Старые записи вытесняются при превышении лимита"""
+        frame = _make_frame(5000)
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        cache = QueryCache(size_limit_mb=2.5 * size / (1024 * 1024))
+
+        for day in range(3):
+            cache.put("BTCUSDT", START, START + timedelta(days=day + 1), frame)
+
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.current_size, cache.size_limit)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_invalidate_only_affected_ranges(self):
+        """Запись инвалидирует только диапазоны, содержащие ее timestamp"""
+        self.cache.put("BTCUSDT", START, START + timedelta(hours=24), _make_frame(24))
+        self.cache.put("BTCUSDT", START, START + timedelta(hours=12), _make_frame(12))
+        self.cache.put("ETHUSDT", START, START + timedelta(hours=24), _make_frame(24))
+
+        removed = self.cache.invalidate("BTCUSDT", START + timedelta(hours=20))
+
+        self.assertEqual(removed, 1)
+        self.assertEqual(len(self.cache), 2)
+
+    def test_cached_frame_is_isolated(self):
+        """Изменение возвращенного DataFrame не портит кэш"""
+        end = START + timedelta(hours=24)
+        self.cache.put("BTCUSDT", START, end, _make_frame(24))
+
+        df = self.cache.get("BTCUSDT", START, end)
+        df['close'] = 0.0
+
+        self.assertEqual(self.cache.get("BTCUSDT", START, end)['close'].iloc[1], 1.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Unit tests for retention cleanup
+"""
+
+import unittest
+from datetime import datetime
+from unittest.mock import Mock, MagicMock
+
+from src.core.retention import RetentionJob
+
+CUTOFF = datetime(2024, 1, 1)
+
+class TestRetentionCollections(unittest.TestCase):
+    """Тесты выбора коллекций для очистки"""
+
+    def test_timeseries_skipped_only_with_expiry(self):
+        """Time-series коллекция пропускается, только если у нее настроен expireAfterSeconds"""
+        db = Mock()
+        db.list_collections.return_value = iter([
+            {'name': 'btcusdt', 'type': 'collection', 'options': {}},
+            {'name': 'ethusdt', 'type': 'timeseries', 'options': {'timeseries': {'timeField': 'timestamp'}}},
+            {'name': 'solusdt', 'type': 'timeseries',
+             'options': {'timeseries': {'timeField': 'timestamp'}, 'expireAfterSeconds': 86400}},
+            {'name': '_schemas', 'type': 'collection', 'options': {}},
+            {'name': 'system.views', 'type': 'collection', 'options': {}}
+        ])
+
+        names = RetentionJob(db, CUTOFF, chunk_size=100, max_workers=1).list_collections()
+
+        self.assertEqual(names, ['btcusdt', 'ethusdt'])
+
+class TestRetentionCoverage(unittest.TestCase):
+    """Тесты снятия покрытия после очистки"""
+
+    def test_deleted_history_leaves_coverage(self):
+        """Очищенный диапазон снимается с покрытия символа, dry-run покрытие не трогает"""
+        collection = Mock()
+        collection.distinct.return_value = ["BTCUSDT"]
+        collection.find.return_value = iter([])
+        db = MagicMock()
+        db.__getitem__.return_value = collection
+        coverage = Mock()
+
+        RetentionJob(db, CUTOFF, chunk_size=100, max_workers=1, coverage=coverage).run(['btcusdt'])
+
+        coverage.remove_range.assert_called_once_with("BTCUSDT", None, CUTOFF)
+        coverage.flush.assert_called_once()
+
+        coverage.reset_mock()
+        collection.count_documents.return_value = 0
+        RetentionJob(db, CUTOFF, max_workers=1, dry_run=True, coverage=coverage).run(['btcusdt'])
+        coverage.remove_range.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
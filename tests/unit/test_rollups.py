@@ -0,0 +1,128 @@
+"""
+Unit tests for OHLCV rollups
+"""
+
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+
+from src.core.data_manager import DataManager
+from src.core.rollups import (
+    RollupEngine, bucket_start, date_trunc, parse_interval, resample_ohlcv, rollup_collection_name
+)
+
+START = datetime(2024, 1, 1)
+
+class TestIntervals(unittest.TestCase):
+    """Тесты разбора интервалов и бакетов"""
+
+    def test_parse_and_bucket(self):
+        """Интервалы разбираются, бакеты выровнены от 2000-01-01"""
+        self.assertEqual(parse_interval('5m'), timedelta(minutes=5))
+        self.assertEqual(parse_interval('1d'), timedelta(days=1))
+        self.assertEqual(bucket_start(START + timedelta(minutes=7, seconds=3), '5m'), START + timedelta(minutes=5))
+        with self.assertRaises(ValueError):
+            parse_interval('5w')
+
+    def test_multi_day_buckets_match_date_trunc(self):
+        """Бакеты '3d' отсчитываются от 2000-01-01, как $dateTrunc, и в resample_ohlcv тоже"""
+        # 2024-01-01 - 8766 дней от 2000-01-01, 8766 % 3 == 0
+        self.assertEqual(bucket_start(START + timedelta(days=2, hours=5), '3d'), START)
+        self.assertEqual(bucket_start(START - timedelta(hours=1), '3d'), START - timedelta(days=3))
+        self.assertEqual(date_trunc('$timestamp', '3d'),
+                         {'$dateTrunc': {'date': '$timestamp', 'unit': 'day', 'binSize': 3}})
+
+        df = pd.DataFrame({
+            'timestamp': [START + timedelta(days=d) for d in range(6)],
+            'symbol': 'BTCUSDT',
+            'close': [float(d) for d in range(6)]
+        })
+        bars = resample_ohlcv(df, '3d')
+        self.assertEqual(bars['timestamp'].tolist(), [START, START + timedelta(days=3)])
+        self.assertEqual(bars['count'].tolist(), [3, 3])
+
+    def test_resample_ohlcv(self):
+        """Сырые цены собираются в OHLCV бары"""
+        df = pd.DataFrame({
+            'timestamp': [START + timedelta(minutes=i) for i in range(10)],
+            'symbol': 'BTCUSDT',
+            'close': [float(i) for i in range(10)],
+            'volume': 1.0
+        })
+        bars = resample_ohlcv(df, '5m')
+
+        self.assertEqual(len(bars), 2)
+        self.assertEqual(bars.iloc[1][['open', 'high', 'low', 'close', 'volume', 'count']].tolist(),
+                         [5.0, 9.0, 5.0, 9.0, 5.0, 5])
+
+class TestRollupEngine(unittest.TestCase):
+    """Тесты инкрементального обновления агрегатов"""
+
+    def setUp(self):
+        self.collections = {}
+        self.engine = RollupEngine(lambda name: self.collections.setdefault(name, MagicMock()))
+
+    def test_update_upserts_every_interval(self):
+        """Бар сливается в бакет каждого интервала pipeline-апсертом"""
+        timestamp = START + timedelta(hours=1, minutes=7)
+        self.assertEqual(self.engine.update("BTCUSDT", timestamp, {'close': 10.0, 'volume': 2.0}), 4)
+
+        hourly = self.collections[rollup_collection_name("BTCUSDT", '1h')]
+        operations = hourly.bulk_write.call_args.args[0]
+        self.assertEqual(len(operations), 1)
+        self.assertEqual(operations[0]._filter, {'symbol': "BTCUSDT", 'timestamp': START + timedelta(hours=1)})
+        self.assertTrue(operations[0]._upsert)
+        self.assertEqual(operations[0]._doc[0]['$set']['volume'], {'$add': [{'$ifNull': ['$volume', 0]}, 2.0]})
+        hourly.update_one.assert_not_called()
+        hourly.create_index.assert_called_once()
+
+    def test_update_many_folds_bars_per_bucket(self):
+        """Пачка баров - один bulk_write на интервал, бары бакета свернуты"""
+        bars = [("BTCUSDT", START + timedelta(minutes=m), {'close': float(m), 'volume': 1.0}) for m in (3, 1, 2, 61)]
+        self.assertEqual(self.engine.update_many(bars), 4)
+
+        hourly = self.collections[rollup_collection_name("BTCUSDT", '1h')]
+        hourly.bulk_write.assert_called_once()
+        operations = hourly.bulk_write.call_args.args[0]
+        self.assertEqual(len(operations), 2)
+        first_hour = operations[0]._doc[0]['$set']
+        self.assertEqual(first_hour['open']['$cond'][1], 1.0)
+        self.assertEqual(first_hour['close']['$cond'][1], 3.0)
+        self.assertEqual(first_hour['count'], {'$add': [{'$ifNull': ['$count', 0]}, 3]})
+        self.assertEqual(len(self.collections[rollup_collection_name("BTCUSDT", '1m')].bulk_write.call_args.args[0]), 4)
+
+    def test_bar_without_close_is_skipped(self):
+        """Метрики без close не попадают в агрегаты"""
+        self.assertEqual(self.engine.update("BTCUSDT", START, {'rsi': 50.0}), 0)
+        self.assertEqual(self.collections, {})
+
+    def test_select_interval(self):
+        """Выбирается самый крупный агрегат, кратный запрошенному интервалу"""
+        self.assertEqual(self.engine.select_interval('1d'), '1d')
+        self.assertEqual(self.engine.select_interval('4h'), '1h')
+        self.assertEqual(self.engine.select_interval('15m'), '5m')
+        self.assertIsNone(self.engine.select_interval('30s'))
+
+class TestIntervalReads(unittest.TestCase):
+    """Тесты маршрутизации get_historical_data(interval=...)"""
+
+    def test_interval_routes_to_rollup(self):
+        """Запрос 4h читает часовые агрегаты и досчитывает бары"""
+        data_manager = DataManager(rollup_intervals=['1m', '1h'])
+        hourly = pd.DataFrame({
+            'timestamp': [START + timedelta(hours=i) for i in range(8)],
+            'symbol': 'BTCUSDT',
+            'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': 1.5, 'volume': 10.0, 'count': 60
+        })
+        with patch.object(data_manager.rollups, 'read', return_value=hourly) as read:
+            bars = data_manager.get_historical_data("BTCUSDT", START, START + timedelta(hours=8), interval='4h')
+
+        self.assertEqual(read.call_args[0][1], '1h')
+        self.assertEqual(len(bars), 2)
+        self.assertEqual(bars['volume'].tolist(), [40.0, 40.0])
+        self.assertEqual(bars['count'].tolist(), [240, 240])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Unit tests for the metrics schema registry
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+import numpy as np
+
+from src.core.data_manager import DataManager, documents_to_frame
+from src.core.schema import (
+    MetricsSchema, SchemaRegistry, SchemaError, SchemaUnavailableError, OHLCV_FIELDS
+)
+
+START = datetime(2024, 1, 1)
+
+class TestMetricsSchema(unittest.TestCase):
+    """Тесты проверки и приведения метрик"""
+
+    def setUp(self):
+        self.schema = MetricsSchema("BTCUSDT", {**OHLCV_FIELDS, 'trades': 'int64'})
+
+    def test_coerce_to_dtypes(self):
+        """Значения приводятся к типам схемы, пропуски не пишутся"""
+        coerced = self.schema.coerce({'close': 0.1, 'volume': '2', 'trades': 5.0})
+
+        self.assertEqual(coerced['close'], float(np.float32(0.1)))
+        self.assertEqual(coerced['volume'], 2.0)
+        self.assertIsInstance(coerced['trades'], int)
+        self.assertNotIn('open', coerced)
+
+    def test_invalid_metrics_are_rejected(self):
+        """Лишние поля и неприводимые значения - SchemaError"""
+        with self.assertRaises(SchemaError):
+            self.schema.coerce({'close': 1.0, 'rsi': 50.0})
+        with self.assertRaises(SchemaError):
+            self.schema.coerce({'trades': 1.5})
+        with self.assertRaises(SchemaError):
+            MetricsSchema("BTCUSDT", {'timestamp': 'float32'})
+
+    def test_registry_versions(self):
+        """Изменение полей увеличивает версию, повторная регистрация - нет"""
+        collection = Mock()
+        collection.find_one.return_value = None
+        registry = SchemaRegistry(lambda: collection)
+
+        first = registry.register("BTCUSDT", OHLCV_FIELDS)
+        same = registry.register("BTCUSDT", dict(OHLCV_FIELDS))
+        second = registry.register("BTCUSDT", {**OHLCV_FIELDS, 'vwap': 'float32'})
+
+        self.assertIs(first, same)
+        self.assertEqual(second.version, 2)
+        self.assertEqual(collection.replace_one.call_count, 2)
+
+    def test_local_snapshot_survives_restart(self):
+        """Известные схемы пишутся в локальный снимок и читаются из него без MongoDB"""
+        collection = Mock()
+        collection.find_one.return_value = None
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'schemas.json')
+            SchemaRegistry(lambda: collection, snapshot_path=path).register("BTCUSDT", OHLCV_FIELDS)
+
+            getter = Mock(side_effect=ConnectionError("down"))
+            restarted = SchemaRegistry(getter, snapshot_path=path)
+            schema = restarted.get_local("BTCUSDT")
+
+        self.assertEqual(schema.fields, OHLCV_FIELDS)
+        self.assertIsNone(restarted.get_local("ETHUSDT"))
+        getter.assert_not_called()
+
+    def test_lookup_failure_keeps_known_layout(self):
+        """При ошибке загрузки - последняя известная схема, без нее запись отклоняется"""
+        collection = Mock()
+        collection.find_one.return_value = MetricsSchema("BTCUSDT", OHLCV_FIELDS).to_document()
+        registry = SchemaRegistry(lambda: collection)
+        self.assertEqual(registry.get("BTCUSDT").fields, OHLCV_FIELDS)
+
+        registry.reload()
+        collection.find_one.side_effect = ConnectionError("down")
+        self.assertEqual(registry.get("BTCUSDT").fields, OHLCV_FIELDS)
+        # Повтор в пределах retry_interval тоже не переключает формат
+        self.assertEqual(registry.get("BTCUSDT").fields, OHLCV_FIELDS)
+
+        # Чтение разбирает оба формата, запись без известной схемы отклоняется
+        self.assertIsNone(registry.get("ETHUSDT"))
+        with self.assertRaises(SchemaUnavailableError):
+            registry.get("ETHUSDT", required=True)
+        with patch('src.core.data_manager.get_collection', return_value=Mock()) as getter:
+            data_manager = DataManager()
+            data_manager.schemas = registry
+            self.assertFalse(data_manager.save_metrics({'close': 1.0}, "ETHUSDT"))
+            getter.return_value.insert_one.assert_not_called()
+
+    def test_journal_path_does_not_reach_mongodb(self):
+        """save_metrics с журналом берет схему из снимка и не обращается к MongoDB"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            registry = SchemaRegistry(snapshot_path=os.path.join(tmp_dir, 'schemas.json'))
+            registry.register("BTCUSDT", OHLCV_FIELDS)
+
+            with patch('src.core.data_manager.get_collection', side_effect=ConnectionError("down")) as getter, \
+                 patch.object(SchemaRegistry, 'refresh', return_value=0):
+                data_manager = DataManager(journal_dir=tmp_dir)
+                with patch.object(data_manager.journal, 'append') as append:
+                    self.assertTrue(data_manager.save_metrics({'close': 1.0}, "BTCUSDT"))
+                getter.assert_not_called()
+                data_manager.close()
+
+        document = append.call_args.args[1]
+        self.assertEqual(document['close'], 1.0)
+        self.assertNotIn('metrics', document)
+
+class TestTypedDocuments(unittest.TestCase):
+    """Тесты записи и чтения документов по схеме"""
+
+    def setUp(self):
+        self.collection = Mock()
+        self.collection.find_one.return_value = None
+        patcher = patch('src.core.data_manager.get_collection', return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.data_manager = DataManager()
+        self.schema = self.data_manager.register_schema("BTCUSDT", OHLCV_FIELDS)
+
+    def test_save_metrics_writes_flat_fields(self):
+        """Метрики пишутся плоскими полями с версией схемы"""
+        self.assertTrue(self.data_manager.save_metrics({'close': 100.5, 'volume': 3}, "BTCUSDT"))
+
+        document = self.collection.insert_one.call_args[0][0]
+        self.assertNotIn('metrics', document)
+        self.assertEqual(document['close'], 100.5)
+        self.assertEqual(document['schema_version'], 1)
+        self.assertFalse(self.data_manager.save_metrics({'rsi': 50.0}, "BTCUSDT"))
+
+    def test_typed_and_legacy_documents(self):
+        """Типизированные колонки, legacy документы читаются через fallback"""
+        docs = [
+            {'timestamp': START, 'symbol': "BTCUSDT", 'close': 1.0, 'volume': 2.0},
+            {'timestamp': START + timedelta(hours=1), 'symbol': "BTCUSDT",
+             'metrics': {'close': 2.0, 'rsi': 55.0}}
+        ]
+        df = documents_to_frame(docs, self.schema)
+
+        self.assertEqual(df['close'].dtype, np.float32)
+        self.assertEqual(df['close'].tolist(), [1.0, 2.0])
+        self.assertTrue(np.isnan(df['volume'].iloc[1]))
+        self.assertEqual(df['rsi'].isna().tolist(), [True, False])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Unit tests for streaming feature state
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.ml import indicators
+from src.ml.streaming import StreamingFeatureState
+
+def _ohlcv(rows=400, seed=11):
+    """Случайное блуждание OHLCV"""
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 50, rows))
+    spread = rng.uniform(5, 60, rows)
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=rows, freq='min'),
+        'high': close + spread,
+        'low': close - spread,
+        'close': close,
+        'volume': rng.uniform(1, 100, rows)
+    })
+
+class TestStreamingFeatureState(unittest.TestCase):
+    """Сверка инкрементального расчета с пакетными ядрами"""
+
+    def setUp(self):
+        self.df = _ohlcv()
+
+    def _stream(self, state, df):
+        return pd.DataFrame([state.update(bar) for bar in df.to_dict('records')])
+
+    def test_matches_batch_indicators(self):
+        """Бар за баром совпадает с compute_indicators"""
+        state = StreamingFeatureState('BTCUSDT')
+        streamed = self._stream(state, self.df)
+        expected = indicators.compute_indicators(self.df)
+
+        self.assertEqual(list(streamed.columns), list(expected.columns))
+        np.testing.assert_allclose(streamed.values, expected.values, rtol=1e-8, equal_nan=True)
+        self.assertEqual(state.bars, len(self.df))
+        self.assertEqual(state.last_timestamp, self.df['timestamp'].iloc[-1].to_pydatetime())
+
+    def test_gaps_and_missing_columns(self):
+        """NaN в close и кадр без high/low/volume"""
+        df = self.df[['close']].copy()
+        df.iloc[120, 0] = np.nan
+        spec = {'sma': (5, 30), 'ema': (10,), 'volatility': (15,), 'rsi': (14,), 'atr': (14,)}
+
+        state = StreamingFeatureState('BTCUSDT', spec, has_range=False, has_volume=False)
+        streamed = self._stream(state, df)
+        expected = indicators.compute_indicators(df, spec)
+
+        self.assertEqual(list(streamed.columns), list(expected.columns))
+        np.testing.assert_allclose(streamed.values, expected.values, rtol=1e-8, equal_nan=True)
+
+    def test_state_survives_restart(self):
+        """Сохраненное состояние продолжает расчет так же, как исходное"""
+        head, tail = self.df.iloc[:250], self.df.iloc[250:]
+        state = StreamingFeatureState.from_history(head, 'BTCUSDT')
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'state', 'btcusdt.json')
+            state.save(path)
+            restored = StreamingFeatureState.load(path)
+
+        self.assertEqual(restored.symbol, 'BTCUSDT')
+        self.assertEqual(restored.bars, 250)
+        np.testing.assert_array_equal(self._stream(restored, tail).values,
+                                      self._stream(state, tail).values)
+
+if __name__ == "__main__":
+    unittest.main()
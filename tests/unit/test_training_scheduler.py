@@ -0,0 +1,124 @@
+"""
+Unit tests for parallel model training scheduler
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.ml.training.scheduler import (
+    CANDIDATE_MODELS, TrainingScheduler, share_array, slot_thread_budget, split_thread_budget
+)
+from src.ml.training.trainer import MLTrainer
+
+def _classification(rows=400, features=6, seed=3):
+    """Линейно разделимая выборка с шумом"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, features)).astype(np.float32)
+    y = (X[:, 0] + 0.5 * X[:, 1] + rng.normal(0, 0.3, rows) > 0).astype(np.int8)
+    return X, y
+
+class TestThreadBudget(unittest.TestCase):
+    """Распределение потоков между моделями"""
+
+    def test_budget_split_by_weight(self):
+        """Потоки делятся по весу, без превышения бюджета и max_threads"""
+        threads = split_thread_budget(CANDIDATE_MODELS, 16)
+
+        self.assertEqual(sum(threads.values()), 16)
+        self.assertEqual(threads['logistic_regression'], 1)
+        self.assertGreater(threads['random_forest'], threads['lightgbm'])
+
+    def test_small_budget(self):
+        """Бюджет меньше числа моделей - по одному потоку"""
+        threads = split_thread_budget(CANDIDATE_MODELS, 2)
+        self.assertEqual(set(threads.values()), {1})
+
+    def test_slot_budget(self):
+        """Доля процесса одинакова для всех моделей, max_threads соблюдается"""
+        threads = slot_thread_budget(CANDIDATE_MODELS, 8, 3)
+
+        self.assertEqual(threads['random_forest'], 2)
+        self.assertEqual(threads['lightgbm'], 2)
+        self.assertEqual(threads['logistic_regression'], 1)
+        self.assertLessEqual(3 * max(threads.values()), 8)
+
+class TestShareArray(unittest.TestCase):
+    """Передача массивов воркерам через memmap"""
+
+    def test_array_written_once_and_memmap_reused(self):
+        """Обычный массив пишется в файл, срез memmap передается без копии"""
+        X, _ = _classification(rows=50)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shared = share_array(X, tmp_dir, 'X')
+            np.testing.assert_array_equal(shared.open(), X)
+
+            source = np.memmap(shared.path, dtype=X.dtype, mode='r', shape=X.shape)
+            tail = share_array(source[30:], tmp_dir, 'tail')
+            self.assertEqual(tail.path, shared.path)
+            self.assertEqual(tail.offset, 30 * X.shape[1] * X.itemsize)
+            np.testing.assert_array_equal(tail.open(), X[30:])
+            self.assertEqual(sorted(p.name for p in Path(tmp_dir).iterdir()), ['X'])
+            del source
+
+    def test_nested_slice_of_offset_memmap(self):
+        """Смещение среза среза memmap с offset считается от корня, столбцы копируются"""
+        X, _ = _classification(rows=50)
+        row_bytes = X.shape[1] * X.itemsize
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shared = share_array(X, tmp_dir, 'X')
+            source = np.memmap(shared.path, dtype=X.dtype, mode='r', shape=(40, X.shape[1]),
+                               offset=10 * row_bytes)
+
+            nested = share_array(source[20:][5:], tmp_dir, 'nested')
+            self.assertEqual(nested.offset, 35 * row_bytes)
+            np.testing.assert_array_equal(nested.open(), X[35:])
+
+            columns = share_array(source[:, :2], tmp_dir, 'columns')
+            self.assertNotEqual(columns.path, shared.path)
+            np.testing.assert_array_equal(columns.open(), X[10:, :2])
+            del source
+
+class TestTrainingScheduler(unittest.TestCase):
+    """Параллельное обучение в процессах"""
+
+    def test_parallel_training(self):
+        """Модели обучаются в воркерах, время учитывается по моделям и общее"""
+        X, y = _classification()
+        candidates = {name: CANDIDATE_MODELS[name] for name in ('logistic_regression', 'random_forest')}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            scheduler = TrainingScheduler(max_workers=2, tmp_dir=tmp_dir)
+            results = scheduler.run(X[:300], y[:300], X[300:], y[300:], candidates)
+            self.assertEqual(list(Path(tmp_dir).iterdir()), [])
+
+        self.assertEqual(list(results), ['logistic_regression', 'random_forest'])
+        self.assertGreater(results['logistic_regression'].metrics['accuracy'], 0.8)
+        np.testing.assert_array_equal(results['random_forest'].model.predict(X[300:]).shape, (100,))
+        self.assertEqual(set(scheduler.timings.models), set(candidates))
+        self.assertGreater(scheduler.timings.total, 0)
+
+    def test_fewer_processes_than_models(self):
+        """Моделей больше, чем процессов - у каждой доля одного процесса"""
+        X, y = _classification()
+        candidates = {name: CANDIDATE_MODELS[name] for name in ('logistic_regression', 'random_forest', 'lightgbm')}
+
+        results = TrainingScheduler(max_workers=2).run(X[:300], y[:300], X[300:], y[300:], candidates)
+
+        self.assertEqual({name: result.threads for name, result in results.items()},
+                         {'logistic_regression': 1, 'random_forest': 1, 'lightgbm': 1})
+
+    def test_trainer_sequential_timings(self):
+        """Последовательный путь MLTrainer тоже отчитывается по времени"""
+        X, y = _classification()
+        trainer = MLTrainer()
+        results = trainer.train_models(X[:300], y[:300], X[300:], y[300:])
+
+        self.assertEqual(list(results), list(CANDIDATE_MODELS))
+        self.assertEqual(set(trainer.timings.models), set(CANDIDATE_MODELS))
+        self.assertIsNotNone(trainer.best_model)
+
+if __name__ == "__main__":
+    unittest.main()
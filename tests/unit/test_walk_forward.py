@@ -0,0 +1,99 @@
+"""
+Unit tests for walk-forward validation
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.ml.training.scheduler import CANDIDATE_MODELS
+from src.ml.training.walk_forward import WalkForwardValidator, walk_forward_splits
+
+def _classification(rows=600, features=5, seed=5):
+    """Линейно разделимая выборка с шумом и смещенным масштабом признаков"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, features)) * 100 + 30000
+    y = (X[:, 0] - X[:, 1] + rng.normal(0, 30, rows) > 0).astype(np.int8)
+    return X, y
+
+class TestWalkForwardSplits(unittest.TestCase):
+    """Границы фолдов"""
+
+    def test_expanding_and_rolling(self):
+        """Тесты подряд в конце ряда, train до теста с учетом gap"""
+        expanding = walk_forward_splits(600, n_folds=5)
+        self.assertEqual([(f.test_start, f.test_end) for f in expanding],
+                         [(100, 200), (200, 300), (300, 400), (400, 500), (500, 600)])
+        self.assertTrue(all(f.train_start == 0 and f.train_end == f.test_start for f in expanding))
+
+        rolling = walk_forward_splits(600, n_folds=3, mode='rolling', test_size=100, train_size=150, gap=10)
+        self.assertEqual([(f.train_start, f.train_end) for f in rolling], [(140, 290), (240, 390), (340, 490)])
+
+    def test_invalid_arguments(self):
+        """Неизвестный режим и нехватка строк"""
+        with self.assertRaises(ValueError):
+            walk_forward_splits(100, mode='sliding')
+        with self.assertRaises(ValueError):
+            walk_forward_splits(10, n_folds=5, test_size=2)
+
+class TestWalkForwardValidator(unittest.TestCase):
+    """Параллельная оценка и кеш масштабированных фолдов"""
+
+    def test_results_table_and_cache_reuse(self):
+        """Таблица по (фолд, модель), повторный запуск берет фолды из кеша"""
+        X, y = _classification()
+        candidates = {name: CANDIDATE_MODELS[name] for name in ('logistic_regression', 'random_forest')}
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            validator = WalkForwardValidator(n_folds=3, max_workers=2, cache_dir=cache_dir)
+            results = validator.run(X, y, candidates)
+
+            self.assertEqual(len(results), 6)
+            self.assertEqual(list(results['fold'].unique()), [0, 1, 2])
+            self.assertTrue({'train_start', 'test_end', 'accuracy', 'f1', 'seconds'} <= set(results.columns))
+            logistic = results[results['model'] == 'logistic_regression']
+            self.assertTrue((logistic['accuracy'] > 0.8).all())
+
+            fold_dirs = sorted(Path(cache_dir).glob('*/fold-*'))
+            self.assertEqual(len(fold_dirs), 3)
+            scaled = np.memmap(fold_dirs[0] / 'X_train', dtype=np.float32, mode='r').reshape(-1, X.shape[1])
+            np.testing.assert_allclose(scaled.mean(axis=0), 0, atol=1e-4)
+            del scaled
+
+            modified = {p: (p / 'X_train').stat().st_mtime_ns for p in fold_dirs}
+            again = validator.run(X, y, candidates)
+            self.assertEqual({p: (p / 'X_train').stat().st_mtime_ns for p in fold_dirs}, modified)
+            np.testing.assert_allclose(again['accuracy'], results['accuracy'])
+
+        summary = validator.summary()
+        self.assertEqual(sorted(summary.index), ['logistic_regression', 'random_forest'])
+
+    def test_thread_budget_per_process(self):
+        """Потоки задачи считаются от max_workers / processes, весь бюджет используется"""
+        X, y = _classification(rows=300)
+        candidates = {'random_forest': CANDIDATE_MODELS['random_forest']}
+
+        results = WalkForwardValidator(n_folds=2, max_workers=4).run(X, y, candidates)
+
+        self.assertEqual(results['threads'].tolist(), [2, 2])
+
+    def test_concurrent_heavy_models_stay_within_budget(self):
+        """Тяжелые модели в соседних процессах вместе не превышают max_workers"""
+        X, y = _classification(rows=300)
+        candidates = {name: CANDIDATE_MODELS[name] for name in ('random_forest', 'lightgbm')}
+
+        results = WalkForwardValidator(n_folds=3, max_workers=5).run(X, y, candidates)
+
+        # 6 задач в 5 процессах: любые 5 одновременных - по одному потоку
+        self.assertEqual(set(results['threads']), {1})
+
+    def test_empty_candidates(self):
+        """Пустой словарь кандидатов отклоняется до запуска процессов"""
+        X, y = _classification(rows=300)
+        with self.assertRaises(ValueError):
+            WalkForwardValidator(n_folds=2, max_workers=2).run(X, y, {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+"""
+Unit tests for buffered write pipeline
+"""
+
+import unittest
+from datetime import datetime
+from unittest.mock import Mock
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from src.core.write_buffer import BufferedWriter, upsert_operation
+
+def _insert_many_result(documents, ordered=False):
+    """Имитация insert_many с назначением _id"""
+    for document in documents:
+        document.setdefault('_id', ObjectId())
+    return Mock(inserted_ids=[document['_id'] for document in documents])
+
+class TestBufferedWriter(unittest.TestCase):
+    """Тесты буфера пакетной записи"""
+
+    def setUp(self):
+        self.collections = {}
+        self.writer = BufferedWriter(
+            self._get_collection, batch_size=3, flush_interval=60, max_pending=5, put_timeout=0.1
+        )
+
+    def tearDown(self):
+        self.writer.close()
+
+    def _get_collection(self, name):
+        if name not in self.collections:
+            collection = Mock()
+            collection.insert_many.side_effect = _insert_many_result
+            self.collections[name] = collection
+        return self.collections[name]
+
+    def test_flush_groups_by_collection(self):
+        """Документы группируются по коллекциям и пишутся одной пачкой"""
+        futures = [self.writer.add('btcusdt', {'n': 1}), self.writer.add('ethusdt', {'n': 2})]
+
+        self.assertEqual(self.writer.flush(), 2)
+        self.assertEqual(self.collections['btcusdt'].insert_many.call_count, 1)
+        self.assertEqual(self.collections['ethusdt'].insert_many.call_count, 1)
+        for future in futures:
+            self.assertEqual(len(future.result(timeout=1)), 24)
+        self.assertEqual(self.writer.pending, 0)
+
+    def test_size_threshold_triggers_background_flush(self):
+        """Заполнение пачки будит фоновый поток"""
+        futures = [self.writer.add('btcusdt', {'n': i}) for i in range(3)]
+
+        for future in futures:
+            future.result(timeout=5)
+        self.collections['btcusdt'].insert_many.assert_called_once()
+
+    def test_back_pressure_timeout(self):
+        """Полный буфер блокирует запись, пока сброс не освободит место"""
+        collection = Mock()
+        collection.insert_many.side_effect = ConnectionError("down")
+        writer = BufferedWriter(
+            lambda name: collection, batch_size=100, flush_interval=60, max_pending=2, put_timeout=0.1
+        )
+        writer._flush_lock.acquire()
+        try:
+            writer.add('btcusdt', {'n': 1})
+            writer.add('btcusdt', {'n': 2})
+            with self.assertRaises(TimeoutError):
+                writer.add('btcusdt', {'n': 3})
+        finally:
+            writer._flush_lock.release()
+            writer.close()
+
+    def test_partial_bulk_failure(self):
+        """Ошибки отдельных документов не ломают остальные Future"""
+        collection = Mock()
+        collection.insert_many.side_effect = BulkWriteError({
+            'writeErrors': [{'index': 1, 'code': 11000, 'errmsg': 'duplicate key'}]
+        })
+        writer = BufferedWriter(lambda name: collection, batch_size=10, flush_interval=60)
+        try:
+            ok = writer.add('btcusdt', {'_id': ObjectId()})
+            failed = writer.add('btcusdt', {'_id': ObjectId()})
+
+            self.assertEqual(writer.flush(), 1)
+            self.assertTrue(ok.result(timeout=1))
+            with self.assertRaises(RuntimeError):
+                failed.result(timeout=1)
+        finally:
+            writer.close()
+
+    def test_closed_writer_rejects_documents(self):
+        """Закрытый буфер не принимает документы"""
+        self.writer.close()
+        with self.assertRaises(RuntimeError):
+            self.writer.add('btcusdt', {'n': 1})
+
+    def test_upsert_operation(self):
+        """Апсерт по (symbol, timestamp), служебные поля - только при вставке"""
+        document = {'_id': ObjectId(), 'symbol': 'BTCUSDT', 'timestamp': datetime(2024, 1, 1),
+                    'close': 1.0, 'processed': False, 'created_at': datetime(2024, 1, 2)}
+        operation = upsert_operation(document)
+
+        self.assertEqual(operation._filter, {'symbol': 'BTCUSDT', 'timestamp': datetime(2024, 1, 1)})
+        self.assertEqual(operation._doc['$set'], {'close': 1.0})
+        self.assertEqual(set(operation._doc['$setOnInsert']), {'_id', 'processed', 'created_at'})
+        self.assertTrue(operation._upsert)
+
+    def test_upsert_mode_resolves_existing_bars_to_none(self):
+        """Future уже существовавшего бара получает None"""
+        collection = Mock()
+        collection.bulk_write.return_value = Mock(upserted_ids={0: ObjectId()})
+        writer = BufferedWriter(lambda name: collection, batch_size=10, flush_interval=60, upsert=True)
+        try:
+            bars = [{'_id': ObjectId(), 'symbol': 'BTCUSDT', 'timestamp': datetime(2024, 1, 1, h)}
+                    for h in range(2)]
+            new, existing = writer.add('btcusdt', bars[0]), writer.add('btcusdt', bars[1])
+            writer.flush()
+
+            self.assertEqual(new.result(timeout=1), str(bars[0]['_id']))
+            self.assertIsNone(existing.result(timeout=1))
+            collection.insert_many.assert_not_called()
+            self.assertFalse(collection.bulk_write.call_args.kwargs['ordered'])
+        finally:
+            writer.close()
+
+    def test_on_written_only_after_successful_write(self):
+        """on_written получает только записанные новые документы"""
+        collection = Mock()
+        collection.bulk_write.side_effect = [
+            Mock(upserted_ids={1: ObjectId()}),
+            ConnectionError("down")
+        ]
+        written = []
+        writer = BufferedWriter(lambda name: collection, batch_size=10, flush_interval=60, upsert=True,
+                                on_written=lambda name, docs: written.append((name, docs)))
+        try:
+            bars = [{'_id': ObjectId(), 'symbol': 'BTCUSDT', 'timestamp': datetime(2024, 1, 1, h)}
+                    for h in range(3)]
+            writer.add('btcusdt', bars[0])
+            writer.add('btcusdt', bars[1])
+            writer.flush()
+            failed = writer.add('btcusdt', bars[2])
+            writer.flush()
+
+            self.assertEqual(written, [('btcusdt', [bars[1]])])
+            with self.assertRaises(ConnectionError):
+                failed.result(timeout=1)
+        finally:
+            writer.close()
+
+if __name__ == "__main__":
+    unittest.main()